@@ -81,6 +81,9 @@ def adr30_before(ts, day_df):
 def save_trades_to_db(df: pd.DataFrame, table=ROT_TABLE):
     conn = sqlite3.connect(DB_FILE)
     df.to_sql(table, conn, if_exists="replace", index=False)
+    # rotationviewerapp reads trades by entry_ts range
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_rot_entry ON {table}(entry_ts)")
+    conn.commit()
     conn.close()
     print(f"Saved {len(df)} trades → table '{table}' in {DB_FILE}")
 
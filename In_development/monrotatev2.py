@@ -171,6 +171,9 @@ def backtest(db: Path, tick_file: Path) -> None:
     # write results
     df = pd.DataFrame(asdict(t) for t in trades)
     df.to_sql("rotation_trades", conn, if_exists="replace", index=False)
+    # rotationviewerapp reads trades by entry_ts range
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rot_entry ON rotation_trades(entry_ts)")
+    conn.commit()
     print(f"Saved {len(df)} trades → rotation_trades")
     conn.close()
 
@@ -1,4 +1,6 @@
 import streamlit as st, pandas as pd, sqlite3, os, datetime
+import matplotlib
+matplotlib.use("Agg")                      # headless; Streamlit renders the PNG
 import mplfinance as mpf
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
@@ -16,14 +18,31 @@ TICK_COLS = ["Timestamp","Open","High","Low","Close","Volume",
 TIMEFRAME = {"5 m":"5min","15 m":"15min","30 m":"30min",
              "1 H":"1H","4 H":"4H","12 H":"12H"}
 
+MAX_TRADE_LABELS = 500   # above this the R labels are unreadable anyway
+
+CANDLE_COLORS = mpf.make_marketcolors(up='#26a69a', down='#ef5350', inherit=True)
+CANDLE_STYLE  = mpf.make_mpf_style(marketcolors=CANDLE_COLORS, gridstyle=':')
+
 # ── loaders ─────────────────────────────────────────────────────────
 @st.cache_data
-def load_trades():
+def load_trade_bounds():
+    """(first, last) entry date – lets the date pickers render before any load."""
+    if not os.path.exists(DB_FILE): return None
+    with sqlite3.connect(DB_FILE) as conn:
+        lo,hi = conn.execute(f"SELECT MIN(entry_ts), MAX(entry_ts) FROM {ROT_TBL}").fetchone()
+    if lo is None: return None
+    return pd.Timestamp(lo).date(), pd.Timestamp(hi).date()
+
+@st.cache_data
+def load_trades(start_d, end_d):
     if not os.path.exists(DB_FILE): return None
-    df = pd.read_sql(f"SELECT * FROM {ROT_TBL}", sqlite3.connect(DB_FILE),
+    df = pd.read_sql(f"SELECT * FROM {ROT_TBL} WHERE entry_ts >= ? AND entry_ts < ?",
+                     sqlite3.connect(DB_FILE),
+                     params=(str(start_d), str(end_d + datetime.timedelta(days=1))),
                      parse_dates=["entry_ts","exit_ts"])
     df.set_index("entry_ts", inplace=True)
-    return df
+    df.index = df.index.tz_localize(None)      # match tz-naive candle index
+    return df.sort_index()
 
 @st.cache_data
 def load_monday_levels():
@@ -47,6 +66,16 @@ def load_ticks(start_d, end_d):
     df.set_index("Timestamp", inplace=True)
     return df
 
+def chart_figure():
+    """One candle+volume figure per browser session, cleared and redrawn on each render."""
+    if "chart_fig" not in st.session_state:
+        fig = mpf.figure(figsize=(16,9), style=CANDLE_STYLE)
+        plt.close(fig)                     # detach from pyplot's registry: the session owns it
+        ax  = fig.add_subplot(4,1,(1,3))
+        axv = fig.add_subplot(4,1,4, sharex=ax)
+        st.session_state["chart_fig"] = (fig, ax, axv)
+    return st.session_state["chart_fig"]
+
 def resample(t, tf):
     return (t.resample(tf)
               .agg({"Open":"first","High":"max","Low":"min",
@@ -57,11 +86,11 @@ def resample(t, tf):
 st.set_page_config(layout="wide")
 st.title("Monday‑Rotation – target hits & trailing stop")
 
-tr_all = load_trades()
+bounds = load_trade_bounds()
 key_df = load_monday_levels()
-if tr_all is None: st.error("rotation_trades missing."); st.stop()
+if bounds is None: st.error("rotation_trades missing."); st.stop()
 
-min_d,max_d = tr_all.index.date.min(), tr_all.index.date.max()
+min_d,max_d = bounds
 c1,c2,c3 = st.columns(3)
 with c1: start_d = st.date_input("Start", max_d- datetime.timedelta(days=5),
                                  min_value=min_d,max_value=max_d)
@@ -69,6 +98,7 @@ with c2: end_d   = st.date_input("End",   max_d,
                                  min_value=min_d,max_value=max_d)
 with c3: tf_lbl  = st.selectbox("TF", list(TIMEFRAME.keys()),1)
 tf = TIMEFRAME[tf_lbl]
+tr_all = load_trades(start_d, end_d)
 
 show_targets = st.checkbox("🎯 targets only", True)
 
@@ -80,16 +110,15 @@ if st.button("Render"):
     if ohlc.empty: st.error("No candles."); st.stop()
 
     # filter trades
-    tr = tr_all.copy(); tr.index = tr.index.tz_localize(None)
-    tr = tr[(tr.index >= ohlc.index[0]) & (tr.index <= ohlc.index[-1])]
-    if show_targets: tr = tr[tr.reason=="target"]
-
-    mc  = mpf.make_marketcolors(up='#26a69a', down='#ef5350', inherit=True)
-    stl = mpf.make_mpf_style(marketcolors=mc, gridstyle=':')
-    fig,axl = mpf.plot(ohlc, type='candle', volume=True,
-                       style=stl, figsize=(16,9), returnfig=True,
-                       title=f"{start_d} → {end_d}  ({tf_lbl})")
-    ax = axl[0]; idx = ohlc.index
+    lo,hi = tr_all.index.slice_locs(ohlc.index[0], ohlc.index[-1])
+    tr = tr_all.iloc[lo:hi]
+    if show_targets: tr = tr[tr.reason.values=="target"]
+
+    fig,ax,axv = chart_figure()
+    ax.clear(); axv.clear()
+    mpf.plot(ohlc, type='candle', ax=ax, volume=axv,
+             axtitle=f"{start_d} → {end_d}  ({tf_lbl})")
+    idx = ohlc.index
     ax.yaxis.set_major_formatter(mticker.FormatStrFormatter('$%.0f'))
 
     # cyan Monday bands
@@ -107,6 +136,7 @@ if st.button("Render"):
     bar = lambda ts: int(idx.get_indexer([ts],method='nearest')[0])
 
     # plot trades
+    labels = []                                # (x, y, text, colour)
     for t in tr.itertuples():
         mid = (t.entry + (t.exit if t.reason=="target" else t.stop_ticks*0))/2
         x0,x1 = bar(t.Index), bar(t.exit_ts.tz_localize(None))
@@ -125,7 +155,13 @@ if st.button("Render"):
         mark = "^" if t.direction==1 else "v"
         ax.scatter(x0,t.entry,marker=mark,color=col,s=90,zorder=5)
         ax.scatter(x1,t.exit,marker="x",color='orange',s=70,zorder=5)
-        ax.text(x1+0.3,t.exit,f"{t.net_R:.2f} R",color=col,fontsize=8)
+        labels.append((x1+0.3, t.exit, f"{t.net_R:.2f} R", col))
+
+    # R labels in one pass once all geometry is placed
+    if len(labels) <= MAX_TRADE_LABELS:
+        for x,y,txt,c in labels:
+            ax.text(x,y,txt,color=c,fontsize=8,
+                    transform=ax.transData,clip_on=True)
 
     st.caption("cyan = Monday range • red dashed = initial stop • purple dashed = trail stop • blue dashed = target")
-    st.pyplot(fig); plt.close(fig)
+    st.pyplot(fig)                             # session's figure – do not close
@@ -1,10 +1,21 @@
 import pandas as pd
+import numpy as np
 import sqlite3
 import os
+import sys
+import pickle
+import glob
+import hashlib
 from collections import defaultdict
+from functools import lru_cache
 
 DATABASE_PATH = 'crypto_data.db'
 TABLE_NAME = 'session_summary'
+CACHE_DIR = 'cache'  # Pickled retest aggregates, one file per (DB path, table), keyed by mtime
+READ_CHUNK_ROWS = 50_000  # Rows per fetch; bounds the row-tuple intermediate
+
+SESSION_SEQUENCE = ('Asia', 'London', 'NewYork')
+DAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
 
 def load_session_summary_data(db_path, table_name):
     """Loads and sorts session summary data from the SQLite database."""
@@ -14,18 +25,24 @@ def load_session_summary_data(db_path, table_name):
 
     try:
         conn = sqlite3.connect(db_path)
-        query = f"SELECT * FROM {table_name}"
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-
         required_columns = ['Date', 'Sessions', 'SessionStart', 'SessionEnd',
                             'SessionLow', 'SessionHigh', 'SessionOpen'] # Need SessionOpen
-        if not all(col in df.columns for col in required_columns):
+        table_columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")}
+        if not all(col in table_columns for col in required_columns):
+            conn.close()
             print(f"Error: Missing one or more required columns: {required_columns}")
-            missing = [col for col in required_columns if col not in df.columns]
+            missing = [col for col in required_columns if col not in table_columns]
             print(f"Missing columns: {missing}")
             return None
 
+        # Read only the columns the analysis uses, in bounded chunks
+        query = f"SELECT {', '.join(required_columns)} FROM {table_name}"
+        chunks = pd.read_sql_query(query, conn, chunksize=READ_CHUNK_ROWS,
+                                   dtype={'SessionLow': 'float64', 'SessionHigh': 'float64',
+                                          'SessionOpen': 'float64'})
+        df = pd.concat(chunks, ignore_index=True)
+        conn.close()
+
         # Convert timestamp columns to datetime objects
         for col in ['SessionStart', 'SessionEnd']:
             df[col] = pd.to_datetime(df[col])
@@ -34,10 +51,12 @@ def load_session_summary_data(db_path, table_name):
         # Sort data chronologically FIRST
         df = df.sort_values(by=['Date', 'SessionStart']).reset_index(drop=True)
 
-        # Add Week Identifier (Year-WeekNumber, Monday start)
+        # Add Week Identifier as integer ISO year*100 + week (Monday start)
         # Ensure SessionStart is timezone-naive if it's not already, or handle timezone appropriately
         # Assuming UTC or timezone-naive for simplicity here based on previous context
-        df['YearWeek'] = df['SessionStart'].dt.strftime('%Y-%W')
+        ic = df['SessionStart'].dt.isocalendar()
+        df['YearWeek'] = (ic['year'].astype(np.int32) * 100
+                          + ic['week'].astype(np.int32)).astype(np.int32)
 
         print(f"Loaded and sorted {len(df)} rows from {table_name}.")
         return df
@@ -49,48 +68,78 @@ def load_session_summary_data(db_path, table_name):
         print(f"An error occurred during data loading: {e}")
         return None
 
-def analyze_weekly_open_retest(df):
-    """Analyzes the probability of the Weekly Open being retested within the same week."""
+def compute_weekly_open_retest(df):
+    """Counts, per week, the session index of the first Weekly Open retest.
+
+    Returns (retest_counts, no_retest_count, total_weeks_analyzed) or None.
+    """
     if df is None or 'YearWeek' not in df.columns:
         print("Error: DataFrame is None or missing 'YearWeek' column.")
         return None
 
-    retest_counts = defaultdict(int) # Key: session index within week (1=first after open, 2=second after open, etc.)
-    no_retest_count = 0
-    total_weeks_analyzed = 0
-
-    # Group by the calculated YearWeek
-    grouped_by_week = df.groupby('YearWeek')
-
-    for week_id, week_df in grouped_by_week:
-        if len(week_df) < 2:
-            # Need at least 2 sessions (open + one subsequent) to check for retest
-            continue
-
-        total_weeks_analyzed += 1
-
-        # First session of the week determines the Weekly Open
-        # Data is already sorted, so iloc[0] is the first session
-        first_session = week_df.iloc[0]
-        weekly_open_price = first_session['SessionOpen']
-
-        retest_found_this_week = False
-        # Iterate through subsequent sessions *within the same week*
-        for i in range(1, len(week_df)):
-            subsequent_session = week_df.iloc[i]
-            session_low = subsequent_session['SessionLow']
-            session_high = subsequent_session['SessionHigh']
-
-            # Check for retest condition
-            if session_low <= weekly_open_price <= session_high:
-                session_index_within_week = i # 0 = first session, 1 = second session, etc.
-                retest_counts[session_index_within_week] += 1 # Record retest at index i (i.e., the i+1 session)
-                retest_found_this_week = True
-                break # Stop checking this week once the first retest is found
-
-        if not retest_found_this_week:
-            no_retest_count += 1
+    # Position of each session within its week (0 = the session that sets the open).
+    # Data is already sorted, so cumcount follows chronological order.
+    week_key = df['YearWeek'].to_numpy()
+    idx_in_wk = df.groupby('YearWeek', sort=False).cumcount().to_numpy()
+    wk_size = df.groupby('YearWeek', sort=False)['YearWeek'].transform('size').to_numpy()
+
+    # First session of the week determines the Weekly Open (NaN stays NaN)
+    weekly_open = (df['SessionOpen'].where(idx_in_wk == 0)
+                   .groupby(week_key, sort=False).transform('max').to_numpy())
+
+    # Need at least 2 sessions (open + one subsequent) to check for retest
+    valid = wk_size >= 2
+    hit = (valid & (idx_in_wk > 0)
+           & (df['SessionLow'].to_numpy() <= weekly_open)
+           & (weekly_open <= df['SessionHigh'].to_numpy()))
+
+    # Earliest hitting index per week == the first retest (break-on-first-hit)
+    no_hit = np.iinfo(np.int64).max
+    first_hit = (pd.Series(np.where(hit, idx_in_wk, no_hit), index=week_key)
+                 .groupby(level=0, sort=False).min())
+    first_hit = first_hit[first_hit != no_hit]
+
+    # Key: session index within week (1=first after open, 2=second after open, etc.)
+    retest_counts = defaultdict(int, {int(i): int(n) for i, n in first_hit.value_counts().items()})
+    total_weeks_analyzed = int(pd.unique(week_key[valid]).size)
+    no_retest_count = total_weeks_analyzed - len(first_hit)
+
+    return retest_counts, no_retest_count, total_weeks_analyzed
+
+@lru_cache(maxsize=8)
+def _retest_aggregates_for(db_path, table_name, db_mtime):
+    """Aggregates for one DB snapshot; db_mtime is part of the cache key only.
+
+    The pickle name carries a hash of the (absolute) db_path, so databases with the
+    same table name and mtime do not collide; writing a new snapshot removes the
+    stale pickles for the same database and table.
+    """
+    prefix = f"retest_{table_name}_{hashlib.sha1(db_path.encode()).hexdigest()[:12]}_"
+    cache_file = os.path.join(CACHE_DIR, f"{prefix}{db_mtime}.pkl")
+    if os.path.exists(cache_file):
+        with open(cache_file, 'rb') as fh:
+            return pickle.load(fh)
+
+    aggregates = compute_weekly_open_retest(load_session_summary_data(db_path, table_name))
+    if aggregates is not None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_file, 'wb') as fh:
+            pickle.dump(aggregates, fh)
+        for stale in glob.glob(os.path.join(CACHE_DIR, f"{glob.escape(prefix)}*.pkl")):
+            if stale != cache_file:
+                os.remove(stale)
+    return aggregates
+
+def cached_weekly_open_retest(db_path, table_name):
+    """Retest aggregates, recomputed only when the database file changes."""
+    if not os.path.exists(db_path):
+        print(f"Error: Database file not found at {db_path}")
+        return None
+    return _retest_aggregates_for(os.path.abspath(db_path), table_name,
+                                  os.stat(db_path).st_mtime_ns)
 
+def print_weekly_open_retest(retest_counts, no_retest_count, total_weeks_analyzed):
+    """Prints the retest probability table; returns (retest_counts, no_retest_count)."""
     # --- Calculate and Print Probabilities ---
     print("\n--- Weekly Open Retest Probability Analysis ---")
     print(f"Definition: First retest of Monday 00:00 UTC week's Open price.")
@@ -109,22 +158,23 @@ def analyze_weekly_open_retest(df):
 
     total_probability = 0
     max_session_index = max(retest_counts.keys()) if retest_counts else 0
-    session_sequence = ['Asia', 'London', 'NewYork']
 
-    for i in range(1, max_session_index + 1):
+    # Approximate session names, built once for the whole table
+    # (index % 3 picks the session, index // 3 the day, Mon=0, capped at Sun)
+    approx_names = [f"{DAY_NAMES[min(i // 3, 6)]} {SESSION_SEQUENCE[i % 3]}"
+                    for i in range(1, max_session_index + 1)]
+
+    rows = []
+    for i, approx_name in enumerate(approx_names, start=1):
         # Convert retest_counts index (0-based from start) to session number (1-based)
         # e.g., retest_counts[1] means retest in the *second* session (index 1)
         count = retest_counts.get(i, 0)
         probability = (count / total_weeks_analyzed) * 100
         total_probability += probability
-        # Try to approximate session name
-        session_name_index = (i) % len(session_sequence) # Index 1 is Asia, 2 London, 3 NY (0), 4 Asia (1) ...
-        approx_session_name = session_sequence[session_name_index]
-        day_num = (i // 3) + 1 # Estimate day number (Mon=1)
-        day_name = ['Mon','Tue','Wed','Thu','Fri','Sat','Sun'][min(day_num-1, 6)]
-        approx_name = f"{day_name} {approx_session_name}"
+        rows.append(f"| Session {i+1:<15} | {approx_name:<20} | {probability:>26.2f}% |")
 
-        print(f"| Session {i+1:<15} | {approx_name:<20} | {probability:>26.2f}% |")
+    if rows:
+        sys.stdout.write("\n".join(rows) + "\n")
 
     no_retest_probability = (no_retest_count / total_weeks_analyzed) * 100
     total_probability += no_retest_probability
@@ -133,13 +183,20 @@ def analyze_weekly_open_retest(df):
 
     return retest_counts, no_retest_count
 
+def analyze_weekly_open_retest(df):
+    """Analyzes the probability of the Weekly Open being retested within the same week."""
+    aggregates = compute_weekly_open_retest(df)
+    if aggregates is None:
+        return None
+    return print_weekly_open_retest(*aggregates)
+
 
 if __name__ == "__main__":
     print("Starting Weekly Open Retest Analysis...")
-    session_df = load_session_summary_data(DATABASE_PATH, TABLE_NAME)
+    aggregates = cached_weekly_open_retest(DATABASE_PATH, TABLE_NAME)
 
-    if session_df is not None:
-        results = analyze_weekly_open_retest(session_df)
+    if aggregates is not None:
+        results = print_weekly_open_retest(*aggregates)
         if results:
             print("\nAnalysis complete.")
         else:
@@ -2,6 +2,11 @@ import streamlit as st
 import pandas as pd
 import sqlite3
 import os
+import shutil
+import json
+import glob
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import datetime
 import config # Import parameters like TPO_PERIOD_MINUTES etc.
@@ -9,6 +14,7 @@ import mplfinance as mpf # For visualization
 import matplotlib.pyplot as plt # For formatting price axis
 import matplotlib.ticker as mticker # For formatting price axis
 import matplotlib.dates as mdates # Needed for axvspan with dates
+from matplotlib.collections import LineCollection # Batched session level segments
 # import matplotlib.dates as mdates # Needed for plotting lines on time axis
 # import streamlit.components.v1 as components # For rendering HTML
 
@@ -17,10 +23,28 @@ DATABASE_PATH = 'crypto_data.db'
 SESSION_SUMMARY_TABLE = 'session_summary'
 TICK_DATA_PATH = 'BTCUSDT_PERP_BINANCE_normalized.txt'
 TICK_DATA_COLS = ['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume', 'Trades', 'BidVolume', 'AskVolume']
+OHLCV_COLS = ['Open', 'High', 'Low', 'Close', 'Volume']
+TICK_PARQUET_DIR = 'ticks_by_date' # Date-partitioned Parquet copy of TICK_DATA_PATH (date=YYYY-MM-DD/)
+TICK_PARQUET_STAMP = '_source_stamp.json' # CSV mtime + byte offset/tail the dataset was built up to
+TICK_STAMP_TAIL_BYTES = 64 # Bytes before the recorded offset used to check the CSV was only appended to
 # CHART_CANDLE_TIMEFRAME = '15T' # Removed hardcoded timeframe
 KEY_LEVELS_TABLE = 'btc_key_levels' # Add table name
 VWAP_TABLE = 'session_vwap' # Define table name
 
+# VWAP columns resolved from config once at import, not on every click
+VWAP_REQUIRED_COLS = [f'RVWAP_{w}' for w in getattr(config, 'VWAP_WINDOWS', [30])]
+VWAP_COL_30 = f"RVWAP_{getattr(config, 'ROLLING_VWAP_WINDOW', 30)}"
+VWAP_COL_365 = 'RVWAP_365'
+# (checkbox label, column, checked by default, mpf.make_addplot kwargs)
+VWAP_OVERLAYS = [
+    ('VWAP 30', VWAP_COL_30, True, dict(color='purple', width=1.0, ylabel='VWAP')),
+    ('VWAP 365', VWAP_COL_365, False, dict(color='blue', width=1.2, linestyle='--')),
+]
+
+# Candle chart style, built once at import instead of on every render
+CANDLE_COLORS = mpf.make_marketcolors(up='#26a69a', down='#ef5350', inherit=True)
+CANDLE_STYLE = mpf.make_mpf_style(marketcolors=CANDLE_COLORS, gridstyle=':')
+
 # Define available timeframes for dropdown
 TIMEFRAME_OPTIONS = {
     # Minutes
@@ -42,6 +66,18 @@ TIMEFRAME_OPTIONS = {
 }
 
 # --- Data Loading Functions (with Caching) ---
+@st.cache_resource # One read-only connection per database, shared by all loaders
+def get_conn(db_path):
+    """Opens (once) a shared read-only SQLite connection to db_path."""
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro&cache=shared', uri=True, check_same_thread=False)
+    conn.executescript('''
+        PRAGMA mmap_size=1073741824;  -- 1 GB, scans page in via the kernel page cache
+        PRAGMA cache_size=-131072;    -- 128 MB page cache
+        PRAGMA temp_store=MEMORY;     -- ORDER BY / GROUP BY scratch stays in RAM
+        PRAGMA query_only=ON;
+    ''') # No journal_mode=WAL here: a mode=ro connection can't switch it (writers own that)
+    return conn
+
 @st.cache_data # Cache the loaded summary data
 def load_summary_data(db_path, table_name):
     """Loads session summary data from SQLite."""
@@ -49,46 +85,70 @@ def load_summary_data(db_path, table_name):
         st.error(f"Database file not found: {db_path}")
         return None
     try:
-        conn = sqlite3.connect(db_path)
+        conn = get_conn(db_path)
         # Convert bools back if needed for display
         df = pd.read_sql(f'SELECT * FROM {table_name}', conn,
                          parse_dates=['Date', 'SessionStart', 'SessionEnd'])
-        conn.close()
         df['Date'] = pd.to_datetime(df['Date']).dt.date
-        # Ensure boolean columns are bool type for display logic
-        for col in ['PoorHigh', 'PoorLow', 'SinglePrints']:
-            if col in df.columns:
-                 try: 
-                     df[col] = df[col].astype(bool)
-                 except Exception:
-                     df[col] = False 
+        # Stored as 0/1 INTEGER; one bulk cast to nullable bool (NULL stays <NA>)
+        bool_cols = [col for col in ['PoorHigh', 'PoorLow', 'SinglePrints'] if col in df.columns]
+        if bool_cols:
+            try:
+                df[bool_cols] = df[bool_cols].astype('boolean')
+            except (TypeError, ValueError):
+                print(f"Warning: could not cast {bool_cols} to boolean; leaving them as stored.")
         print(f"Loaded {len(df)} rows from {table_name}.")
         return df
     except Exception as e:
         st.error(f"Error loading session summary data: {e}")
         return None
 
-@st.cache_data # Cache key levels too
-def load_key_levels_data(db_path, table_name):
-    """Loads key levels data from SQLite."""
+@st.cache_data # Cached per (range) - only the chart's sessions cross the SQLite boundary
+def load_summary_range(db_path, table_name, start_date, end_date):
+    """Loads the session rows (chart columns only) with Date in [start_date, end_date]."""
+    if not os.path.exists(db_path):
+        st.error(f"Database file not found: {db_path}")
+        return None
+    try:
+        conn = get_conn(db_path)
+        df = pd.read_sql(f'SELECT Date, SessionStart, SessionEnd, Sessions, SessionHigh, SessionLow, '
+                         f'TPO_POC, VAH, VAL FROM {table_name} '
+                         f'WHERE Date BETWEEN ? AND ? ORDER BY Date, SessionStart', conn,
+                         params=(str(start_date), str(end_date)),
+                         parse_dates=['Date', 'SessionStart', 'SessionEnd'])
+        df['Date'] = df['Date'].dt.date
+        return df
+    except Exception as e:
+        st.error(f"Error loading session summary range: {e}")
+        return None
+
+@st.cache_data # Cache key levels too (one entry per column view)
+def load_key_levels_data(db_path, table_name, columns=None):
+    """Loads key levels data from SQLite, optionally only the given columns."""
     if not os.path.exists(db_path):
         st.error(f"Database file not found: {db_path}")
         return None
     try:
-        conn = sqlite3.connect(db_path)
+        conn = get_conn(db_path)
         # Check if table exists first
         query = f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}';"
         table_exists = pd.read_sql(query, conn).shape[0] > 0
         if not table_exists:
              st.warning(f"Table '{table_name}' not found in database. Run indicator_calculator.py?")
-             conn.close()
              return None
              
+        # Project to the requested columns that actually exist in the table
+        table_cols = [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")]
+        if columns is not None:
+            table_cols = [col for col in columns if col in table_cols]
+            if not table_cols:
+                return pd.DataFrame()
         # Load data, parsing relevant date/time columns if they exist
         # SessionStartUTC was saved as string, SessionDate needs parsing back
-        df = pd.read_sql(f'SELECT * FROM {table_name}', conn, parse_dates=['SessionStartUTC'])
-        df['SessionDate'] = pd.to_datetime(df['SessionDate']).dt.date
-        conn.close()
+        df = pd.read_sql(f'SELECT {", ".join(table_cols)} FROM {table_name}', conn, dtype_backend='pyarrow',
+                         parse_dates=[col for col in ['SessionStartUTC'] if col in table_cols])
+        if 'SessionDate' in df.columns:
+            df['SessionDate'] = pd.to_datetime(df['SessionDate']).dt.date
         print(f"Loaded {len(df)} rows from {table_name}.")
         return df
     except Exception as e:
@@ -102,27 +162,21 @@ def load_session_vwap_data(db_path, table_name):
         st.error(f"Database file not found: {db_path}")
         return None
     try:
-        conn = sqlite3.connect(db_path)
+        conn = get_conn(db_path)
         query = f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}';"
         table_exists = pd.read_sql(query, conn).shape[0] > 0
         if not table_exists:
              st.warning(f"Table '{table_name}' not found in database. Run indicator_calculator.py?")
-             conn.close()
              return None
              
         df = pd.read_sql(f'SELECT * FROM {table_name}', conn, parse_dates=['SessionStartUTC'])
 
         # --- FIX: Check for RVWAP column names --- 
-        # Construct list of required column names based on config
-        vwap_windows_list = config.VWAP_WINDOWS if hasattr(config, 'VWAP_WINDOWS') else [30]
-        required_vwap_cols = [f'RVWAP_{w}' for w in vwap_windows_list] # Corrected list comprehension
-        if not all(col in df.columns for col in required_vwap_cols):
-            st.error(f"Missing one or more expected VWAP columns ({required_vwap_cols}) in {table_name}")
-            conn.close()
+        if not all(col in df.columns for col in VWAP_REQUIRED_COLS):
+            st.error(f"Missing one or more expected VWAP columns ({VWAP_REQUIRED_COLS}) in {table_name}")
             return None
         # --- END FIX ---
             
-        conn.close()
         # --- FIX: Rename SessionStart to Timestamp AFTER parsing --- 
         df.rename(columns={'SessionStartUTC': 'Timestamp'}, inplace=True)
         # --- END FIX ---
@@ -133,95 +187,308 @@ def load_session_vwap_data(db_path, table_name):
         st.error(f"Error loading session VWAP data: {e}")
         return None
 
+def _tick_csv_has_header(tick_file_path):
+    """True if the first line is a header ("Date Time,Open,...") rather than a tick."""
+    with open(tick_file_path, encoding='utf-8', errors='replace') as f:
+        first_field = f.readline().split(',', 1)[0].strip()
+    return not first_field[:1].isdigit() # Ticks start with the date, e.g. "2024-03-01 ..."
+
+def _next_part_seq(parquet_dir):
+    """One past the highest part-file sequence number already in the dataset (0 if empty)."""
+    seqs = [int(os.path.basename(p).split('-')[1])
+            for p in glob.glob(os.path.join(parquet_dir, 'date=*', 'part-*.parquet'))]
+    return max(seqs, default=-1) + 1
+
+def _write_tick_partitions(tick_file_path, required_cols, parquet_dir, skip_rows, typed):
+    """Streams the CSV into date partitions; returns the number of rows written.
+
+    typed=True parses the numeric columns straight to float64 in the reader;
+    typed=False reads them loosely and coerces junk to NaN afterwards.
+    Each chunk's files are named part-<seq>-<i>.parquet with a zero-padded,
+    dataset-wide increasing seq, so reading a partition in path order returns
+    its ticks in CSV order (including ticks that share a timestamp).
+    """
+    rows_written = 0
+    seq = _next_part_seq(parquet_dir)
+    numeric_dtypes = {col: 'float64' for col in required_cols[1:]} if typed else None
+    for chunk in pd.read_csv(tick_file_path, delimiter=',', header=None, names=required_cols,
+                             skiprows=skip_rows, dtype=numeric_dtypes,
+                             skipinitialspace=True, on_bad_lines='skip', chunksize=500000):
+        chunk['Timestamp'] = pd.to_datetime(chunk['Timestamp'], errors='coerce', cache=True)
+        chunk.dropna(subset=['Timestamp'], inplace=True)
+        if not typed:
+            for col in required_cols[1:]:
+                chunk[col] = pd.to_numeric(chunk[col], errors='coerce').astype('float64')
+        chunk['date'] = chunk['Timestamp'].dt.strftime('%Y-%m-%d')
+        chunk.to_parquet(parquet_dir, partition_cols=['date'], index=False,
+                         basename_template=f"part-{seq:010d}-{{i}}.parquet")
+        seq += 1
+        rows_written += len(chunk)
+    return rows_written
+
+def build_tick_parquet(tick_file_path, required_cols, parquet_dir):
+    """Converts the tick CSV once into a Parquet dataset partitioned by date."""
+    if os.path.exists(parquet_dir):
+        shutil.rmtree(parquet_dir)
+    source_size = os.path.getsize(tick_file_path)
+    # Some raw files start with a header row ("Date Time,Open,High,…"); detect it once
+    # so the numeric columns can be parsed as float64 directly instead of being
+    # inferred and coerced per chunk. Every partition file shares one schema.
+    skip_rows = 1 if _tick_csv_has_header(tick_file_path) else 0
+    try:
+        rows_written = _write_tick_partitions(tick_file_path, required_cols, parquet_dir, skip_rows, typed=True)
+    except ValueError as e: # Non-numeric text mid-file (e.g. a repeated header): coerce instead
+        print(f"Typed tick read failed ({e}); rebuilding with per-column coercion.")
+        shutil.rmtree(parquet_dir, ignore_errors=True)
+        rows_written = _write_tick_partitions(tick_file_path, required_cols, parquet_dir, skip_rows, typed=False)
+    _write_tick_stamp(tick_file_path, parquet_dir, source_size)
+    print(f"Converted {rows_written} ticks from {tick_file_path} to {parquet_dir}.")
+
+def append_tick_parquet(tick_file_path, required_cols, parquet_dir, offset):
+    """Converts only the ticks appended to the CSV after byte `offset`.
+
+    The file is time-ordered, so the new rows are a contiguous tail; seeking
+    there skips parsing everything already in the dataset. Rows for a day that
+    already has a partition land in an extra file in that partition, named to
+    sort after the files already there.
+    """
+    source_size = os.path.getsize(tick_file_path)
+    # Drop the stamp first: if this append dies part-way (crash, Ctrl-C), the next
+    # run finds no offset and rebuilds instead of appending the same tail twice
+    os.remove(os.path.join(parquet_dir, TICK_PARQUET_STAMP))
+    try:
+        with open(tick_file_path, 'rb') as f:
+            f.seek(offset)
+            rows_written = _write_tick_partitions(f, required_cols, parquet_dir, 0, typed=True)
+    except Exception as e: # Part of the tail may already be written: start over
+        print(f"Appending new ticks failed ({e}); rebuilding {parquet_dir}.")
+        build_tick_parquet(tick_file_path, required_cols, parquet_dir)
+        return
+    _write_tick_stamp(tick_file_path, parquet_dir, source_size)
+    print(f"Appended {rows_written} new ticks from {tick_file_path} to {parquet_dir}.")
+
+def _source_tail(tick_file_path, offset):
+    """The TICK_STAMP_TAIL_BYTES bytes of the CSV just before `offset`."""
+    with open(tick_file_path, 'rb') as f:
+        f.seek(max(0, offset - TICK_STAMP_TAIL_BYTES))
+        return f.read(min(offset, TICK_STAMP_TAIL_BYTES))
+
+def _write_tick_stamp(tick_file_path, parquet_dir, source_size):
+    """Records the CSV mtime and, if the build ended on a line boundary, its byte offset."""
+    stamp = {'mtime': os.path.getmtime(tick_file_path)}
+    # Only resumable if nothing was appended mid-build and the last line was complete
+    if source_size and os.path.getsize(tick_file_path) == source_size:
+        tail = _source_tail(tick_file_path, source_size)
+        if tail.endswith(b'\n'):
+            stamp.update(offset=source_size, tail=tail.hex())
+    with open(os.path.join(parquet_dir, TICK_PARQUET_STAMP), 'w') as f:
+        json.dump(stamp, f)
+
+@st.cache_resource # One lock per server process, shared by all browser sessions
+def _tick_parquet_lock():
+    return threading.Lock()
+
+def ensure_tick_parquet(tick_file_path, required_cols, parquet_dir):
+    """Brings the Parquet tick dataset up to date with the CSV.
+
+    Unchanged CSV: nothing to do. CSV only appended to since the last build:
+    convert just the new tail. Anything else (missing dataset, rewritten CSV):
+    full rebuild. Serialised across sessions, so two reruns never convert
+    into the same directory at once.
+    """
+    with _tick_parquet_lock():
+        _ensure_tick_parquet(tick_file_path, required_cols, parquet_dir)
+
+def _ensure_tick_parquet(tick_file_path, required_cols, parquet_dir):
+    try:
+        with open(os.path.join(parquet_dir, TICK_PARQUET_STAMP)) as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        stamp = {}
+    if stamp.get('mtime') == os.path.getmtime(tick_file_path):
+        return
+    offset = stamp.get('offset')
+    if offset and os.path.getsize(tick_file_path) > offset and \
+            stamp.get('tail') == _source_tail(tick_file_path, offset).hex():
+        st.info(f"Converting new ticks appended to {tick_file_path}...")
+        append_tick_parquet(tick_file_path, required_cols, parquet_dir, offset)
+        return
+    st.info(f"Converting {tick_file_path} to Parquet (one-time)...")
+    build_tick_parquet(tick_file_path, required_cols, parquet_dir)
+
 def load_range_tick_data(tick_file_path, required_cols, start_date, end_date):
     """Loads tick data for a date range efficiently."""
     if not os.path.exists(tick_file_path):
         st.error(f"Tick data file not found: {tick_file_path}")
         return None
 
-    all_ticks_list = []
-    # We no longer pass a strict dtype_map because some raw files include a header row
-    # ("Timestamp,Open,High,…").  Enforcing float dtype on 'Open' etc. would raise
-    # "could not convert string to float: 'Open'".  Instead we let pandas infer dtypes
-    # then coerce numerics manually after filtering the date range.
-    
     st.info(f"Loading tick data from {start_date} to {end_date}...")
-    # Iterate through each day in the range
-    current_date = start_date
-    while current_date <= end_date:
-        date_str = current_date.strftime('%Y-%m-%d')
-        st.info(f"  Reading data for {date_str}...") # Progress update
-        try:
-            # Using chunking for potentially large daily files
-            chunk_list_day = []
-            for chunk in pd.read_csv(tick_file_path, delimiter=',', header=0, names=required_cols,
-                                     skipinitialspace=True, on_bad_lines='skip', chunksize=500000):
-                # More robust date filtering
-                chunk['TimestampParsed'] = pd.to_datetime(chunk['Timestamp'], errors='coerce')
-                chunk_filtered = chunk[chunk['TimestampParsed'].dt.date == current_date]
-                if not chunk_filtered.empty:
-                    chunk_list_day.append(chunk_filtered.drop(columns=['TimestampParsed'])) # Drop temp column
-
-            if chunk_list_day:
-                day_df = pd.concat(chunk_list_day, ignore_index=True)
-                all_ticks_list.append(day_df)
-            # else: # Optional: Add warning if a day has no data
-                # st.warning(f"No tick data found for {date_str}.")
-
-        except FileNotFoundError:
-            st.error(f"Tick data file not found: {tick_file_path}") # Should be caught earlier ideally
-            return None
-        except Exception as e:
-            st.error(f"Error loading tick data chunk for {date_str}: {e}")
-            # Optionally decide whether to continue or fail completely
-            # return None
-        current_date += datetime.timedelta(days=1)
+    try:
+        ensure_tick_parquet(tick_file_path, required_cols, TICK_PARQUET_DIR)
+        # Only the partitions inside the range are opened
+        df = pd.read_parquet(TICK_PARQUET_DIR, columns=required_cols,
+                             filters=[('date', '>=', start_date.strftime('%Y-%m-%d')),
+                                      ('date', '<=', end_date.strftime('%Y-%m-%d'))])
+    except Exception as e:
+        st.error(f"Error loading tick data for {start_date} to {end_date}: {e}")
+        return None
 
-    if not all_ticks_list:
+    if df.empty:
         st.error(f"No tick data loaded for the selected range {start_date} to {end_date}.")
         return None
 
-    # Concatenate all daily dataframes
-    df = pd.concat(all_ticks_list, ignore_index=True)
-    st.success(f"Concatenated data for {len(all_ticks_list)} days.")
-
-    # Final processing
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'], errors='coerce')
-    df.dropna(subset=['Timestamp'], inplace=True)
-    numeric_cols = ['Open', 'High', 'Low', 'Close', 'Volume', 'Trades', 'BidVolume', 'AskVolume']
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-
+    # Timestamp is parsed and non-null and the numeric columns are float64 in the Parquet dataset
     df.set_index('Timestamp', inplace=True)
-    df.sort_index(inplace=True)
+    # Partitions and the part files within them come back in write (CSV) order;
+    # the stable sort only matters if the CSV itself was out of order
+    if not df.index.is_monotonic_increasing:
+        df.sort_index(inplace=True, kind='stable')
     st.success(f"Loaded and processed {len(df)} tick data rows for the range.")
     return df
 
+def _bucket_ohlcv(ts_ns, open_, high, low, close, volume, bucket_ns):
+    """OHLCV per fixed-width time bucket over sorted int64 nanosecond timestamps.
+
+    NaN handling matches pandas resample: first/last/max/min skip NaN, sum treats NaN as 0.
+    Returns (bucket_start_ns, open, high, low, close, volume) for non-empty buckets.
+    """
+    bucket = ts_ns // bucket_ns
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(bucket)] # exclusive
+
+    def first_valid(x):
+        nan = np.isnan(x)
+        if not nan.any(): # Usual case: gather straight from the bucket boundaries
+            return x[starts]
+        first = np.minimum.reduceat(np.where(nan, len(x), np.arange(len(x))), starts)
+        return np.where(first < ends, x[np.minimum(first, len(x) - 1)], np.nan)
+
+    def last_valid(x):
+        nan = np.isnan(x)
+        if not nan.any():
+            return x[ends - 1]
+        last = np.maximum.reduceat(np.where(nan, -1, np.arange(len(x))), starts)
+        return np.where(last >= starts, x[np.maximum(last, 0)], np.nan)
+
+    return (bucket[starts] * bucket_ns,
+            first_valid(open_),
+            np.fmax.reduceat(high, starts),
+            np.fmin.reduceat(low, starts),
+            last_valid(close),
+            np.add.reduceat(volume if not np.isnan(volume).any() else np.nan_to_num(volume), starts))
+
+def _fixed_bucket_ns(timeframe):
+    """Width of a fixed-duration pandas frequency in ns, or None (e.g. month starts)."""
+    try:
+        return pd.tseries.frequencies.to_offset(timeframe).nanos
+    except ValueError:
+        return None
+
+def _tiles_day(bucket_ns):
+    """True if fixed buckets of this width tile a day (so they match resample's 'start_day' origin)."""
+    return bool(bucket_ns) and (24 * 3600 * 10**9) % bucket_ns == 0
+
+def _kernel_candles(ticks, bucket_ns):
+    """Raw per-bucket OHLCV (empty bins absent, Open unfilled) for sorted tz-naive ticks."""
+    cols = [ticks[c].to_numpy(dtype='float64') for c in OHLCV_COLS]
+    t0, o, h, l, c, v = _bucket_ohlcv(ticks.index.as_unit('ns').asi8, *cols, bucket_ns)
+    return pd.DataFrame({'Open': o, 'High': h, 'Low': l, 'Close': c, 'Volume': v},
+                        index=pd.DatetimeIndex(t0, name=ticks.index.name))
+
+def _finish_candles(ohlc):
+    """Drop empty bins, then fill a missing Open from the previous candle's Close."""
+    ohlc.dropna(subset=['Open', 'High', 'Low', 'Close'], how='all', inplace=True)
+    ohlc['Open'] = ohlc['Open'].fillna(ohlc['Close'].shift(1))
+    return ohlc
+
 def resample_ticks_for_chart(session_ticks, timeframe):
     """Resamples session ticks to OHLC for mplfinance chart."""
     if session_ticks is None or session_ticks.empty:
         return None
     try:
-        ohlc = session_ticks.resample(timeframe, label='left', closed='left').agg(
-            Open=('Open', 'first'),
-            High=('High', 'max'),
-            Low=('Low', 'min'),
-            Close=('Close', 'last'),
-            Volume=('Volume', 'sum') # Keep volume for potential use
-        ).dropna(subset=['Open', 'High', 'Low', 'Close'], how='all')
-        # Forward fill open from previous close only if Open is NaN but Close is not
-        mask = ohlc['Open'].isna() & ohlc['Close'].shift(1).notna()
-        ohlc.loc[mask, 'Open'] = ohlc['Close'].shift(1)
-        # Drop any remaining rows where OHLC are all NaN
-        ohlc.dropna(subset=['Open', 'High', 'Low', 'Close'], how='all', inplace=True)
-        return ohlc
+        bucket_ns = _fixed_bucket_ns(timeframe)
+        if _tiles_day(bucket_ns) and session_ticks.index.tz is None and session_ticks.index.is_monotonic_increasing:
+            return _finish_candles(_kernel_candles(session_ticks, bucket_ns))
+
+        agg = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last',
+               'Volume': 'sum'} # Keep volume for potential use
+        return _finish_candles(session_ticks.resample(timeframe, label='left', closed='left').agg(agg))
     except Exception as e:
         st.error(f"Error resampling ticks for chart: {e}")
         return None
 
+def _day_candles(parquet_dir, day, bucket_ns):
+    """Candles for one date partition, or None if the day has no ticks. No st.* calls (runs in worker threads)."""
+    day_ticks = pd.read_parquet(parquet_dir, columns=['Timestamp'] + OHLCV_COLS,
+                                filters=[('date', '=', day.strftime('%Y-%m-%d'))])
+    if day_ticks.empty:
+        return None
+    day_ticks.set_index('Timestamp', inplace=True)
+    if not day_ticks.index.is_monotonic_increasing:
+        day_ticks.sort_index(inplace=True, kind='stable')
+    return _kernel_candles(day_ticks, bucket_ns)
+
+def load_range_ohlc(tick_file_path, required_cols, start_date, end_date, timeframe):
+    """Builds chart candles for a date range one day-partition at a time.
+
+    Days are read and bucketed in a small thread pool (Parquet decoding and the
+    NumPy kernel release the GIL), so only a few days of ticks are in memory at
+    once. Timeframes that don't tile a day fall back to loading the whole range
+    and resampling it.
+    """
+    bucket_ns = _fixed_bucket_ns(timeframe)
+    if not _tiles_day(bucket_ns):
+        return resample_ticks_for_chart(
+            load_range_tick_data(tick_file_path, required_cols, start_date, end_date), timeframe)
+    if not os.path.exists(tick_file_path):
+        st.error(f"Tick data file not found: {tick_file_path}")
+        return None
+
+    st.info(f"Building {timeframe} candles from {start_date} to {end_date}...")
+    day_candles = []
+    try:
+        ensure_tick_parquet(tick_file_path, required_cols, TICK_PARQUET_DIR)
+        days = [start_date + datetime.timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+        progress = st.progress(0.0)
+        with ThreadPoolExecutor(max_workers=max(1, min(8, len(days)))) as ex:
+            # map keeps date order; progress is updated here, on the script thread
+            for done, candles in enumerate(ex.map(lambda d: _day_candles(TICK_PARQUET_DIR, d, bucket_ns), days), 1):
+                if candles is not None:
+                    day_candles.append(candles)
+                progress.progress(done / len(days))
+        progress.empty()
+    except Exception as e:
+        st.error(f"Error building candles for {start_date} to {end_date}: {e}")
+        return None
+
+    if not day_candles:
+        st.error(f"No tick data loaded for the selected range {start_date} to {end_date}.")
+        return None
+    return _finish_candles(pd.concat(day_candles))
+
+def align_vwap(vwap_df, col, index):
+    """Backward as-of match of one VWAP column onto the candle index."""
+    right = vwap_df[[col]]
+    if not right.index.is_monotonic_increasing: right = right.sort_index()
+    if right.index.dtype != index.dtype: right = right.set_axis(right.index.as_unit(index.unit)) # e.g. us vs ns
+    return pd.merge_asof(pd.DataFrame(index=index), right, left_index=True, right_index=True,
+                         direction='backward')[col]
+
+def has_vwap_until(vwap_df, col, until):
+    """True if `col` has a non-NaN value at or before `until` (i.e. the as-of alignment isn't all NaN)."""
+    if col not in vwap_df.columns:
+        return False
+    values = vwap_df[col]
+    # Sorted index: binary-search slice, then a scan from the end that stops at the first value
+    values = values.loc[:until] if values.index.is_monotonic_increasing else values[values.index <= until]
+    return values.last_valid_index() is not None
+
 # --- Calculation Functions ---
-# @st.cache_data # Commented out - Function no longer called directly here
+def _frame_fingerprint(df):
+    """Cheap cache key for a loaded frame: shape, columns and a hash of the index."""
+    return (df.shape, df.columns.tolist(), int(pd.util.hash_pandas_object(df.index).sum()))
+
+@st.cache_data(hash_funcs={pd.DataFrame: _frame_fingerprint}) # Pure function of the two frames
 def get_weekly_rotation_status(summary_df, key_levels_df):
     """Calculates which weeks had a full Monday H/L rotation (Tue-Fri)
        and returns the Monday High/Low for those weeks.
@@ -248,7 +515,8 @@ def get_weekly_rotation_status(summary_df, key_levels_df):
     # --- End Merge --- 
 
     # ... Add Week and DayOfWeek ...
-    df_merged['WeekOfYearMon'] = df_merged['SessionStart'].dt.strftime('%Y-%W')
+    iso = df_merged['SessionStart'].dt.isocalendar() # Monday-based ISO week, int key (e.g. 202410)
+    df_merged['WeekOfYearMon'] = iso['year'].astype('int64') * 100 + iso['week'].astype('int64')
     df_merged['DayOfWeek'] = df_merged['SessionStart'].dt.dayofweek
 
     # Filter for Tue-Fri
@@ -281,13 +549,22 @@ def get_weekly_rotation_status(summary_df, key_levels_df):
     st.success("Weekly rotation levels calculated.") # Update message
     return rotation_week_levels # Return DataFrame with MonH/L for rotation weeks
 
+def chart_figure():
+    """One candle+volume figure per browser session, cleared and redrawn on each click."""
+    if 'chart_fig' not in st.session_state:
+        fig = mpf.figure(figsize=(15, 8), style=CANDLE_STYLE)
+        plt.close(fig) # Detach from pyplot's registry: the session owns it, st.pyplot only needs savefig
+        ax_price = fig.add_subplot(4, 1, (1, 3))
+        ax_vol = fig.add_subplot(4, 1, 4, sharex=ax_price)
+        st.session_state['chart_fig'] = (fig, ax_price, ax_vol)
+    return st.session_state['chart_fig']
+
 # --- Streamlit App Layout ---
 st.set_page_config(layout="wide")
 st.title("BTCUSDT.P Session Data & Structure Viewer") # Updated title
 
 # --- Load Data --- 
 summary_df = load_summary_data(DATABASE_PATH, SESSION_SUMMARY_TABLE)
-key_levels_df = load_key_levels_data(DATABASE_PATH, KEY_LEVELS_TABLE)
 vwap_df = load_session_vwap_data(DATABASE_PATH, VWAP_TABLE) # Load VWAP data
 
 # Calculate rotation status
@@ -299,9 +576,9 @@ if summary_df is not None:
     show_summary = st.checkbox("Show Summary Table", value=False, key='show_summary')
     if show_summary:
         with st.container(height=400):
-             st.dataframe(summary_df.style.format({col: '{:.1f}' 
-                for col in summary_df.select_dtypes(include=np.number).columns if col not in ['SessionTicks'] 
-            }, na_rep="None"))
+             st.dataframe(summary_df, column_config={
+                 col: st.column_config.NumberColumn(format='%.1f')
+                 for col in summary_df.select_dtypes(include=np.number).columns.difference(['SessionTicks'])})
         
 # --- Display Key Levels Table (Conditional) ---
 st.header("Key Levels Data")
@@ -320,16 +597,18 @@ level_view_choice = st.radio(
     key='level_view'
 )
 
+level_view_cols = period_level_cols if level_view_choice == "Period Levels" else prev_session_level_cols
+key_levels_df = load_key_levels_data(DATABASE_PATH, KEY_LEVELS_TABLE, tuple(level_view_cols))
+
 if key_levels_df is not None:
-    if level_view_choice == "Period Levels":
-        cols_to_show = [col for col in period_level_cols if col in key_levels_df.columns]
-    else:
-        cols_to_show = [col for col in prev_session_level_cols if col in key_levels_df.columns]
+    cols_to_show = [col for col in level_view_cols if col in key_levels_df.columns]
     
     if cols_to_show:
          df_to_display = key_levels_df[cols_to_show]
          with st.container(height=400):
-              st.dataframe(df_to_display.style.format({col: '{:.1f}' for col in df_to_display.select_dtypes(include=np.number).columns}, na_rep="None"))
+              st.dataframe(df_to_display, column_config={
+                  col: st.column_config.NumberColumn(format='%.1f')
+                  for col in df_to_display.select_dtypes(include='number').columns})
     else:
          st.warning(f"Selected columns for view '{level_view_choice}' not found in data.")
 else:
@@ -350,10 +629,9 @@ if show_indicators:
                 df_vwap_display = df_vwap_display[cols]
             
             with st.container(height=400):
-                 st.dataframe(df_vwap_display.style.format({ 
-                    col: '{:.1f}'
-                    for col in df_vwap_display.select_dtypes(include=np.number).columns
-                }, na_rep="None"))
+                 st.dataframe(df_vwap_display, column_config={
+                     col: st.column_config.NumberColumn(format='%.1f')
+                     for col in df_vwap_display.select_dtypes(include=np.number).columns})
         else:
              st.info("No RVWAP columns found in the loaded VWAP data.")
     else:
@@ -380,146 +658,140 @@ if summary_df is not None:
     with col4:
         # --- VWAP Selection --- 
         st.markdown("**Overlays:**")
-        show_vwap30 = st.checkbox("VWAP 30", value=True)
-        show_vwap365 = st.checkbox("VWAP 365", value=False)
+        vwap_selected = [(col, plot_kw) for label, col, checked, plot_kw in VWAP_OVERLAYS
+                         if st.checkbox(label, value=checked)]
         # ----------------------
         
     if st.button("Generate Chart"):
         if start_date > end_date:
             st.error("Error: End date must fall after start date.")
         else:
-            range_ticks_df = load_range_tick_data(TICK_DATA_PATH, TICK_DATA_COLS, start_date, end_date)
-            if range_ticks_df is not None:
-                ohlc_data = resample_ticks_for_chart(range_ticks_df, selected_tf_freq)
-                if ohlc_data is not None and not ohlc_data.empty:
-                    st.success("OHLC data prepared.")
+            ohlc_data = load_range_ohlc(TICK_DATA_PATH, TICK_DATA_COLS, start_date, end_date, selected_tf_freq)
+            if ohlc_data is not None and not ohlc_data.empty:
+                st.success("OHLC data prepared.")
                     
-                    # --- Prepare VWAP data & addplots --- 
-                    addplot_list = []
-                    if vwap_df is not None:
-                        # Reindex VWAP data to match OHLC index, ffill
-                        vwap_plot_data = vwap_df.reindex(ohlc_data.index, method='ffill')
-                        
-                        # --- FIX: Calculate VWAP 30 col name separately --- 
-                        vwap_window_30 = config.ROLLING_VWAP_WINDOW if hasattr(config, 'ROLLING_VWAP_WINDOW') else 30
-                        vwap_col_name_30 = f'RVWAP_{vwap_window_30}'
-                        # --- END FIX --- 
-                        
-                        if show_vwap30:
-                            if vwap_col_name_30 in vwap_plot_data.columns and not vwap_plot_data[vwap_col_name_30].isnull().all():
-                                addplot_list.append(mpf.make_addplot(vwap_plot_data[vwap_col_name_30], color='purple', width=1.0, panel=0, ylabel='VWAP'))
-                            else: st.warning("No RVWAP 30 data available for this range/timeframe.")
-                        
-                        # FIX: Use RVWAP_365
-                        if show_vwap365:
-                            vwap_col_name_365 = 'RVWAP_365' 
-                            if vwap_col_name_365 in vwap_plot_data.columns and not vwap_plot_data[vwap_col_name_365].isnull().all():
-                                addplot_list.append(mpf.make_addplot(vwap_plot_data[vwap_col_name_365], color='blue', width=1.2, linestyle='--', panel=0))
-                            else: st.warning("No RVWAP 365 data available for this range/timeframe.")
-                    # ---------------------------------------
+                # --- Prepare VWAP data & addplots --- 
+                vwap_plots = [] # (aligned series, addplot kwargs); the addplots need the price axes
+                if vwap_df is not None:
+                    # Only the checked columns are aligned to the candles (as-of, last known value)
+                    for vwap_col, plot_kw in vwap_selected:
+                        if has_vwap_until(vwap_df, vwap_col, ohlc_data.index[-1]):
+                            vwap_plots.append((align_vwap(vwap_df, vwap_col, ohlc_data.index), plot_kw))
+                        else: st.warning(f"No {vwap_col} data available for this range/timeframe.")
+                # ---------------------------------------
                     
-                    # ... (Filter sessions_in_range) ...
-                    sessions_in_range = summary_df[(summary_df['Date'] >= start_date) & (summary_df['Date'] <= end_date)].sort_values(by=['Date', 'SessionStart']).copy()
-                    sessions_in_range.dropna(subset=['TPO_POC', 'VAH', 'VAL'], inplace=True) 
-
-                    st.info(f"Plotting {len(ohlc_data)} candles...")
-                    try:
-                        mc = mpf.make_marketcolors(up='#26a69a', down='#ef5350', inherit=True)
-                        s = mpf.make_mpf_style(marketcolors=mc, gridstyle=':')
-                        
-                        chart_title = f"Chart: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')} ({selected_tf_label})"
-                        if addplot_list: chart_title += " & VWAP(s)"
-                        
-                        fig, axlist = mpf.plot(ohlc_data,
-                                               type='candle',
-                                               style=s,
-                                               title=chart_title,
-                                               ylabel='Price',
-                                               volume=True, 
-                                               addplot=addplot_list if addplot_list else None, 
-                                               returnfig=True,
-                                               figsize=(15, 8))
-
-                        ax = axlist[0]
-                        ax.yaxis.set_major_formatter(mticker.FormatStrFormatter('$%.1f'))
-
-                        # --- Plot Rotation Week Mon H/L Lines --- 
-                        # if rotation_status is not None and not rotation_status.empty:
-                        #     st.info(f"Highlighting Monday levels for {len(rotation_status)} rotation week(s).")
-                        #     ohlc_index = ohlc_data.index # Get the index from plotted data
-                        #     # Iterate through the rotation weeks data (Index=WeekStr, Columns=MondayHigh, MondayLow)
-                        #     for week_str, levels in rotation_status.iterrows():
-                        #         mon_high = levels['MondayHigh']
-                        #         mon_low = levels['MondayLow']
-                        #         
-                        #         # Find start/end dates for this week
-                        #         try:
-                        #             year, week_num = map(int, week_str.split('-'))
-                        #             week_start_date = datetime.datetime.strptime(f'{year}-{week_num}-1', "%Y-%W-%w")
-                        #             week_end_date = week_start_date + datetime.timedelta(days=7)
-                        #         except ValueError: continue # Skip if week string format is wrong
-                        #         
-                        #         # Find integer index locations for the week span
-                        #         try:
-                        #             start_loc = ohlc_index.searchsorted(week_start_date)
-                        #             end_loc_insert = ohlc_index.searchsorted(week_end_date) 
-                        #             end_loc = end_loc_insert - 1
-                        #             if end_loc_insert < len(ohlc_index) and ohlc_index[end_loc_insert] == week_end_date: end_loc = end_loc_insert # Adjust if end is exact match
-                        #             if start_loc >= len(ohlc_index) or end_loc < 0 or start_loc > end_loc: continue
-                        #             
-                        #             # Plot Mon High and Low lines for this week span
-                        #             line_width = 1.5
-                        #             line_style = '-'
-                        #             line_color = '#00BCD4' # Cyan color
-                        #             if not pd.isna(mon_high): 
-                        #                 ax.plot(range(start_loc, end_loc + 1), [mon_high]*(end_loc - start_loc + 1), 
-                        #                         color=line_color, linestyle=line_style, linewidth=line_width, label='MonHigh (Rot Wk)' if week_str==rotation_status.index[0] else "") # Label once
-                        #             if not pd.isna(mon_low):  
-                        #                 ax.plot(range(start_loc, end_loc + 1), [mon_low]*(end_loc - start_loc + 1), 
-                        #                         color=line_color, linestyle=line_style, linewidth=line_width, label='MonLow (Rot Wk)' if week_str==rotation_status.index[0] else "") # Label once
-                        # 
-                        #         except Exception as e_loc:
-                        #             print(f"Warning: Could not plot Mon H/L lines for week {week_str}: {e_loc}")
-                        # --------------------------------------
-
-                        # --- Plot session lines using integer indices (Remains the same) --- 
-                        if not (selected_tf_freq.endswith('D') or selected_tf_freq.startswith('W')):
-                            st.info(f"Overlaying structure for {len(sessions_in_range)} sessions...")
-                            line_colors = {'Asia': 'blue', 'London': 'purple', 'NewYork': 'grey'}
-                            poc_style = '--'
-                            va_style = ':'
-                            ohlc_index = ohlc_data.index
-                            for idx, session_row in sessions_in_range.iterrows():
-                                s_start = session_row['SessionStart']
-                                s_end = session_row['SessionEnd']
-                                s_poc = session_row['TPO_POC']
-                                s_vah = session_row['VAH']
-                                s_val = session_row['VAL']
-                                s_name = session_row['Sessions']
-                                s_color = line_colors.get(s_name, 'black')
-                                try:
-                                    start_loc = ohlc_index.searchsorted(s_start)
-                                    end_loc_insert = ohlc_index.searchsorted(s_end)
-                                    end_loc = end_loc_insert - 1 
-                                    if end_loc_insert < len(ohlc_index) and ohlc_index[end_loc_insert] == s_end:
-                                        end_loc = end_loc_insert
-                                    if start_loc >= len(ohlc_index) or end_loc < 0 or start_loc > end_loc: continue 
-                                except Exception: continue 
-                                if not pd.isna(s_poc): ax.plot(range(start_loc, end_loc + 1), [s_poc]*(end_loc - start_loc + 1), color=s_color, linestyle=poc_style, linewidth=1.2)
-                                if not pd.isna(s_vah): ax.plot(range(start_loc, end_loc + 1), [s_vah]*(end_loc - start_loc + 1), color=s_color, linestyle=va_style, linewidth=1.0)
-                                if not pd.isna(s_val): ax.plot(range(start_loc, end_loc + 1), [s_val]*(end_loc - start_loc + 1), color=s_color, linestyle=va_style, linewidth=1.0)
-                        else:
-                            st.info("Session structure lines hidden for Daily or longer timeframes.")
-
-                        st.pyplot(fig)
-                        plt.close(fig)
-
-                    except Exception as e:
-                        st.error(f"Error generating mplfinance plot: {e}")
-                else:
-                    st.warning("No OHLC data generated for the selected range/timeframe.")
+                # ... (Filter sessions_in_range) ...
+                sessions_in_range = load_summary_range(DATABASE_PATH, SESSION_SUMMARY_TABLE, start_date, end_date)
+                if sessions_in_range is None:
+                    sessions_in_range = summary_df.iloc[0:0]
+                sessions_in_range = sessions_in_range.dropna(subset=['TPO_POC', 'VAH', 'VAL'])
+
+                st.info(f"Plotting {len(ohlc_data)} candles...")
+                try:
+                    chart_title = f"Chart: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')} ({selected_tf_label})"
+                    if vwap_plots: chart_title += " & VWAP(s)"
+
+                    # Reuse this session's figure: clearing the axes up front also drops
+                    # anything left half-drawn by a render that raised
+                    fig, ax, ax_vol = chart_figure()
+                    ax.clear(); ax_vol.clear()
+                    addplot_list = [mpf.make_addplot(series, ax=ax, **plot_kw) for series, plot_kw in vwap_plots]
+                    mpf.plot(ohlc_data,
+                             type='candle',
+                             ax=ax,
+                             volume=ax_vol,
+                             axtitle=chart_title,
+                             ylabel='Price',
+                             addplot=addplot_list if addplot_list else None)
+
+                    ax.yaxis.set_major_formatter(mticker.FormatStrFormatter('$%.1f'))
+
+                    # --- Plot Rotation Week Mon H/L Lines --- 
+                    # if rotation_status is not None and not rotation_status.empty:
+                    #     st.info(f"Highlighting Monday levels for {len(rotation_status)} rotation week(s).")
+                    #     ohlc_index = ohlc_data.index # Get the index from plotted data
+                    #     # Iterate through the rotation weeks data (Index=int ISO week key yyyyww, Columns=MondayHigh, MondayLow)
+                    #     for week_key, levels in rotation_status.iterrows():
+                    #         mon_high = levels['MondayHigh']
+                    #         mon_low = levels['MondayLow']
+                    #         
+                    #         # Find start/end dates for this week
+                    #         try:
+                    #             week_start_date = datetime.datetime.combine(datetime.date.fromisocalendar(week_key // 100, week_key % 100, 1), datetime.time())
+                    #             week_end_date = week_start_date + datetime.timedelta(days=7)
+                    #         except ValueError: continue # Skip if week key is out of range
+                    #         
+                    #         # Find integer index locations for the week span
+                    #         try:
+                    #             start_loc = ohlc_index.searchsorted(week_start_date)
+                    #             end_loc_insert = ohlc_index.searchsorted(week_end_date) 
+                    #             end_loc = end_loc_insert - 1
+                    #             if end_loc_insert < len(ohlc_index) and ohlc_index[end_loc_insert] == week_end_date: end_loc = end_loc_insert # Adjust if end is exact match
+                    #             if start_loc >= len(ohlc_index) or end_loc < 0 or start_loc > end_loc: continue
+                    #             
+                    #             # Plot Mon High and Low lines for this week span
+                    #             line_width = 1.5
+                    #             line_style = '-'
+                    #             line_color = '#00BCD4' # Cyan color
+                    #             if not pd.isna(mon_high): 
+                    #                 ax.plot(range(start_loc, end_loc + 1), [mon_high]*(end_loc - start_loc + 1), 
+                    #                         color=line_color, linestyle=line_style, linewidth=line_width, label='MonHigh (Rot Wk)' if week_key==rotation_status.index[0] else "") # Label once
+                    #             if not pd.isna(mon_low):  
+                    #                 ax.plot(range(start_loc, end_loc + 1), [mon_low]*(end_loc - start_loc + 1), 
+                    #                         color=line_color, linestyle=line_style, linewidth=line_width, label='MonLow (Rot Wk)' if week_key==rotation_status.index[0] else "") # Label once
+                    # 
+                    #         except Exception as e_loc:
+                    #             print(f"Warning: Could not plot Mon H/L lines for week {week_key}: {e_loc}")
+                    # --------------------------------------
+
+                    # --- Plot session lines using integer indices (Remains the same) --- 
+                    if not (selected_tf_freq.endswith('D') or selected_tf_freq.startswith('W')):
+                        st.info(f"Overlaying structure for {len(sessions_in_range)} sessions...")
+                        line_colors = {'Asia': 'blue', 'London': 'purple', 'NewYork': 'grey'}
+                        poc_style = '--'
+                        va_style = ':'
+                        ohlc_index = ohlc_data.index
+                        # Candle positions for every session in two bulk searchsorted calls
+                        try:
+                            session_ends = sessions_in_range['SessionEnd'].to_numpy()
+                            start_locs = ohlc_index.searchsorted(sessions_in_range['SessionStart'].to_numpy())
+                            end_locs_insert = ohlc_index.searchsorted(session_ends)
+                            # End is inclusive only if a candle starts exactly at SessionEnd
+                            exact_end = (end_locs_insert < len(ohlc_index)) & \
+                                        (ohlc_index.to_numpy()[np.minimum(end_locs_insert, len(ohlc_index) - 1)] == session_ends)
+                            end_locs = np.where(exact_end, end_locs_insert, end_locs_insert - 1)
+                        except Exception:
+                            start_locs = end_locs = np.empty(0, dtype=int) # e.g. tz mismatch: skip overlays
+                        session_rows = zip(start_locs, end_locs,
+                                           sessions_in_range['TPO_POC'].to_numpy(),
+                                           sessions_in_range['VAH'].to_numpy(),
+                                           sessions_in_range['VAL'].to_numpy(),
+                                           sessions_in_range['Sessions'].to_numpy())
+                        # Horizontal segments collected per style, drawn as one artist each
+                        poc_segs, poc_colors, va_segs, va_colors = [], [], [], []
+                        for start_loc, end_loc, s_poc, s_vah, s_val, s_name in session_rows:
+                            if start_loc >= len(ohlc_index) or end_loc < 0 or start_loc > end_loc: continue
+                            s_color = line_colors.get(s_name, 'black')
+                            if not pd.isna(s_poc):
+                                poc_segs.append([(start_loc, s_poc), (end_loc, s_poc)]); poc_colors.append(s_color)
+                            for s_level in (s_vah, s_val):
+                                if not pd.isna(s_level):
+                                    va_segs.append([(start_loc, s_level), (end_loc, s_level)]); va_colors.append(s_color)
+                        if poc_segs:
+                            ax.add_collection(LineCollection(poc_segs, colors=poc_colors, linestyles=poc_style, linewidths=1.2))
+                        if va_segs:
+                            ax.add_collection(LineCollection(va_segs, colors=va_colors, linestyles=va_style, linewidths=1.0))
+                        if poc_segs or va_segs:
+                            ax.autoscale_view() # add_collection updates data limits but, unlike plot, doesn't rescale
+                    else:
+                        st.info("Session structure lines hidden for Daily or longer timeframes.")
+
+                    st.pyplot(fig) # Session-owned figure - do not close
+
+                except Exception as e:
+                    st.error(f"Error generating mplfinance plot: {e}")
             else:
-                 st.warning(f"Could not load tick data for the selected range.")
+                st.warning("No OHLC data generated for the selected range/timeframe.")
 else:
     st.error("Failed to load session summary data. Cannot display application.")
 
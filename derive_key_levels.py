@@ -10,7 +10,12 @@ import numpy as np
 import sqlite3
 import os
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 import config # Import config for any needed params (e.g., session times if relevant later)
+try:
+    import adbc_driver_sqlite.dbapi as sqlite_adbc # Optional: Arrow-native SQLite reads
+except ImportError:
+    sqlite_adbc = None
 
 # --- Constants ---
 DATABASE_PATH = 'crypto_data.db'
@@ -22,8 +27,26 @@ ROLLING_VWAP_WINDOW = 30
 VWAP_WINDOWS = [30, 365]
 # Define sessions to EXCLUDE from default indicator calculations
 EXCLUDE_SESSIONS = ['Overnight', 'Weekend-Sat', 'Weekend-Sun']  # keep overlap session
+# The only session_summary columns the VWAP / key-level calculations read
+SESSION_COLUMNS = ['Date', 'Sessions', 'SessionStart',
+                   'SessionOpen', 'SessionHigh', 'SessionLow', 'SessionClose', 'SessionVolume']
 
 # --- Data Loading ---
+def _read_sql_frame(conn, db_path, query, date_cols):
+    """Runs `query` into a DataFrame, parsing `date_cols` as datetimes.
+
+    With adbc_driver_sqlite installed the result arrives as one Arrow table (no Python
+    tuple per row); otherwise it goes through the sqlite3 connection as before.
+    """
+    if sqlite_adbc is not None:
+        with sqlite_adbc.connect(db_path) as adbc_conn, adbc_conn.cursor() as cur:
+            cur.execute(query)
+            df = cur.fetch_arrow_table().to_pandas() # NumPy dtypes, same as the sqlite3 path
+        for col in date_cols:
+            df[col] = pd.to_datetime(df[col])
+        return df
+    return pd.read_sql_query(query, conn, parse_dates=date_cols)
+
 def load_session_data(db_path, table_name, exclude_sessions=True):
     """Loads session summary data, optionally excluding specific sessions."""
     if not os.path.exists(db_path):
@@ -31,30 +54,33 @@ def load_session_data(db_path, table_name, exclude_sessions=True):
         return None
     try:
         conn = sqlite3.connect(db_path)
-        query_exists = f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}';"
-        if not pd.read_sql(query_exists, conn).shape[0] > 0: 
+        table_cols = [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")]
+        if not table_cols: 
             print(f"Error: Table '{table_name}' not found."); conn.close(); return None
         
-        # Load all columns initially to allow filtering by session name
-        query = f"SELECT * FROM {table_name}"
-        df = pd.read_sql(query, conn, parse_dates=['Date', 'SessionStart', 'SessionEnd']) # Ensure SessionEnd is also parsed if needed later
+        # Only the columns used below; the session filter and the sort run inside SQLite
+        query = f"SELECT {', '.join(col for col in SESSION_COLUMNS if col in table_cols)} FROM {table_name}"
+        # --- FIX: Filter out excluded sessions BEFORE sorting/processing --- 
+        if exclude_sessions and 'Sessions' in table_cols:
+            excluded = ", ".join(f"'{s}'" for s in EXCLUDE_SESSIONS)
+            where = f" WHERE Sessions IS NULL OR Sessions NOT IN ({excluded})"
+            n_excluded = conn.execute(f"SELECT COUNT(*) FROM {table_name} WHERE Sessions IN ({excluded})").fetchone()[0]
+            print(f"Filtered out {n_excluded} rows for sessions: {EXCLUDE_SESSIONS}")
+            query += where
+        # --- END FIX ---
+        # Sessions breaks ties between sessions that share a start (e.g. LDN_NY_Overlap / NewYork),
+        # so the previous-session levels below do not depend on the stored row order
+        query += " ORDER BY Date, SessionStart" + (", Sessions" if 'Sessions' in table_cols else "")
+        df = _read_sql_frame(conn, db_path, query, ['Date', 'SessionStart'])
         conn.close()
-        df['Date'] = pd.to_datetime(df['Date']).dt.date
+        # Midnight datetime64 rather than datetime.date objects: int64-keyed sorts/merges, no object column
+        df['Date'] = pd.to_datetime(df['Date']).dt.normalize()
         # Convert relevant columns to numeric
         num_cols = ["SessionOpen", "SessionHigh", "SessionLow", "SessionClose", "SessionVolume"]
         for col in num_cols:
              if col in df.columns:
                 df[col] = pd.to_numeric(df[col], errors='coerce')
         df.dropna(subset=num_cols, inplace=True)
-        
-        # --- FIX: Filter out excluded sessions BEFORE sorting/processing --- 
-        if exclude_sessions and 'Sessions' in df.columns:
-            initial_count = len(df)
-            df = df[~df['Sessions'].isin(EXCLUDE_SESSIONS)]
-            print(f"Filtered out {initial_count - len(df)} rows for sessions: {EXCLUDE_SESSIONS}")
-        # --- END FIX ---
-            
-        df.sort_values(by=['Date', 'SessionStart'], inplace=True)
         df.reset_index(drop=True, inplace=True)
         print(f"Loaded and validated {len(df)} rows from {table_name} for calculations.")
         return df
@@ -64,32 +90,48 @@ def load_session_data(db_path, table_name, exclude_sessions=True):
 
 # --- Indicator Calculations ---
 
-def calculate_rolling_vwap(df, window):
-    """Calculates a rolling VWAP for a specific window."""
-    print(f"Calculating {window}-session rolling VWAP...")
-    vwap_col_name = f'RVWAP_{window}'
-    if vwap_col_name in df.columns:
-        print(f"{vwap_col_name} already exists, skipping recalculation.")
-        return df
-    
-    if df is None or not all(c in df.columns for c in ['SessionHigh', 'SessionLow', 'SessionClose', 'SessionVolume']):
-        print(f"Error: Missing required columns for RVWAP {window} calculation.")
-        return df 
-    
-    # Calculate Typical Price and PV if not already present
-    if 'TypicalPrice' not in df.columns:
-        df['TypicalPrice'] = (df['SessionHigh'] + df['SessionLow'] + df['SessionClose'] ) / 3
-    if 'PV' not in df.columns:
-        df['PV'] = df['TypicalPrice'] * df['SessionVolume']
-    
-    rolling_pv_sum = df['PV'].rolling(window=window, min_periods=window).sum()
-    rolling_volume_sum = df['SessionVolume'].rolling(window=window, min_periods=window).sum()
-    
-    # Calculate Rolling VWAP, handle potential division by zero
-    df[vwap_col_name] = np.where(rolling_volume_sum != 0, rolling_pv_sum / rolling_volume_sum, np.nan)
-    
-    print(f"{vwap_col_name} calculation complete.")
-    return df # Return the modified DataFrame
+def _rolling_sum(values, window):
+    """Trailing sum over `window` rows (NaN until the window is full), from one cumsum.
+
+    Same result as Series.rolling(window, min_periods=window).sum() for NaN-free
+    input, without building a Rolling object; NaN input falls back to pandas.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if np.isnan(values).any():
+        return pd.Series(values).rolling(window=window, min_periods=window).sum().to_numpy()
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        csum = np.cumsum(values)
+        out[window - 1:] = csum[window - 1:] - np.concatenate(([0.0], csum[:-window]))
+    return out
+
+def compute_rvwap(pv, volume, window):
+    """Rolling VWAP for one window as a NumPy array (NaN until the window fills or where volume sums to 0).
+
+    `pv` is TypicalPrice * SessionVolume, computed once by the caller for all windows.
+    """
+    rolling_pv_sum = _rolling_sum(pv, window)
+    rolling_volume_sum = _rolling_sum(volume, window)
+    return np.divide(rolling_pv_sum, rolling_volume_sum,
+                     out=np.full_like(rolling_pv_sum, np.nan), where=rolling_volume_sum != 0)
+
+def _period_ohlc(df, period_key, prefix):
+    """First open / max high / min low per period, indexed by period start.
+
+    Only periods that contain sessions are returned (like resample(...).agg(...).dropna()).
+    """
+    return df.groupby(period_key).agg(**{
+        f'{prefix}Open': ('SessionOpen', 'first'),
+        f'{prefix}High': ('SessionHigh', 'max'),
+        f'{prefix}Low': ('SessionLow', 'min'),
+    }).dropna()
+
+def _shift_down(values):
+    """values shifted one row later (NaN first), keeping the dtype; Series.shift(1) without the frame."""
+    out = np.empty_like(values)
+    out[:1] = np.nan
+    out[1:] = values[:-1]
+    return out
 
 def calculate_key_levels(df):
     """Calculates periodic key levels."""
@@ -98,8 +140,11 @@ def calculate_key_levels(df):
         print("Error: Input DataFrame is None.")
         return None
 
+    # Work on just the columns the levels are built from, so every resample,
+    # shift and merge below moves 5 columns rather than the whole summary row.
     # Keep the raw UTC column for later joins
-    df['SessionStartUTC'] = pd.to_datetime(df['SessionStart'])
+    df = df[['Date', 'SessionOpen', 'SessionHigh', 'SessionLow', 'SessionClose']].assign(
+        SessionStartUTC=pd.to_datetime(df['SessionStart']))
 
     # --- Apply exchange‑offset so that week/day boundaries match TradingView ---
     EX_OFFSET_HRS = getattr(config, 'EXCHANGE_UTC_OFFSET_HRS', 0)  # e.g. 0 for UTC, +8 for UTC+8
@@ -109,13 +154,25 @@ def calculate_key_levels(df):
     # set as index but *retain* the column for downstream merges
     df.set_index('AdjSessionStart', drop=False, inplace=True)
 
+    # --- Period keys: each session's period start as datetime64, all in one vectorised pass ---
+    # (grouping on these replaces six resample() calls that each rebinned the whole timeline)
+    if not df.index.is_monotonic_increasing:
+        df.sort_index(kind='stable', inplace=True)
+    t = df.index.values # datetime64[ns]
+    day_key = t.astype('datetime64[D]')
+    # W-MON resample bins are right-closed/right-labelled on whole days: a session is
+    # labelled with the first Monday on or after its calendar day
+    days_to_monday = (7 - (day_key.astype(np.int64) + 3) % 7) % 7 # 1970-01-01 was a Thursday (3)
+    week_key = day_key + days_to_monday.astype('timedelta64[D]')
+    month_num = t.astype('datetime64[M]').astype(np.int64)
+    month_key = month_num.astype('datetime64[M]')
+    quarter_key = (month_num - month_num % 3).astype('datetime64[M]')
+    year_key = t.astype('datetime64[Y]')
+    to_ns = lambda key: key.astype('datetime64[ns]')
+
     # --- Create Daily Aggregates --- 
     # Group by date to get daily high/low/open
-    daily_agg = df.resample('D').agg(
-        DailyOpen=('SessionOpen', 'first'),
-        DailyHigh=('SessionHigh', 'max'),
-        DailyLow=('SessionLow', 'min')
-    ).dropna()
+    daily_agg = _period_ohlc(df, to_ns(day_key), 'Daily')
     
     # Calculate Daily Mid
     daily_agg['DailyMid'] = (daily_agg['DailyHigh'] + daily_agg['DailyLow']) / 2
@@ -126,84 +183,40 @@ def calculate_key_levels(df):
     daily_agg['PrevDailyMid'] = daily_agg['DailyMid'].shift(1)
 
     # --- Create Weekly Aggregates (Starting Monday) --- 
-    weekly_agg = df.resample('W-MON').agg(
-        WeeklyOpen=('SessionOpen', 'first'),
-        WeeklyHigh=('SessionHigh', 'max'),
-        WeeklyLow=('SessionLow', 'min') 
-    ).dropna()
+    weekly_agg = _period_ohlc(df, to_ns(week_key), 'Weekly')
     weekly_agg['WeeklyMid'] = (weekly_agg['WeeklyHigh'] + weekly_agg['WeeklyLow']) / 2
     weekly_agg['PrevWeekHigh'] = weekly_agg['WeeklyHigh'].shift(1)
     weekly_agg['PrevWeekLow'] = weekly_agg['WeeklyLow'].shift(1)
     weekly_agg['PrevWeekMid'] = weekly_agg['WeeklyMid'].shift(1)
 
     # --- Monday Specific Levels --- 
-    mondays_df = df[df.index.dayofweek == 0] # Monday == 0
-    monday_agg = mondays_df.resample('W-MON').agg(
-         MondayOpen=('SessionOpen', 'first'), # Technically same as Weekly Open
-         MondayHigh=('SessionHigh', 'max'),
-         MondayLow=('SessionLow', 'min')
-    ).dropna()
+    is_monday = df.index.dayofweek == 0 # Monday == 0
+    monday_agg = _period_ohlc(df[is_monday], to_ns(week_key[is_monday]), 'Monday') # MondayOpen technically same as Weekly Open
     monday_agg['MondayMid'] = (monday_agg['MondayHigh'] + monday_agg['MondayLow']) / 2
     monday_agg['MondayRange'] = monday_agg['MondayHigh'] - monday_agg['MondayLow']
     # We need previous Monday levels, so shift applies here too if needed by spec (spec says Monday H/L/Mid, implying *current* Monday)
 
     # --- Monthly Aggregates --- 
-    monthly_agg = df.resample('MS').agg( # MS for Month Start
-        MonthlyOpen=('SessionOpen', 'first'),
-        MonthlyHigh=('SessionHigh', 'max'),
-        MonthlyLow=('SessionLow', 'min')
-    ).dropna()
+    monthly_agg = _period_ohlc(df, to_ns(month_key), 'Monthly')
     monthly_agg['MonthlyMid'] = (monthly_agg['MonthlyHigh'] + monthly_agg['MonthlyLow']) / 2
     monthly_agg['PrevMonthHigh'] = monthly_agg['MonthlyHigh'].shift(1)
     monthly_agg['PrevMonthLow'] = monthly_agg['MonthlyLow'].shift(1)
     monthly_agg['PrevMonthMid'] = monthly_agg['MonthlyMid'].shift(1)
 
     # --- Quarterly Aggregates --- 
-    quarterly_agg = df.resample('QS').agg( # QS for Quarter Start
-        QuarterlyOpen=('SessionOpen', 'first'),
-        QuarterlyHigh=('SessionHigh', 'max'),
-        QuarterlyLow=('SessionLow', 'min')
-    ).dropna()
+    quarterly_agg = _period_ohlc(df, to_ns(quarter_key), 'Quarterly')
     quarterly_agg['QuarterlyMid'] = (quarterly_agg['QuarterlyHigh'] + quarterly_agg['QuarterlyLow']) / 2
     quarterly_agg['PrevQuarterMid'] = quarterly_agg['QuarterlyMid'].shift(1)
 
     # --- Yearly Aggregates --- 
-    yearly_agg = df.resample('YS').agg( # YS for Year Start
-        YearlyOpen=('SessionOpen', 'first'),
-        YearlyHigh=('SessionHigh', 'max'),
-        YearlyLow=('SessionLow', 'min')
-    ).dropna()
+    yearly_agg = _period_ohlc(df, to_ns(year_key), 'Yearly')
     yearly_agg['YearlyMid'] = (yearly_agg['YearlyHigh'] + yearly_agg['YearlyLow']) / 2
     yearly_agg['PrevYearMid'] = yearly_agg['YearlyMid'].shift(1)
 
-    # --- Calculate Previous Session Levels --- 
-    # Ensure df is sorted by SessionStart (already done in load_session_data)
-    # Need original df with SessionStart index here
-    df_for_prev_session = df.copy()
-    df_for_prev_session.reset_index(drop=True, inplace=True)
-    df_for_prev_session.sort_values(by='SessionStartUTC', inplace=True)
-    
-    df_for_prev_session['PrevSessionOpen']  = df_for_prev_session['SessionOpen'].shift(1)
-    df_for_prev_session['PrevSessionHigh']  = df_for_prev_session['SessionHigh'].shift(1)
-    df_for_prev_session['PrevSessionLow']   = df_for_prev_session['SessionLow'].shift(1)
-    df_for_prev_session['PrevSessionClose'] = df_for_prev_session['SessionClose'].shift(1)
-    df_for_prev_session['PrevSessionMid']   = (
-         df_for_prev_session['PrevSessionHigh'] +
-         df_for_prev_session['PrevSessionLow']
-     ) / 2
-    df_for_prev_session['PrevSessionMid'] = (df_for_prev_session['PrevSessionHigh'] + df_for_prev_session['PrevSessionLow']) / 2
-    
-    # Keep only relevant columns for merge
-    prev_session_levels = df_for_prev_session[['SessionStartUTC',
-                                               'PrevSessionOpen', 'PrevSessionHigh',
-                                               'PrevSessionLow', 'PrevSessionClose',
-                                               'PrevSessionMid']].copy()
-    # --- End Previous Session Calc ---
-
-    # --- Merge levels back using pd.merge --- 
-    df_out = df[['Date', 'SessionOpen', 'SessionStartUTC']].copy()
-    df_out['SessionDate'] = pd.to_datetime(df_out.index.date) 
-    df_out.reset_index(inplace=True) # Keep SessionStart as a column
+    # --- Align levels back by period start (index lookups, no merges) --- 
+    # reset_index already returns a new frame, so no defensive copy is needed
+    df_out = df[['Date', 'SessionOpen', 'SessionStartUTC']].reset_index() # Keep SessionStart as a column
+    df_out['SessionDate'] = df.index.tz_localize(None).normalize() # wall-clock day, datetime64
 
     # Ensure aggregate indices are datetime objects for merging keys if needed
     daily_agg.index = pd.to_datetime(daily_agg.index)
@@ -213,39 +226,38 @@ def calculate_key_levels(df):
     quarterly_agg.index = pd.to_datetime(quarterly_agg.index)
     yearly_agg.index = pd.to_datetime(yearly_agg.index)
     
-    # --- Merge Daily --- 
-    df_out['MergeDate'] = pd.to_datetime(df_out['SessionDate'])
-    df_out = pd.merge(df_out, daily_agg[['DailyOpen', 'PrevDailyMid']], 
-                      left_on='MergeDate', right_index=True, how='left')
+    def attach(agg, key_col, cols):
+        # Aggregates have one row per period start, so a reindex is a left join without the copies
+        df_out[cols] = agg[cols].reindex(df_out[key_col].values).to_numpy()
+
+    # --- Daily --- 
+    df_out['MergeDate'] = df_out['SessionDate']
+    attach(daily_agg, 'MergeDate', ['DailyOpen', 'PrevDailyMid'])
                       
-    # --- Merge Weekly/Monday --- 
-    df_out['WeekStartDate'] = df_out['MergeDate'].apply(lambda x: x - pd.to_timedelta(x.weekday(), unit='d'))
-    df_out = pd.merge(df_out, weekly_agg[['WeeklyOpen', 'PrevWeekHigh', 'PrevWeekLow', 'PrevWeekMid']],
-                      left_on='WeekStartDate', right_index=True, how='left')
-    df_out = pd.merge(df_out, monday_agg[['MondayHigh', 'MondayLow', 'MondayMid', 'MondayRange']],
-                      left_on='WeekStartDate', right_index=True, how='left') # Monday data also indexed by week start
-
-    # --- Merge Monthly --- 
-    df_out['MonthStartDate'] = df_out['MergeDate'].apply(lambda x: x.replace(day=1))
-    df_out = pd.merge(df_out, monthly_agg[['MonthlyOpen', 'PrevMonthHigh', 'PrevMonthLow', 'PrevMonthMid']],
-                      left_on='MonthStartDate', right_index=True, how='left')
-
-    # --- Merge Quarterly --- 
-    df_out['QuarterStartDate'] = df_out['MergeDate'].apply(lambda x: pd.Timestamp(x).to_period('Q').start_time)
-    df_out = pd.merge(df_out, quarterly_agg[['QuarterlyOpen', 'PrevQuarterMid']],
-                      left_on='QuarterStartDate', right_index=True, how='left')
+    # --- Weekly/Monday --- 
+    merge_days = df_out['MergeDate'].values # datetime64[ns], midnight; period keys below are vectorised casts
+    df_out['WeekStartDate'] = merge_days - df_out['MergeDate'].dt.dayofweek.values.astype('timedelta64[D]')
+    attach(weekly_agg, 'WeekStartDate', ['WeeklyOpen', 'PrevWeekHigh', 'PrevWeekLow', 'PrevWeekMid'])
+    attach(monday_agg, 'WeekStartDate', ['MondayHigh', 'MondayLow', 'MondayMid', 'MondayRange']) # Monday data also indexed by week start
+
+    # --- Monthly --- 
+    df_out['MonthStartDate'] = merge_days.astype('datetime64[M]').astype('datetime64[ns]')
+    attach(monthly_agg, 'MonthStartDate', ['MonthlyOpen', 'PrevMonthHigh', 'PrevMonthLow', 'PrevMonthMid'])
+
+    # --- Quarterly --- 
+    df_out['QuarterStartDate'] = df_out['MergeDate'].dt.to_period('Q').dt.start_time
+    attach(quarterly_agg, 'QuarterStartDate', ['QuarterlyOpen', 'PrevQuarterMid'])
                       
-    # --- Merge Yearly --- 
-    df_out['YearStartDate'] = df_out['MergeDate'].apply(lambda x: x.replace(month=1, day=1))
-    df_out = pd.merge(df_out, yearly_agg[['YearlyOpen', 'PrevYearMid']],
-                      left_on='YearStartDate', right_index=True, how='left')
-
-    # --- Merge Previous Session Levels --- 
-    # Ensure SessionStart is datetime for merge
-    prev_session_levels['SessionStartUTC'] = pd.to_datetime(prev_session_levels['SessionStartUTC'])
-    df_out = pd.merge(df_out, prev_session_levels,
-                      on='SessionStartUTC', how='left')
-    # --- End Merge --- 
+    # --- Yearly --- 
+    df_out['YearStartDate'] = merge_days.astype('datetime64[Y]').astype('datetime64[ns]')
+    attach(yearly_agg, 'YearStartDate', ['YearlyOpen', 'PrevYearMid'])
+
+    # --- Previous Session Levels --- 
+    # df is in session-start order (sorted above), so the previous session is simply the previous row
+    for col in ['SessionOpen', 'SessionHigh', 'SessionLow', 'SessionClose']:
+        df_out[f'Prev{col}'] = _shift_down(df[col].to_numpy())
+    df_out['PrevSessionMid'] = (df_out['PrevSessionHigh'] + df_out['PrevSessionLow']) / 2
+    # --- End Alignment --- 
 
     # --- Cleanup and Final Selection ---
     # Drop temporary merge keys
@@ -263,7 +275,7 @@ def calculate_key_levels(df):
                   'QuarterlyOpen', 'PrevQuarterMid', 
                   'YearlyOpen', 'PrevYearMid']
     
-    key_levels_df = df_out[[col for col in final_cols if col in df_out.columns]].copy()    # SessionStartUTC already present; nothing to rename
+    key_levels_df = df_out[[col for col in final_cols if col in df_out.columns]]    # SessionStartUTC already present; nothing to rename
     print(f"Key Levels calculation complete. {len(key_levels_df)} rows generated.")
     return key_levels_df
 
@@ -276,20 +288,24 @@ def save_to_db(df, table_name, db_path):
     
     try:
         with sqlite3.connect(db_path) as conn:
+            # WAL + synchronous=NORMAL: one fsync per checkpoint instead of per commit, and
+            # the Streamlit viewers' read-only connections keep reading while this writes
+            conn.executescript("PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; "
+                               "PRAGMA temp_store=MEMORY; PRAGMA cache_size=-65536;")
             print(f"Saving {len(df)} rows to table '{table_name}'...")
             df_save = df.copy()
             
-            # --- Explicit Type Conversion and Debugging --- 
-            print(f"  Data types BEFORE conversion for {table_name}:\n{df_save.dtypes}")
+            # --- Explicit Type Conversion --- 
             cols_to_convert = []
             for col in df_save.columns:
                 col_type = df_save[col].dtype
                 is_date_object_col = False
                 if col_type == object:
-                    try:
-                        is_date_object_col = any(isinstance(x, datetime.date) and not isinstance(x, datetime.datetime) for x in df_save[col].dropna())
-                    except TypeError:
-                        pass 
+                    # Object columns are homogeneous here: the first value decides
+                    not_null = df_save[col].notna().to_numpy()
+                    if not_null.any():
+                        first = df_save[col].iloc[not_null.argmax()]
+                        is_date_object_col = isinstance(first, datetime.date) and not isinstance(first, datetime.datetime)
                 
                 # Identify columns needing conversion (Simplified check)
                 needs_conversion = False
@@ -308,10 +324,13 @@ def save_to_db(df, table_name, db_path):
                 for col in cols_to_convert:
                     df_save[col] = df_save[col].astype(str)
             
-            print(f"  Data types AFTER conversion for {table_name}:\n{df_save.dtypes}")
-            # --- End Conversion and Debugging --- 
+            # --- End Conversion --- 
                 
+            # to_sql runs the DROP/CREATE and a single executemany inside one transaction
             df_save.to_sql(table_name, conn, if_exists='replace', index=False)
+            if table_name == KEY_LEVELS_TABLE and 'SessionDate' in df_save.columns:
+                # to_sql(replace) drops indexes with the table, so recreate the viewer's date lookup
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_kl_date ON {table_name}(SessionDate)")
             print(f"Table '{table_name}' saved successfully.")
     except Exception as e:
         print(f"Error saving table '{table_name}' to database: {e}")
@@ -323,26 +342,26 @@ if __name__ == "__main__":
     
     if session_df_filtered is not None:
         # --- FIX: Reinstate loop for calculating VWAPs --- 
-        vwap_base_df = session_df_filtered.copy() # Start with filtered data
-        vwap_cols_to_keep = ['Date', 'SessionStart'] # Base columns
-        calculated_vwap_cols = [] 
-        
-        for window in VWAP_WINDOWS: # Loop through [30, 365]
-            vwap_base_df = calculate_rolling_vwap(vwap_base_df, window) # Pass window
-            if vwap_base_df is not None and f'RVWAP_{window}' in vwap_base_df.columns:
-                 vwap_cols_to_keep.append(f'RVWAP_{window}')
-                 calculated_vwap_cols.append(f'RVWAP_{window}')
+        # Typical price / PV once; the windows [30, 365] are then independent array jobs,
+        # so run them on threads (NumPy's cumsum/divide release the GIL)
+        typical_price = (session_df_filtered['SessionHigh'] + session_df_filtered['SessionLow'] + session_df_filtered['SessionClose']) / 3
+        pv = (typical_price * session_df_filtered['SessionVolume']).to_numpy()
+        volume = session_df_filtered['SessionVolume'].to_numpy()
+        print(f"Calculating rolling VWAPs for windows {VWAP_WINDOWS}...")
+        with ThreadPoolExecutor(max_workers=len(VWAP_WINDOWS)) as ex:
+            window_vwaps = list(ex.map(lambda w: compute_rvwap(pv, volume, w), VWAP_WINDOWS))
+        calculated_vwap_cols = [f'RVWAP_{window}' for window in VWAP_WINDOWS]
+        for col in calculated_vwap_cols: print(f"{col} calculation complete.")
         # --- END FIX ---
-                 
-        if vwap_base_df is not None:
-            final_vwap_df = vwap_base_df[vwap_cols_to_keep].copy()
-            if calculated_vwap_cols: final_vwap_df.dropna(subset=calculated_vwap_cols, how='all', inplace=True)
-            if 'SessionStart' in final_vwap_df.columns: final_vwap_df.rename(columns={'SessionStart':'SessionStartUTC'}, inplace=True)
-            save_to_db(final_vwap_df, VWAP_TABLE, DATABASE_PATH)
-        else:
-            print("VWAP calculation failed.")
         
-        key_levels_results_df = calculate_key_levels(session_df_filtered.copy()) 
+        # Build the output frame from just the base columns; the summary frame itself is never copied
+        final_vwap_df = session_df_filtered[['Date', 'SessionStart']].assign(**dict(zip(calculated_vwap_cols, window_vwaps)))
+        final_vwap_df = final_vwap_df.dropna(subset=calculated_vwap_cols, how='all')
+        final_vwap_df = final_vwap_df.rename(columns={'SessionStart':'SessionStartUTC'})
+        save_to_db(final_vwap_df, VWAP_TABLE, DATABASE_PATH)
+        
+        # calculate_key_levels projects its own working columns, so it can take the frame as-is
+        key_levels_results_df = calculate_key_levels(session_df_filtered) 
         save_to_db(key_levels_results_df, KEY_LEVELS_TABLE, DATABASE_PATH)
         
         print("\nIndicator calculations and database saving complete.")
@@ -1,16 +1,22 @@
 import sys
 
+BLOCK_SIZE = 1 << 20  # 1 MiB reads/writes
+
 def filter_file_by_line(input_filename, output_filename, start_line_number):
     """
     Reads an input file and writes lines from start_line_number onwards 
     to an output file.
 
+    Works on raw 1 MiB blocks: newlines are counted with bytes.count until
+    the start line is reached, then the rest of the file is copied block by
+    block. Bytes (including line endings) are copied unchanged.
+
     Args:
         input_filename (str): Path to the input text file.
         output_filename (str): Path to the output text file.
         start_line_number (int): The 1-based line number to start keeping lines from.
     """
-    start_index = start_line_number - 1  # Convert to 0-based index
+    start_index = max(start_line_number - 1, 0)  # Convert to 0-based index
     lines_written = 0
     
     print(f"Starting filtering process...")
@@ -19,15 +25,41 @@ def filter_file_by_line(input_filename, output_filename, start_line_number):
     print(f"Keeping lines from number {start_line_number} onwards.")
 
     try:
-        with open(input_filename, 'r', encoding='utf-8') as infile, \
-             open(output_filename, 'w', encoding='utf-8') as outfile:
-            
-            for i, line in enumerate(infile):
-                if i >= start_index:
-                    outfile.write(line)
-                    lines_written += 1
-                if (i + 1) % 1000000 == 0: # Print progress every million lines
-                     print(f"Processed {i + 1} lines...")
+        with open(input_filename, 'rb') as infile, \
+             open(output_filename, 'wb') as outfile:
+
+            # Skip: count newlines per block until the start line begins inside one
+            lines_seen = 0
+            block = b'' # Part of the last block read that belongs to the output
+            while lines_seen < start_index:
+                block = infile.read(BLOCK_SIZE)
+                if not block:
+                    break
+                newlines = block.count(b'\n')
+                if lines_seen + newlines >= start_index:
+                    pos = -1
+                    for _ in range(start_index - lines_seen):
+                        pos = block.index(b'\n', pos + 1)
+                    block = block[pos + 1:] # Start of line start_line_number
+                    lines_seen = start_index
+                    break
+                lines_seen += newlines
+                block = b''
+                if lines_seen // 1000000 > (lines_seen - newlines) // 1000000: # Progress every million lines
+                    print(f"Processed {lines_seen} lines...")
+
+            # Copy the remainder block by block
+            last = b''
+            while True:
+                if block:
+                    outfile.write(block)
+                    lines_written += block.count(b'\n')
+                    last = block
+                block = infile.read(BLOCK_SIZE)
+                if not block:
+                    break
+            if last and not last.endswith(b'\n'):
+                lines_written += 1 # Final line without a trailing newline
 
         print(f"Finished processing.")
         print(f"Total lines written to {output_filename}: {lines_written}")
@@ -1,21 +1,33 @@
+import os
 import sqlite3
 import pandas as pd
 import numpy as np
+import pyarrow.parquet as pq
+import pyarrow.feather as feather
 import textwrap
 import datetime as dt
 
+TICKS_PARQUET = "ticks.parquet"
+TICKS_ARROW = "ticks.arrow"  # Uncompressed Feather copy, memory-mapped on load
+
 # Connect to the database
 conn = sqlite3.connect("crypto_data.db")
 
-# Load tick data
+# Load tick data (only 'Last' is needed, so skip pandas and read it as an array)
 try:
-    ticks = pd.read_parquet("ticks.parquet")
+    # (Re)write the Feather copy when missing or older than the Parquet file;
+    # later runs memory-map it instead of decompressing Parquet. With no Parquet
+    # file, an existing Feather copy is used as is.
+    if not os.path.exists(TICKS_ARROW) or (os.path.exists(TICKS_PARQUET)
+                                           and os.path.getmtime(TICKS_ARROW) < os.path.getmtime(TICKS_PARQUET)):
+        feather.write_feather(pq.read_table(TICKS_PARQUET), TICKS_ARROW, compression='uncompressed')
+    ticks_table = feather.read_table(TICKS_ARROW, memory_map=True)
     # Ensure 'Last' column exists and is numeric
-    if "Last" not in ticks.columns:
+    if "Last" not in ticks_table.column_names:
         raise ValueError("Missing 'Last' column in ticks.parquet")
-    ticks["Last"] = pd.to_numeric(ticks["Last"], errors='coerce')
-    ticks.dropna(subset=["Last"], inplace=True)
-    if ticks.empty:
+    tick_prices = pd.to_numeric(ticks_table.column("Last").to_numpy(), errors='coerce').astype(float)
+    tick_prices = tick_prices[~np.isnan(tick_prices)]
+    if tick_prices.size == 0:
         raise ValueError("No valid tick data after loading and cleaning.")
 except FileNotFoundError:
     print("Error: ticks.parquet not found.")
@@ -49,32 +61,30 @@ except Exception as e:
     conn.close()
     exit()
 
-# --- Calculate hits using the corrected NumPy broadcasting approach ---
-
-# Get tick prices as a NumPy array
-tick_prices = ticks["Last"].to_numpy()
+# --- Calculate hits: nearest level per tick via binary search ---
 
-# Ensure lvl_vals is a NumPy array (already done by .values, but belt-and-suspenders)
-lvl_vals_np = np.asarray(lvl_vals)
+# Ensure lvl_vals is a float NumPy array (.values of a mixed row can be object dtype)
+lvl_vals_np = np.asarray(lvl_vals, dtype=float)
 
-# Calculate absolute differences between each tick and all levels
-# Resulting shape: (number_of_ticks, number_of_levels)
-diffs = np.abs(tick_prices[:, None] - lvl_vals_np)
+# Only the nearest level can be within tolerance, and it is one of the two
+# sorted levels either side of the tick: O(N log M) and O(N) memory instead
+# of an (number_of_ticks, number_of_levels) difference matrix
+sorted_lvls = np.sort(lvl_vals_np)
+idx = np.searchsorted(sorted_lvls, tick_prices)
+below = sorted_lvls[np.maximum(idx - 1, 0)]
+above = sorted_lvls[np.minimum(idx, len(sorted_lvls) - 1)]
+nearest_dist = np.minimum(np.abs(tick_prices - below), np.abs(tick_prices - above))
 
-# Check if *any* level's difference is within the tolerance for each tick
 # Tolerance set to 15 ticks as per the original code
 tolerance = 15
-hits_bool = np.any(diffs <= tolerance, axis=1)
-
-# Convert boolean array back to a Pandas Series aligned with the original ticks index
-hits = pd.Series(hits_bool, index=ticks.index)
+hits_bool = nearest_dist <= tolerance
 
 # --- End of corrected calculation ---
 
 # Print the total number of ticks that touched *any* of the specified levels
-# Since 'hits' is now a 1D boolean Series, we just sum the True values
+# 'hits_bool' is a 1D boolean array, so we just sum the True values
 print(f"Level values checked: {lvl_vals_np}")
-print(f"Number of ticks touching any key level (within {tolerance}): {hits.sum()}")
+print(f"Number of ticks touching any key level (within {tolerance}): {hits_bool.sum()}")
 
 # Close the database connection
 conn.close()
@@ -10,51 +10,76 @@ python single_print_debug.py --db crypto_data.db         \
        --sessions Asia London NewYork Overnight         \
        --price-step 10
 """
-import argparse, os, sqlite3, datetime as dt
+import argparse, os, sqlite3
 import pandas as pd, numpy as np
+import pyarrow.parquet as pq, pyarrow.feather as feather
+
+TICKS_PARQUET = "ticks.parquet"
+TICKS_ARROW   = "ticks.arrow"    # uncompressed Feather copy, memory-mapped on load
 
 
 # ─── helpers ───────────────────────────────────────────────────────────
+def load_ticks_table():
+    """ticks.parquet as an Arrow table, read through a memory-mapped Feather copy.
+
+    The copy is (re)written when missing or older than the Parquet file, so
+    later runs skip Parquet decompression entirely; without a Parquet file an
+    existing copy is used as is.
+    """
+    if (not os.path.exists(TICKS_ARROW)
+            or (os.path.exists(TICKS_PARQUET)
+                and os.path.getmtime(TICKS_ARROW) < os.path.getmtime(TICKS_PARQUET))):
+        feather.write_feather(pq.read_table(TICKS_PARQUET), TICKS_ARROW,
+                              compression="uncompressed")
+    return feather.read_table(TICKS_ARROW, memory_map=True)
+
+
 def load_sessions(conn):
+    """Sessions in start order with just the columns the back-test reads.
+
+    Row position is the session index: look-ahead is a positional range, so
+    no idx column or per-signal join is needed.
+    """
     q = """
-    SELECT *, strftime('%Y-%m-%d %H:%M:%S',SessionStart) AS ts
+    SELECT Sessions, SessionStart, SessionHigh, SessionLow, SinglePrints
     FROM session_summary
     ORDER BY SessionStart
     """
-    df = pd.read_sql(q, conn, parse_dates=["SessionStart", "SessionEnd"])
-    df["idx"] = np.arange(len(df))
-    return df
+    return pd.read_sql(q, conn, parse_dates=["SessionStart"])
+
+
+def _first(mask):
+    """Index of the first True in mask, or len(mask) if there is none."""
+    i = int(np.argmax(mask))
+    return i if mask[i] else len(mask)
 
 
 def simulate_trade(entry, sl, tp1, tp2, px, ts, be_after):
-    """Return (R‑multiple, exit_reason, hold_minutes)."""
-    risk = abs(sl - entry)
-    tp1_hit = False
-    for p, t in zip(px, ts):
-        if sl > entry:  # short
-            if p >= sl:
-                return -1.0, "stop", (t - ts[0]).total_seconds() / 60
-            if p <= tp1:
-                tp1_hit = True
-        else:           # long
-            if p <= sl:
-                return -1.0, "stop", (t - ts[0]).total_seconds() / 60
-            if p >= tp1:
-                tp1_hit = True
-
-        # break even
-        if tp1_hit or (t - ts[0]).total_seconds() >= be_after * 60:
-            sl = entry
-
-        # TP2
-        if sl > entry:      # short
-            if p <= tp2:
-                return 2.0, "target2", (t - ts[0]).total_seconds() / 60
-        else:               # long
-            if p >= tp2:
-                return 2.0, "target2", (t - ts[0]).total_seconds() / 60
-
-    return 0.0, "timer", (ts[-1] - ts[0]).total_seconds() / 60
+    """Return (R‑multiple, exit_reason, hold_minutes).
+
+    Tick-by-tick rules, resolved with array masks instead of a Python loop:
+    the stop is checked first, then TP1; once TP1 is hit or `be_after`
+    minutes have passed (tick `be`) the stop moves to entry. The side is
+    re-read from the *current* stop, so from `be` on both sides test the
+    long rules (stop p <= entry, TP2 p >= tp2) - kept as the loop had it.
+    """
+    px = np.asarray(px, dtype=float)
+    t_ns = pd.DatetimeIndex(ts).as_unit("ns").asi8
+    elapsed_s = (t_ns - t_ns[0]) / 1e9
+    short = sl > entry
+    i = np.arange(len(px))
+
+    be = _first(((px <= tp1) if short else (px >= tp1)) | (elapsed_s >= be_after * 60))
+    # the stop tick is checked before the BE move, so tick `be` still uses the original stop
+    stop = np.where(i <= be, (px >= sl) if short else (px <= sl), px <= entry)
+    target = np.where(i < be, (px <= tp2) if short else (px >= tp2), px >= tp2)
+
+    exit_i = _first(stop | target)
+    if exit_i == len(px):
+        return 0.0, "timer", elapsed_s[-1] / 60
+    if stop[exit_i]:
+        return -1.0, "stop", elapsed_s[exit_i] / 60
+    return 2.0, "target2", elapsed_s[exit_i] / 60
 
 
 # ─── main routine ──────────────────────────────────────────────────────
@@ -69,29 +94,55 @@ def main(args):
     print(f"[INFO] Single‑print signals      : {(sess['SinglePrints']==1).sum():,}")
     print(f"[INFO] Allowed entry sessions    : {', '.join(sorted(args.sessions))}\n")
 
+    # ----- load ticks once (robust col detection) ---------------------
+    ticks, ticks_skip = None, None
+    try:
+        ticks = load_ticks_table().to_pandas()
+    except Exception as e:
+        ticks_skip = f"parquet load fail: {e}"
+    if ticks is not None:
+        if "ts" in ticks.columns and "Timestamp" not in ticks.columns:
+            ticks.rename(columns={"ts": "Timestamp"}, inplace=True)
+        if "Timestamp" in ticks.columns:
+            ticks["Timestamp"] = pd.to_datetime(ticks["Timestamp"], utc=True)
+            ticks = ticks.sort_values("Timestamp", kind="stable").set_index("Timestamp")
+            price_col = "Last" if "Last" in ticks.columns else ticks.columns[-1]
+        else:
+            ticks, ticks_skip = None, "no Timestamp col in parquet"
+    # sorted datetime64[ns] (UTC) + price arrays: each day slice is two binary searches
+    ts_arr = ticks.index.values if ticks is not None else None
+    px_arr = ticks[price_col].to_numpy(float) if ticks is not None else None
+    day_bounds = {}                                 # day -> (lo, hi), several touches share a day
+
+    # plain arrays: rows are in idx order, so look-ahead = the next args.look positions
+    n = len(sess)
+    highs, lows = sess["SessionHigh"].to_numpy(), sess["SessionLow"].to_numpy()
+    names = sess["Sessions"].to_numpy()
+    starts = sess["SessionStart"].tolist()          # Timestamps (print/floor like the rows did)
+    allowed = set(args.sessions)
+
     trades = []
-    for _, sig in sess[sess["SinglePrints"] == 1].iterrows():
-        edge_hi, edge_lo = sig["SessionHigh"], sig["SessionLow"]
+    for i in np.flatnonzero(sess["SinglePrints"].to_numpy() == 1):
+        edge_hi, edge_lo = highs[i], lows[i]
 
-        look = sess[(sess["idx"] > sig["idx"]) &
-                    (sess["idx"] <= sig["idx"] + args.look)]
-        if look.empty:
-            print("skip:", sig["SessionStart"], "→ no look‑ahead sessions")
+        look = range(i + 1, min(i + 1 + args.look, n))
+        if not look:
+            print("skip:", starts[i], "→ no look‑ahead sessions")
             continue
 
         touched = False
-        for _, nxt in look.iterrows():
-            if nxt["Sessions"] not in args.sessions:
-                print("skip:", nxt["SessionStart"], "→ session filter")
+        for j in look:
+            if names[j] not in allowed:
+                print("skip:", starts[j], "→ session filter")
                 continue
 
             side = None
-            if nxt["SessionHigh"] >= edge_hi + args.entry:
+            if highs[j] >= edge_hi + args.entry:
                 side = "short"
-            elif nxt["SessionLow"] <= edge_lo - args.entry:
+            elif lows[j] <= edge_lo - args.entry:
                 side = "long"
             else:
-                print("skip:", nxt["SessionStart"], "→ edge not touched")
+                print("skip:", starts[j], "→ edge not touched")
                 continue
 
             # price levels
@@ -106,43 +157,27 @@ def main(args):
                 tp1   = entry + (entry - sl)
                 tp2   = entry + 2 * (entry - sl)
 
-            # ----- load ticks (robust col detection) ------------------
-            day = nxt["SessionStart"].floor("D")
-            try:
-                ticks = pd.read_parquet("ticks.parquet")
-            except Exception as e:
-                print("skip:", nxt["SessionStart"], "→ parquet load fail:", e)
+            # ----- that day's ticks: binary search on the sorted array --
+            if ts_arr is None:
+                print("skip:", starts[j], "→", ticks_skip)
                 continue
-
-            # detect timestamp column
-            if "Timestamp" in ticks.columns:
-                ts_col = "Timestamp"
-            elif "ts" in ticks.columns:
-                ticks.rename(columns={"ts": "Timestamp"}, inplace=True)
-                ts_col = "Timestamp"
-            else:
-                print("skip:", nxt["SessionStart"], "→ no Timestamp col in parquet")
-                continue
-
-            ticks[ts_col] = pd.to_datetime(ticks[ts_col], utc=True)
-            day_mask = (ticks[ts_col] >= day) & (ticks[ts_col] < day + dt.timedelta(days=1))
-            day_px = ticks.loc[day_mask]
-            if day_px.empty:
-                print("skip:", nxt["SessionStart"], "→ tick slice empty")
+            day_ns = np.datetime64(starts[j].floor("D").value, "ns")   # UTC, like ts_arr
+            if day_ns not in day_bounds:
+                day_bounds[day_ns] = np.searchsorted(ts_arr, [day_ns, day_ns + np.timedelta64(1, "D")])
+            lo, hi = day_bounds[day_ns]
+            if lo == hi:
+                print("skip:", starts[j], "→ tick slice empty")
                 continue
 
-            price_col = "Last" if "Last" in day_px.columns else day_px.columns[-1]
-            px = day_px[price_col].to_numpy(float)
-            ts = day_px[ts_col].to_numpy()
-
-            r, reason, hold = simulate_trade(entry, sl, tp1, tp2, px, ts, args.be)
-            trades.append(dict(signal=sig["SessionStart"], entry=nxt["SessionStart"],
+            r, reason, hold = simulate_trade(entry, sl, tp1, tp2,
+                                             px_arr[lo:hi], ts_arr[lo:hi], args.be)
+            trades.append(dict(signal=starts[i], entry=starts[j],
                                side=side, R=r, exit=reason, hold_m=hold))
             touched = True
             break  # first valid touch only
 
         if not touched:
-            print("skip:", sig["SessionStart"], "→ no qualifying touch")
+            print("skip:", starts[i], "→ no qualifying touch")
 
     # ── summary ───────────────────────────────────────────────────────
     print("\n── Single‑Print reaction summary ──")
@@ -8,6 +8,23 @@ import numpy as np # Needed for calculations
 import config # Import parameters from config.py
 import string # Needed for TPO letters
 import argparse  # <--- add after existing imports (ensure unique)
+import functools
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor
+try:
+    from numba import njit # Optional: compiles value_area_bounds when installed
+except ImportError:
+    njit = None
+try:
+    import polars as pl # Optional: multi-threaded daily/session summary groupbys when installed
+except ImportError:
+    pl = None
+try:
+    import connectorx as cx # Optional: parallel SQLite -> Arrow reads of tick_data when installed
+except ImportError:
+    cx = None
 
 # Session Definitions now in config.py
 
@@ -39,6 +56,76 @@ def get_active_sessions(timestamp: pd.Timestamp):
                 active.append(name)
 
     return active
+
+def _time_ns(t: datetime.time):
+    """Nanoseconds since midnight for a datetime.time."""
+    return ((t.hour * 60 + t.minute) * 60 + t.second) * 1_000_000_000 + t.microsecond * 1000
+
+def session_names():
+    """Session names in SessionMask bit order: bit j is set when session_names()[j] is active."""
+    return list(config.SESSIONS) + [n for n in ('Weekend-Sat', 'Weekend-Sun') if n not in config.SESSIONS]
+
+@functools.lru_cache(maxsize=None)
+def decode_sessions(mask):
+    """Tuple of session names packed in one SessionMask value (memoised per distinct mask)."""
+    return tuple(name for j, name in enumerate(session_names()) if int(mask) >> j & 1)
+
+def assign_session_mask(df):
+    """uint16 SessionMask per row of *df['Timestamp']*, same rules as get_active_sessions().
+
+    Builds one boolean column per session with NumPy compares on the
+    time-of-day (a handful of passes over the column instead of a Python
+    call per tick), then packs each row's membership into one bit per
+    session -- 2 bytes per tick instead of a Python list of names.
+    """
+    ts = df['Timestamp'].to_numpy(dtype='datetime64[ns]')
+    valid = ~np.isnat(ts)
+    # Day number and ns since midnight straight from the int64 epoch values (NaT -> garbage, masked)
+    day, tod = np.divmod(ts.view(np.int64), np.int64(86_400_000_000_000))
+    wd = (day + 3) % 7   # 1970-01-01 was a Thursday; Monday=0 like dayofweek
+    weekday = valid & (wd < 5)
+
+    names = session_names()
+    if len(names) > 16:
+        raise ValueError(f"SessionMask holds 16 sessions, config defines {len(names)}")
+    mask = np.zeros(len(ts), dtype=np.uint16)
+    for j, name in enumerate(names):
+        if name == 'Weekend-Sat':
+            active = valid & (wd == 5)
+        elif name == 'Weekend-Sun':
+            active = valid & (wd == 6)
+        else:
+            start, end = (_time_ns(t) for t in config.SESSIONS[name])
+            if start <= end:  # same‑day session
+                active = weekday & (tod >= start) & (tod < end)
+            else:  # overnight session (e.g., 21:00‑00:00)
+                active = weekday & ((tod >= start) | (tod < end))
+        mask |= active.astype(np.uint16) << np.uint16(j)
+    return pd.Series(mask, index=df.index, name='SessionMask')
+
+def session_indicator(df):
+    """Boolean matrix I[n_ticks, n_sessions] from *df['SessionMask']*; column j is session_names()[j].
+
+    Built in one vectorised pass, so per-session tick selection is a column
+    slice I[:, j] instead of a membership test per tick.
+    """
+    mask = df['SessionMask'].to_numpy().astype('<u2')
+    bits = np.unpackbits(mask.view(np.uint8).reshape(-1, 2), axis=1, bitorder='little')
+    return bits[:, :len(session_names())].view(bool)
+
+def explode_sessions(df):
+    """One row per (tick, active session), like DataFrame.explode on a list column.
+
+    The SessionMask column is replaced by a categorical Sessions column
+    (categories in name order); ticks outside every session are dropped.
+    """
+    names = session_names()
+    sorted_names = sorted(names)
+    code_of_bit = np.array([sorted_names.index(name) for name in names], dtype=np.int8)
+    rows, sids = np.nonzero(session_indicator(df)) # row-major: each tick's sessions in bit order
+    sessions = pd.Categorical.from_codes(code_of_bit[sids], categories=sorted_names)
+    return df.drop(columns='SessionMask').iloc[rows].assign(Sessions=sessions)
+
 # make psuedo dialy sessions from tick data to support 24-hour TPO analysis (currently used for Single Print Analysis)
 def make_daily_sessions(tick_df):
     """
@@ -65,6 +152,28 @@ def make_daily_sessions(tick_df):
     daily = daily.set_index("Sessions", append=True)
     return daily
 
+def _tick_csv_has_header(filename):
+    """True if the first line is a header ("Date Time,Open,...") rather than a tick."""
+    with open(filename, encoding='utf-8', errors='replace') as f:
+        first_field = f.readline().split(',', 1)[0].strip()
+    return not first_field[:1].isdigit() # Ticks start with the date, e.g. "2024-03-01 ..."
+
+def _read_tick_csv_arrow(filename, column_names):
+    """Reads the tick CSV with Arrow's multi-threaded reader, Timestamp parsed in the reader.
+
+    Numeric column types are inferred (int64/double, as pd.to_numeric would give).
+    Raises ValueError (ArrowInvalid) on a malformed row so the caller can fall back
+    to the coercing pandas path.
+    """
+    table = pa_csv.read_csv(
+        filename,
+        read_options=pa_csv.ReadOptions(column_names=column_names,
+                                        skip_rows=1 if _tick_csv_has_header(filename) else 0),
+        convert_options=pa_csv.ConvertOptions(column_types={'Timestamp': pa.timestamp('ns')},
+                                              timestamp_parsers=['%Y-%m-%d %H:%M:%S']),
+    )
+    return table.to_pandas(self_destruct=True)
+
 def load_and_preprocess_data(filename):
     """
     Loads the normalized tick data, assigns column names, converts types,
@@ -85,24 +194,46 @@ def load_and_preprocess_data(filename):
     
     numeric_cols = ['Open', 'High', 'Low', 'Close', 'Volume', 'Trades', 'BidVolume', 'AskVolume']
 
+    # Typed Parquet copy of the preprocessed ticks, reused while it is newer than the text file
+    cache_file = filename + '.parquet'
+    if os.path.exists(filename) and os.path.exists(cache_file) and os.path.getmtime(cache_file) >= os.path.getmtime(filename):
+        try:
+            df = pd.read_parquet(cache_file, engine='pyarrow')
+            print(f"Loaded preprocessed ticks from cache {cache_file}. Data shape: {df.shape}")
+            return df
+        except Exception as e:
+            print(f"Could not read tick cache {cache_file} ({e}); re-reading {filename}.")
+
     try:
-        # Read the CSV file
-        df = pd.read_csv(
-            filename, 
-            header=None, # No header row in the file
-            names=column_names,
-            low_memory=False # Recommended for large files with mixed types initially
-        )
-        print("Initial load complete. Starting preprocessing...")
-
-        # 1. Convert Timestamp column to datetime objects
-        print("Converting Timestamp column...")
-        # Use explicit format for speed: 'YYYY-MM-DD HH:MM:SS'
-        df['Timestamp'] = pd.to_datetime(
-            df['Timestamp'],
-            format='%Y-%m-%d %H:%M:%S',  # adjust if milliseconds exist
-            errors='coerce'
-        )
+        # Read the CSV file: typed in one Arrow pass when every row is clean
+        try:
+            df = _read_tick_csv_arrow(filename, column_names)
+            print("Initial load complete (typed Arrow read). Starting preprocessing...")
+        except ValueError as e: # Malformed rows: read as text and coerce below
+            print(f"Typed tick read failed ({e}); falling back to pandas with coercion.")
+            df = None
+        
+        if df is None:
+            df = pd.read_csv(
+                filename, 
+                header=None, # No header row in the file
+                names=column_names,
+                low_memory=False # Recommended for large files with mixed types initially
+            )
+            print("Initial load complete. Starting preprocessing...")
+
+            # 1. Convert Timestamp column to datetime objects
+            print("Converting Timestamp column...")
+            # Use explicit format for speed: 'YYYY-MM-DD HH:MM:SS'
+            # Ticks repeat the same second many times, so parse each distinct string once
+            # (hash factorize) and expand back by code; code -1 (missing) lands on the NaT slot
+            codes, unique_ts = pd.factorize(df['Timestamp'])
+            parsed = pd.to_datetime(
+                unique_ts,
+                format='%Y-%m-%d %H:%M:%S',  # adjust if milliseconds exist
+                errors='coerce'
+            )
+            df['Timestamp'] = np.append(parsed.to_numpy(), np.datetime64('NaT'))[codes]
         # Drop rows where timestamp conversion failed
         df.dropna(subset=['Timestamp'], inplace=True)
         print(f"Timestamp conversion done. Data shape: {df.shape}")
@@ -110,7 +241,8 @@ def load_and_preprocess_data(filename):
         # 2. Convert numeric columns
         print("Converting numeric columns...")
         for col in numeric_cols:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+            if not pd.api.types.is_numeric_dtype(df[col]): # Arrow-read columns are already typed
+                df[col] = pd.to_numeric(df[col], errors='coerce')
         # Optionally, handle rows where numeric conversion failed (e.g., drop or fill)
         # For now, let's report if any NaNs were introduced
         if df[numeric_cols].isnull().any().any():
@@ -129,6 +261,11 @@ def load_and_preprocess_data(filename):
         # print(f"Index set. Data shape: {df.shape}")
         
         print("Preprocessing complete.")
+        try:
+            df.to_parquet(cache_file, engine='pyarrow', compression='zstd')
+            print(f"Preprocessed ticks cached to {cache_file}.")
+        except Exception as e:
+            print(f"Warning: could not write tick cache {cache_file}: {e}")
         return df
 
     except FileNotFoundError:
@@ -156,6 +293,90 @@ def calculate_delta(df):
         print("Error: 'AskVolume' or 'BidVolume' columns not found. Cannot calculate Delta.")
     return df
 
+def _aggregate_days(df):
+    """Daily OHLC/Volume/Delta of a Timestamp-indexed tick frame, indexed by Date (datetime.date)."""
+    # Group on the int64 day of the Timestamp rather than hashing datetime.date objects;
+    # only the handful of day keys are sorted afterwards
+    day_key = df.index.values.astype('datetime64[D]')
+    if pl is not None:
+        columns = {'Day': day_key.view('i8')}
+        columns.update({col: df[col].to_numpy() for col in ('Open', 'High', 'Low', 'Close', 'Volume', 'Delta')})
+        daily = (pl.from_dict(columns).lazy()
+                 .with_columns(pl.col(pl.Float64).fill_nan(None)) # NaN -> null so aggregations skip it like pandas
+                 .group_by('Day')
+                 .agg(pl.col('Open').drop_nulls().first().alias('DailyOpen'),
+                      pl.col('High').max().alias('DailyHigh'),
+                      pl.col('Low').min().alias('DailyLow'),
+                      pl.col('Close').drop_nulls().last().alias('DailyClose'),
+                      pl.col('Volume').sum().alias('DailyVolume'),
+                      pl.col('Delta').sum().alias('DailyDelta'))
+                 .sort('Day')
+                 .collect())
+        daily_summary = daily.drop('Day').to_pandas()
+        daily_summary.index = pd.Index(daily['Day'].to_numpy().astype('datetime64[D]').astype(object), name='Date')
+        return daily_summary
+    daily_summary = df.groupby(day_key, sort=False).agg(
+        DailyOpen=pd.NamedAgg(column='Open', aggfunc='first'),
+        DailyHigh=pd.NamedAgg(column='High', aggfunc='max'),
+        DailyLow=pd.NamedAgg(column='Low', aggfunc='min'),
+        DailyClose=pd.NamedAgg(column='Close', aggfunc='last'),
+        DailyVolume=pd.NamedAgg(column='Volume', aggfunc='sum'),
+        DailyDelta=pd.NamedAgg(column='Delta', aggfunc='sum')
+    ).sort_index()
+    daily_summary.index = pd.Index(daily_summary.index.date, name='Date')
+    return daily_summary
+
+def _aggregate_sessions(df_exploded):
+    """Session OHLC/Volume/Delta of explode_sessions() output (Timestamp-sorted), indexed by (Date, Sessions)."""
+    # Group by Date and Session Name: int64 day keys and the categorical Sessions codes
+    day_key = df_exploded['Timestamp'].values.astype('datetime64[D]')
+    if pl is not None:
+        sessions = df_exploded['Sessions'].cat
+        columns = {'Day': day_key.view('i8'), 'Code': sessions.codes.to_numpy(),
+                   'Timestamp': df_exploded['Timestamp'].values.view('i8')}
+        columns.update({col: df_exploded[col].to_numpy() for col in ('Open', 'High', 'Low', 'Close', 'Volume', 'Delta')})
+        summary = (pl.from_dict(columns).lazy()
+                   .with_columns(pl.col(pl.Float64).fill_nan(None)) # NaN -> null so aggregations skip it like pandas
+                   .group_by('Day', 'Code')
+                   .agg(pl.col('Timestamp').min().alias('SessionStart'),
+                        pl.col('Timestamp').max().alias('SessionEnd'),
+                        pl.col('Open').drop_nulls().first().alias('SessionOpen'),
+                        pl.col('High').max().alias('SessionHigh'),
+                        pl.col('Low').min().alias('SessionLow'),
+                        pl.col('Close').drop_nulls().last().alias('SessionClose'),
+                        pl.col('Volume').sum().alias('SessionVolume'),
+                        pl.col('Delta').sum().alias('SessionDelta'),
+                        pl.len().cast(pl.Int64).alias('SessionTicks')) # Count ticks per session
+                   .sort('Day', 'Code')
+                   .collect())
+        session_summary = summary.drop('Day', 'Code').to_pandas()
+        for col in ('SessionStart', 'SessionEnd'):
+            session_summary[col] = session_summary[col].to_numpy().astype('datetime64[ns]')
+        session_summary.index = pd.MultiIndex.from_arrays(
+            [summary['Day'].to_numpy().astype('datetime64[D]').astype(object),
+             sessions.categories.to_numpy(dtype=object)[summary['Code'].to_numpy()]],
+            names=['Date', 'Sessions'])
+        return session_summary
+    session_grouped = df_exploded.groupby([day_key, 'Sessions'], sort=False, observed=True)
+    
+    # Aggregate
+    session_summary = session_grouped.agg(
+        SessionStart=pd.NamedAgg(column='Timestamp', aggfunc='min'),
+        SessionEnd=pd.NamedAgg(column='Timestamp', aggfunc='max'),
+        SessionOpen=pd.NamedAgg(column='Open', aggfunc='first'),
+        SessionHigh=pd.NamedAgg(column='High', aggfunc='max'),
+        SessionLow=pd.NamedAgg(column='Low', aggfunc='min'),
+        SessionClose=pd.NamedAgg(column='Close', aggfunc='last'),
+        SessionVolume=pd.NamedAgg(column='Volume', aggfunc='sum'),
+        SessionDelta=pd.NamedAgg(column='Delta', aggfunc='sum'),
+        SessionTicks=pd.NamedAgg(column='Timestamp', aggfunc='size') # Count ticks per session
+    ).sort_index()
+    session_summary.index = pd.MultiIndex.from_arrays(
+        [session_summary.index.get_level_values(0).date,
+         session_summary.index.get_level_values(1).astype(object)],
+        names=['Date', 'Sessions'])
+    return session_summary
+
 def calculate_daily_summary(df):
     """
     Calculates daily OHLC, Volume, and cumulative Delta from tick data.
@@ -184,14 +405,7 @@ def calculate_daily_summary(df):
             return None
             
     try:
-        daily_summary = df.groupby('Date').agg(
-            DailyOpen=pd.NamedAgg(column='Open', aggfunc='first'),
-            DailyHigh=pd.NamedAgg(column='High', aggfunc='max'),
-            DailyLow=pd.NamedAgg(column='Low', aggfunc='min'),
-            DailyClose=pd.NamedAgg(column='Close', aggfunc='last'),
-            DailyVolume=pd.NamedAgg(column='Volume', aggfunc='sum'),
-            DailyDelta=pd.NamedAgg(column='Delta', aggfunc='sum')
-        )
+        daily_summary = _aggregate_days(df)
         print(f"Daily summary calculated. Shape: {daily_summary.shape}")
         return daily_summary
     except Exception as e:
@@ -204,7 +418,7 @@ def calculate_session_summary(df):
     Handles overlapping sessions by potentially double-counting ticks in summaries.
 
     Args:
-        df (pandas.DataFrame): Preprocessed tick DataFrame with Timestamp, Date, Sessions,
+        df (pandas.DataFrame): Preprocessed tick DataFrame with Timestamp, Date, SessionMask,
                                OHLC, Volume, and Delta columns.
 
     Returns:
@@ -212,7 +426,7 @@ def calculate_session_summary(df):
                           or None if required columns are missing.
     """
     print("\nCalculating Session Summary (OHLC, Volume, Delta)...")
-    required_cols = ['Timestamp', 'Date', 'Sessions', 'Open', 'High', 'Low', 'Close', 'Volume', 'Delta']
+    required_cols = ['Timestamp', 'Date', 'SessionMask', 'Open', 'High', 'Low', 'Close', 'Volume', 'Delta']
     if not all(col in df.columns for col in required_cols):
         print(f"Error: Missing one or more required columns for session summary: {required_cols}")
         return None
@@ -220,9 +434,9 @@ def calculate_session_summary(df):
     # Ensure data is sorted by Timestamp for correct first/last aggregation
     df_sorted = df.sort_values('Timestamp')
 
-    # Explode the 'Sessions' list into separate rows
-    # Ticks outside defined sessions or with invalid session data will be dropped here
-    df_exploded = df_sorted.explode('Sessions').dropna(subset=['Sessions'])
+    # One row per active session of each tick (SessionMask bits -> Sessions names)
+    # Ticks outside defined sessions will be dropped here
+    df_exploded = explode_sessions(df_sorted)
     
     if df_exploded.empty:
         print("Warning: No data points found within defined sessions after exploding.")
@@ -231,21 +445,7 @@ def calculate_session_summary(df):
     print(f"Exploded data for session calculation. Shape: {df_exploded.shape}")
 
     try:
-        # Group by Date and Session Name
-        session_grouped = df_exploded.groupby(['Date', 'Sessions'])
-        
-        # Aggregate
-        session_summary = session_grouped.agg(
-            SessionStart=pd.NamedAgg(column='Timestamp', aggfunc='min'),
-            SessionEnd=pd.NamedAgg(column='Timestamp', aggfunc='max'),
-            SessionOpen=pd.NamedAgg(column='Open', aggfunc='first'),
-            SessionHigh=pd.NamedAgg(column='High', aggfunc='max'),
-            SessionLow=pd.NamedAgg(column='Low', aggfunc='min'),
-            SessionClose=pd.NamedAgg(column='Close', aggfunc='last'),
-            SessionVolume=pd.NamedAgg(column='Volume', aggfunc='sum'),
-            SessionDelta=pd.NamedAgg(column='Delta', aggfunc='sum'),
-            SessionTicks=pd.NamedAgg(column='Timestamp', aggfunc='size') # Count ticks per session
-        )
+        session_summary = _aggregate_sessions(df_exploded)
         print(f"Session summary calculated. Shape: {session_summary.shape}")
         return session_summary
     except Exception as e:
@@ -271,12 +471,13 @@ def calculate_atr(daily_df, period=config.ATR_PERIOD if hasattr(config, 'ATR_PER
         print(f"Error: Missing one or more required columns for ATR calculation: {required_cols}")
         return None
 
-    # Calculate True Range (TR)
-    high_low = daily_df['DailyHigh'] - daily_df['DailyLow']
-    high_close_prev = abs(daily_df['DailyHigh'] - daily_df['DailyClose'].shift(1))
-    low_close_prev = abs(daily_df['DailyLow'] - daily_df['DailyClose'].shift(1))
-    
-    tr = pd.concat([high_low, high_close_prev, low_close_prev], axis=1).max(axis=1)
+    # Calculate True Range (TR) in one pass over the arrays; fmax skips the missing
+    # previous close on the first day, like a row-wise DataFrame max
+    high = daily_df['DailyHigh'].to_numpy(float)
+    low = daily_df['DailyLow'].to_numpy(float)
+    close_prev = np.r_[np.nan, daily_df['DailyClose'].to_numpy(float)[:-1]]
+    tr = pd.Series(np.fmax(high - low, np.fmax(np.abs(high - close_prev), np.abs(low - close_prev))),
+                   index=daily_df.index)
     
     # Calculate ATR using Exponential Moving Average (EMA)
     # Note: Using adjust=False for compatibility with common TA library results
@@ -287,7 +488,40 @@ def calculate_atr(daily_df, period=config.ATR_PERIOD if hasattr(config, 'ATR_PER
     # print(daily_df[['DailyHigh', 'DailyLow', 'DailyClose', 'ATR']].tail()) # Optional: print tail for verification
     return daily_df
 
-def calculate_session_vpoc(tick_df, session_df, date_limit=None):
+def _ticks_by_time(tick_df, columns):
+    """Arrays of *columns* in Timestamp order (stable); plain views when tick_df is already sorted."""
+    ts = tick_df['Timestamp'].to_numpy(dtype='datetime64[ns]').view('i8')
+    order = np.argsort(ts, kind='stable') if np.any(np.diff(ts) < 0) else slice(None)
+    return [ts[order] if col == 'Timestamp' else tick_df[col].to_numpy()[order] for col in columns]
+
+def build_session_slices(tick_df, session_df):
+    """
+    Maps each (Date, Session) of session_df to the (lo, hi) positions of its ticks in
+    tick_df sorted by Timestamp (SessionStart <= Timestamp <= SessionEnd).
+
+    One vectorised searchsorted over all sessions; VPOC and TPO share the result
+    instead of each scanning tick_df per session.
+    """
+    ts = _ticks_by_time(tick_df, ['Timestamp'])[0]
+    starts = session_df['SessionStart'].to_numpy(dtype='datetime64[ns]').view('i8')
+    ends = session_df['SessionEnd'].to_numpy(dtype='datetime64[ns]').view('i8')
+    lo = np.searchsorted(ts, starts, side='left')
+    hi = np.searchsorted(ts, ends, side='right') # SessionEnd is inclusive
+    return dict(zip(session_df.index, zip(lo.tolist(), hi.tolist())))
+
+def _first_dates(session_df, date_limit):
+    """
+    Row mask of session_df for its first *date_limit* dates, and those dates.
+    Selects on the integer codes of the MultiIndex Date level instead of the date objects.
+    """
+    level = session_df.index.names.index('Date')
+    codes = session_df.index.codes[level]
+    dates = session_df.index.levels[level]
+    present = np.unique(codes[codes >= 0])
+    first = present[np.argsort(dates.values[present], kind='stable')[:date_limit]]
+    return np.isin(codes, first), dates[first]
+
+def calculate_session_vpoc(tick_df, session_df, date_limit=None, slices=None):
     """
     Calculates the Volume Point of Control (VPOC) for each session.
     Optionally limits calculation to a specific number of initial dates for testing.
@@ -296,6 +530,7 @@ def calculate_session_vpoc(tick_df, session_df, date_limit=None):
         tick_df (pandas.DataFrame): DataFrame with tick data.
         session_df (pandas.DataFrame): DataFrame with session summary data.
         date_limit (int, optional): Limit calculation to the first N unique dates. Defaults to None (process all).
+        slices (dict, optional): build_session_slices() result to reuse. Built here when None.
 
     Returns:
         pandas.DataFrame: The session_df DataFrame with 'SessionVPOC' column.
@@ -305,60 +540,46 @@ def calculate_session_vpoc(tick_df, session_df, date_limit=None):
         print("Error: Input DataFrames for VPOC calculation are missing.")
         return None
         
-    required_tick_cols = ['Timestamp', 'Date', 'Sessions', 'Close', 'Volume']
+    required_tick_cols = ['Timestamp', 'Date', 'SessionMask', 'Close', 'Volume']
     if not all(col in tick_df.columns for col in required_tick_cols):
         print(f"Error: Missing one or more required columns in tick_df for VPOC: {required_tick_cols}")
         return None
 
-    vpocs = {}
-    
     # Determine dates to process
-    all_dates = session_df.index.get_level_values('Date').unique().sort_values()
     if date_limit is not None and date_limit > 0:
-        dates_to_process = all_dates[:date_limit]
+        in_dates, dates_to_process = _first_dates(session_df, date_limit)
         print(f"Limiting VPOC calculation to first {len(dates_to_process)} dates: {dates_to_process.tolist()}")
         # Filter session_df to only include rows for these dates for iteration
-        sessions_to_process_df = session_df[session_df.index.get_level_values('Date').isin(dates_to_process)]
+        sessions_to_process_df = session_df[in_dates]
     else:
-        dates_to_process = all_dates
         sessions_to_process_df = session_df # Process all sessions
         
     total_sessions_to_process = len(sessions_to_process_df)
-    processed_count = 0
     print(f"Processing VPOC for {total_sessions_to_process} session instances.")
 
-    # Iterate through the potentially filtered sessions
-    for (date, session_name), session_data in sessions_to_process_df.iterrows():
-        # Filter tick data for the specific date and session name
-        # Handle cases where Sessions column might be stored as list or JSON string initially
-        is_list = isinstance(tick_df['Sessions'].iloc[0], list) 
-        if is_list:
-            mask = (tick_df['Date'] == date) & (tick_df['Sessions'].apply(lambda x: session_name in x))
-        else: # Assume JSON string if not list
-             mask = (tick_df['Date'] == date) & (tick_df['Sessions'].str.contains(f'"{session_name}"'))
-             
-        session_ticks = tick_df[mask]
-
-        vpoc = None
-        if not session_ticks.empty:
-            volume_at_price = session_ticks.groupby(session_ticks['Close'].round(1))['Volume'].sum()
-            if not volume_at_price.empty and volume_at_price.max() > 0:
-                 vpoc = volume_at_price.idxmax()
-            else:
-                 vpoc = None
-        else:
-             vpoc = None
-            
-        vpocs[(date, session_name)] = vpoc
-        
-        processed_count += 1
-        if processed_count % 100 == 0 or processed_count == total_sessions_to_process:
-             print(f"Processed {processed_count}/{total_sessions_to_process} sessions for VPOC...")
-            
+    if slices is None:
+        slices = build_session_slices(tick_df, sessions_to_process_df)
+
+    # Each session's ticks are its time slice, narrowed to the ticks carrying the session's bit;
+    # Close is binned to 0.1 as integers and Volume summed per bin
+    close, volume, session_mask = _ticks_by_time(tick_df, ['Close', 'Volume', 'SessionMask'])
+    close = close.astype(float)
+    volume = np.nan_to_num(volume.astype(float))
+    session_bits = {name: 1 << j for j, name in enumerate(session_names())}
+    vpocs = np.full(total_sessions_to_process, np.nan)
+    for i, (date, session_name) in enumerate(sessions_to_process_df.index):
+        lo, hi = slices.get((date, session_name), (0, 0))
+        keep = ((session_mask[lo:hi] & session_bits.get(session_name, 0)) != 0) & ~np.isnan(close[lo:hi])
+        if not keep.any():
+            continue # Sessions without ticks stay NaN
+        bins, codes = np.unique(np.round(close[lo:hi][keep] * 10).astype(np.int64), return_inverse=True)
+        volume_at_price = np.bincount(codes.ravel(), weights=volume[lo:hi][keep])
+        peak = volume_at_price.argmax() # bins are sorted, so ties keep the lowest price
+        if volume_at_price[peak] > 0: # no traded volume -> no VPOC
+            vpocs[i] = bins[peak] / 10.0
     print(f"Finished processing sessions for VPOC.")
 
-    # Create a Series from the calculated vpocs dictionary
-    new_vpocs_series = pd.Series(vpocs)
+    new_vpocs_series = pd.Series(vpocs, index=sessions_to_process_df.index)
     new_vpocs_series.index.names = ['Date', 'Sessions'] # Ensure index names match for update
 
     # Update the SessionVPOC column in the original session_df
@@ -384,22 +605,346 @@ def calculate_session_vpoc(tick_df, session_df, date_limit=None):
          print("SessionVPOC column added/updated, but all processed values are null.")
     return session_df
 
-def calculate_tpo_metrics(tick_df, session_df, tpo_period_minutes, price_step, value_area_percent, ib_periods, date_limit=None):
+def stream_aggregates(filename, block_size=64 << 20):
+    """
+    Daily and session summaries (with SessionVPOC) from the tick file in one streaming pass.
+
+    Each Arrow record batch (~block_size bytes of CSV) is reduced to small per-day,
+    per-session and per-(session, 0.1 price bin) partials that are merged at the end,
+    so peak memory is one batch instead of the whole file. TPO metrics need the
+    session ticks themselves and are not computed here.
+
+    Returns:
+        tuple: (daily_df, session_df), or (None, None) if an error occurs.
+    """
+    print(f"Streaming aggregates from {filename} (block size {block_size >> 20} MB)...")
+    column_names = [
+        'Timestamp', 'Open', 'High', 'Low', 'Close', 
+        'Volume', 'Trades', 'BidVolume', 'AskVolume'
+    ]
+    column_types = {'Timestamp': pa.timestamp('ns')}
+    column_types.update({col: pa.float64() for col in ('Open', 'High', 'Low', 'Close')})
+    column_types.update({col: pa.int64() for col in ('Volume', 'Trades', 'BidVolume', 'AskVolume')})
+
+    daily_parts, session_parts, vpoc_parts = [], [], []
+    try:
+        reader = pa_csv.open_csv(
+            filename,
+            read_options=pa_csv.ReadOptions(column_names=column_names, block_size=block_size,
+                                            skip_rows=1 if _tick_csv_has_header(filename) else 0),
+            convert_options=pa_csv.ConvertOptions(column_types=column_types,
+                                                  timestamp_parsers=['%Y-%m-%d %H:%M:%S']),
+        )
+        rows = 0
+        for batch in reader:
+            df = batch.to_pandas().dropna(subset=['Timestamp'])
+            if df.empty:
+                continue
+            rows += len(df)
+            df['Delta'] = df['AskVolume'] - df['BidVolume']
+            daily_parts.append(_aggregate_days(df.set_index('Timestamp')))
+
+            df['SessionMask'] = assign_session_mask(df)
+            ticks = explode_sessions(df.sort_values('Timestamp', kind='stable'))
+            if ticks.empty:
+                continue
+            session_parts.append(_aggregate_sessions(ticks))
+            ticks = ticks.dropna(subset=['Close'])
+            vpoc_parts.append(ticks.groupby(
+                [ticks['Timestamp'].values.astype('datetime64[D]'), 'Sessions',
+                 np.round(ticks['Close'].to_numpy() * 10).astype(np.int64)],
+                sort=False, observed=True)['Volume'].sum())
+            print(f"Aggregated {rows} ticks...")
+    except FileNotFoundError:
+        print(f"Error: Input file '{filename}' not found.")
+        return None, None
+    except Exception as e:
+        print(f"An error occurred while streaming aggregates: {e}")
+        return None, None
+
+    if not daily_parts:
+        print("Warning: No ticks found in file.")
+        return None, None
+
+    # Merge the partials: batches are in file order, so first/last follow the file like the in-memory path
+    daily = pd.concat(daily_parts)
+    daily_df = daily.groupby(level='Date').agg(
+        DailyOpen=('DailyOpen', 'first'), DailyHigh=('DailyHigh', 'max'), DailyLow=('DailyLow', 'min'),
+        DailyClose=('DailyClose', 'last'), DailyVolume=('DailyVolume', 'sum'), DailyDelta=('DailyDelta', 'sum'))
+    print(f"Daily summary calculated. Shape: {daily_df.shape}")
+
+    if not session_parts:
+        print("Warning: No data points found within defined sessions.")
+        return daily_df, None
+    sessions = pd.concat(session_parts)
+    session_grouped = sessions.groupby(level=['Date', 'Sessions'])
+    session_df = session_grouped.agg(
+        SessionStart=('SessionStart', 'min'), SessionEnd=('SessionEnd', 'max'),
+        SessionHigh=('SessionHigh', 'max'), SessionLow=('SessionLow', 'min'),
+        SessionVolume=('SessionVolume', 'sum'), SessionDelta=('SessionDelta', 'sum'),
+        SessionTicks=('SessionTicks', 'sum'))
+    # Open/Close come from the partial holding the session's first/last tick
+    session_df['SessionOpen'] = sessions.sort_values('SessionStart', kind='stable').groupby(level=['Date', 'Sessions'])['SessionOpen'].first()
+    session_df['SessionClose'] = sessions.sort_values('SessionEnd', kind='stable').groupby(level=['Date', 'Sessions'])['SessionClose'].last()
+    session_df = session_df[['SessionStart', 'SessionEnd', 'SessionOpen', 'SessionHigh', 'SessionLow',
+                             'SessionClose', 'SessionVolume', 'SessionDelta', 'SessionTicks']]
+
+    # VPOC: summed volume per 0.1 bin; bins are sorted within a session, so ties keep the lowest price
+    volume_at_price = pd.concat(vpoc_parts).groupby(level=[0, 1, 2], observed=True).sum()
+    per_session = volume_at_price.groupby(level=[0, 1], observed=True)
+    peak_bin = per_session.idxmax()
+    vpoc = pd.Series([key[2] / 10.0 for key in peak_bin], dtype=float,
+                     index=pd.MultiIndex.from_arrays([pd.DatetimeIndex(peak_bin.index.get_level_values(0)).date,
+                                                      peak_bin.index.get_level_values(1).astype(object)]))
+    vpoc = vpoc.where(per_session.max().to_numpy() > 0) # no traded volume -> no VPOC
+    session_df['SessionVPOC'] = vpoc.reindex(session_df.index)
+    print(f"Session summary calculated. Shape: {session_df.shape}")
+    return daily_df, session_df
+
+def value_area_bounds(counts, poc_idx, target):
+    """
+    Expands the value area outwards from poc_idx over a 1-D array of TPO counts until
+    it holds at least target TPOs. Returns the (low, high) positions of the value area.
+    """
+    n = len(counts)
+    current_va_tpos = counts[poc_idx]
+    upper_idx, lower_idx = poc_idx + 1, poc_idx - 1
+    while current_va_tpos < target and (lower_idx >= 0 or upper_idx < n):
+        add_upper = upper_idx < n
+        add_lower = lower_idx >= 0
+
+        tpos_upper = counts[upper_idx] if add_upper else -1
+        tpos_lower = counts[lower_idx] if add_lower else -1
+
+        # Add level with more TPOs first, or upper if equal
+        if tpos_upper >= tpos_lower and add_upper:
+            current_va_tpos += tpos_upper
+            upper_idx += 1
+        elif tpos_lower > tpos_upper and add_lower:
+            current_va_tpos += tpos_lower
+            lower_idx -= 1
+        elif add_lower: # Only lower is left
+            current_va_tpos += tpos_lower
+            lower_idx -= 1
+        elif add_upper: # Only upper is left
+            current_va_tpos += tpos_upper
+            upper_idx += 1
+        else:
+            break # Should not happen
+    return lower_idx + 1, upper_idx - 1
+
+if njit is not None:
+    value_area_bounds = njit(cache=True)(value_area_bounds)
+
+def _tpo_session_metrics(session_key, session_start, session_end, session_high_price, session_low_price,
+                         ts_i8, highs, lows, tpo_period_minutes, price_step, value_area_percent, ib_periods):
+    """
+    TPO metrics for a single session from its tick timestamps (int64 ns) and High/Low arrays.
+    Kept at module level so calculate_tpo_metrics can hand sessions to worker processes.
+    """
+    tpo_period_str = f'{tpo_period_minutes}min'
+    tpo_letters = list(string.ascii_uppercase) + list(string.ascii_lowercase) 
+
+    if ts_i8.size == 0:
+        return {'TPO_POC': np.nan, 'VAH': np.nan, 'VAL': np.nan, 'IB_High': np.nan, 'IB_Low': np.nan, 'PoorHigh': False, 'PoorHighPrice': np.nan, 'PoorLow': False, 'PoorLowPrice': np.nan, 'SinglePrints': False}
+
+    # Assign TPO letters based on resampling
+    # Create time bins
+    time_bins = pd.date_range(start=session_start.floor(tpo_period_str), end=session_end.ceil(tpo_period_str), freq=tpo_period_str)
+    if len(time_bins) < 2: # Need at least one full period 
+         return {'TPO_POC': np.nan, 'VAH': np.nan, 'VAL': np.nan, 'IB_High': np.nan, 'IB_Low': np.nan, 'PoorHigh': False, 'PoorHighPrice': np.nan, 'PoorLow': False, 'PoorLowPrice': np.nan, 'SinglePrints': False}
+         
+    # Ensure we don't exceed available letters
+    num_periods = len(time_bins) -1
+    if num_periods > len(tpo_letters):
+         print(f"Warning: Session {session_key[0]} {session_key[1]} has more TPO periods ({num_periods}) than available letters ({len(tpo_letters)}). Skipping.")
+         return {'TPO_POC': np.nan, 'VAH': np.nan, 'VAL': np.nan, 'IB_High': np.nan, 'IB_Low': np.nan, 'PoorHigh': False, 'PoorHighPrice': np.nan, 'PoorLow': False, 'PoorLowPrice': np.nan, 'SinglePrints': False}
+         
+    # Assign each tick its TPO period: period p covers [time_bins[p], time_bins[p+1])
+    period_id = np.searchsorted(time_bins.values.view('i8'), ts_i8, side='right') - 1
+    in_period = (period_id >= 0) & (period_id < num_periods) # Drop ticks outside defined periods
+    period_id = period_id[in_period]
+
+    if period_id.size == 0:
+         return {'TPO_POC': np.nan, 'VAH': np.nan, 'VAL': np.nan, 'IB_High': np.nan, 'IB_Low': np.nan, 'PoorHigh': False, 'PoorHighPrice': np.nan, 'PoorLow': False, 'PoorLowPrice': np.nan, 'SinglePrints': False}
+
+    # Per-period high/low with one reduceat over period-contiguous ticks (fmax/fmin skip NaN like pandas)
+    highs = highs[in_period]
+    lows = lows[in_period]
+    if np.any(np.diff(period_id) < 0):
+        order = np.argsort(period_id, kind='stable')
+        period_id, highs, lows = period_id[order], highs[order], lows[order]
+    periods, starts = np.unique(period_id, return_index=True) # periods that have ticks, in letter order
+    period_highs = np.fmax.reduceat(highs, starts)
+    period_lows = np.fmin.reduceat(lows, starts)
+
+    # Build profile on integer tick levels (price = tick * price_step): binning and level
+    # lookups are plain integer offsets, with no float rounding until results are written
+    low_ticks = np.floor(period_lows / price_step)
+    high_ticks = np.ceil(period_highs / price_step) # Use < high tick
+    min_tick = np.fmin.reduce(low_ticks)
+    max_tick = np.fmax.reduce(high_ticks)
+    if np.isnan(min_tick) or np.isnan(max_tick):
+         return {'TPO_POC': np.nan, 'VAH': np.nan, 'VAL': np.nan, 'IB_High': np.nan, 'IB_Low': np.nan, 'PoorHigh': False, 'PoorHighPrice': np.nan, 'PoorLow': False, 'PoorLowPrice': np.nan, 'SinglePrints': False}
+    min_tick, max_tick = int(min_tick), int(max_tick)
+    num_levels = max_tick - min_tick + 1
+
+    def level_price(tick):
+        """Price of an integer tick level."""
+        return float(np.round(tick * price_step, 8))
+
+    # Each period touches the contiguous levels [floor(low), ceil(high)) -> bin range [lo_b, hi_b)
+    traded = ~(np.isnan(low_ticks) | np.isnan(high_ticks))
+    lo_b = np.where(traded, low_ticks - min_tick, 0).astype(np.int64)
+    hi_b = np.where(traded, high_ticks - min_tick, 0).astype(np.int64)
+
+    # Letters per level: every period adds 1 over [lo_b, hi_b), so count the range starts
+    # and ends per level and take the running total (a difference array, no per-period loop)
+    spans = hi_b > lo_b
+    tpo_counts_arr = np.cumsum(np.bincount(lo_b[spans], minlength=num_levels + 1)
+                               - np.bincount(hi_b[spans], minlength=num_levels + 1))[:num_levels].astype(np.int32)
+
+    def periods_at_level(tick):
+        """Number of TPO letters printed at tick level *tick* (0 if it is not a profile level)."""
+        b = tick - min_tick
+        if 0 <= b < num_levels:
+            return int(tpo_counts_arr[int(b)])
+        return 0
+
+    # --- Calculate Metrics --- 
+    tpo_poc_level = np.nan
+    vah_level = np.nan
+    val_level = np.nan
+    ib_high_level = np.nan
+    ib_low_level = np.nan
+    is_poor_high = False
+    poor_high_price = np.nan
+    is_poor_low = False
+    poor_low_price = np.nan
+    has_single_prints = False
+    sp_high_price = np.nan
+    sp_low_price = np.nan
+
+    # Profile = traded levels only (empty levels inside price gaps are skipped by the VA walk)
+    traded_levels = np.flatnonzero(tpo_counts_arr)
+    traded_ticks = traded_levels + min_tick
+    traded_counts = tpo_counts_arr[traded_levels].astype(np.int64)
+    if traded_levels.size:
+        # Calculate TPO POC (first maximum = lowest price on ties)
+        poc_idx = int(traded_counts.argmax())
+        tpo_poc_level = level_price(traded_ticks[poc_idx])
+
+        # Calculate Value Area
+        total_tpos = traded_counts.sum()
+        target_va_tpos = int(total_tpos * value_area_percent)
+        
+        # Start from POC and expand outwards
+        val_i, vah_i = value_area_bounds(traded_counts, poc_idx, target_va_tpos)
+        val_tick = traded_ticks[val_i]
+        vah_tick = traded_ticks[vah_i]
+        val_level = level_price(val_tick)
+        vah_level = level_price(vah_tick)
+
+        # Calculate Initial Balance
+        in_ib = periods < ib_periods
+        if in_ib.any():
+            ib_high_level = np.fmax.reduce(period_highs[in_ib])
+            ib_low_level = np.fmin.reduce(period_lows[in_ib])
+
+        # Poor High / Poor Low
+        session_high_tick = np.floor(session_high_price / price_step)
+        session_low_tick = np.floor(session_low_price / price_step)
+        
+        # Only the two extreme levels need their letter count
+        if periods_at_level(session_high_tick) >= config.POOR_EXTREME_TPO_THRESHOLD:
+             is_poor_high = True
+             poor_high_price = session_high_price
+        if periods_at_level(session_low_tick) >= config.POOR_EXTREME_TPO_THRESHOLD:
+             is_poor_low = True
+             poor_low_price = session_low_price
+                  
+        # ── START SP DETECT  (v2 – threshold OR span, tolerant of tiny gaps) ──
+        """
+        Flags the session as having single prints if
+
+          • at least THRESH consecutive single‑TPO price levels **OR**
+          • the total span of all single‑print levels ≥ MIN_SPAN_USD.
+
+        A "consecutive" run allows a one‑tick gap (to forgive missing rungs).
+        Threshold knobs live in config.py when present; otherwise defaults
+        below are used.
+        """
+
+        THRESH      = getattr(config, "SINGLE_PRINT_THRESHOLD", 80)     # ≥ 8 USDT at 0.1‑step
+        MIN_SHARE   = getattr(config, "SINGLE_PRINT_MIN_SHARE", 0.30)   # ≥ 30 % of session range
+
+        single_print_ticks = traded_ticks[traded_counts == 1]
+        has_single_prints = False
+        sp_high_price = sp_low_price = np.nan
+
+        if single_print_ticks.size:
+             # (a) longest almost‑consecutive run (allow 1‑tick gaps)
+             close  = np.diff(single_print_ticks) <= 1.51   # 0 or 1 tick gap
+             breaks = np.flatnonzero(~close)
+             run_lengths = np.diff(np.r_[-1, breaks, close.size])        # levels per run
+             max_consec = int(run_lengths.max())
+
+             # (b) strip coverage (% of full session range)
+             span_usd  = (single_print_ticks[-1] - single_print_ticks[0]) * price_step
+             sess_rng  = session_high_price - session_low_price
+             coverage  = span_usd / sess_rng if sess_rng else 0
+
+             # (c) keep only mid‑profile singles (avoid edge fluff)
+             mid_band_mask = (
+                 (single_print_ticks > val_tick + 5) &
+                 (single_print_ticks < vah_tick - 5)
+             )
+
+             if mid_band_mask.any() and \
+                (max_consec >= THRESH) and \
+                (coverage  >= MIN_SHARE):
+                  has_single_prints = True
+                  sp_high_price = level_price(single_print_ticks[mid_band_mask].max())
+                  sp_low_price  = level_price(single_print_ticks[mid_band_mask].min())
+        # ── END SP DETECT ───────────────────────────────────────────
+
+        # Determine high/low price of single‑print region if detected
+        sp_high_price = np.nan
+        sp_low_price  = np.nan
+        if has_single_prints:
+            sp_high_price = level_price(single_print_ticks.max()) if single_print_ticks.size else np.nan
+            sp_low_price  = level_price(single_print_ticks.min()) if single_print_ticks.size else np.nan
+
+    return {
+        'TPO_POC': tpo_poc_level,
+        'VAH': vah_level,
+        'VAL': val_level,
+        'IB_High': ib_high_level,
+        'IB_Low': ib_low_level,
+        'PoorHigh': is_poor_high,
+        'PoorHighPrice': poor_high_price,
+        'PoorLow': is_poor_low,
+        'PoorLowPrice': poor_low_price,
+        'SinglePrints': has_single_prints,
+        'SP_High': sp_high_price,
+        'SP_Low': sp_low_price
+    }
+
+def calculate_tpo_metrics(tick_df, session_df, tpo_period_minutes, price_step, value_area_percent, ib_periods, date_limit=None, max_workers=None, slices=None):
     """
     Calculates TPO metrics (POC, VA, IB, Poor High/Low, Single Prints) for each session.
+    Sessions are independent, so they are spread over a process pool (max_workers=1 runs in-process).
+    slices is an optional build_session_slices() result to reuse.
     """
     print(f"\nCalculating TPO Metrics... (Period: {tpo_period_minutes}min, Step: {price_step}, VA: {value_area_percent*100}%, IB Periods: {ib_periods}, Date Limit: {date_limit})")
     
     tpo_results = {}
-    tpo_period_str = f'{tpo_period_minutes}min'
-    tpo_letters = list(string.ascii_uppercase) + list(string.ascii_lowercase) 
 
     # Determine dates/sessions to process
-    all_dates = session_df.index.get_level_values('Date').unique().sort_values()
     if date_limit is not None and date_limit > 0:
-        dates_to_process = all_dates[:date_limit]
+        in_dates, dates_to_process = _first_dates(session_df, date_limit)
         print(f"Limiting TPO calculation to first {len(dates_to_process)} dates: {dates_to_process.tolist()}")
-        sessions_to_process_df = session_df[session_df.index.get_level_values('Date').isin(dates_to_process)]
+        sessions_to_process_df = session_df[in_dates]
     else:
         sessions_to_process_df = session_df
         
@@ -407,230 +952,40 @@ def calculate_tpo_metrics(tick_df, session_df, tpo_period_minutes, price_step, v
     processed_count = 0
     print(f"Processing TPO for {total_sessions_to_process} session instances.")
 
-    debug_first_session = True # Flag for debug prints
+    # Ticks sorted by time once: each session is then the contiguous slice [lo, hi), and the
+    # worker gets plain array views instead of a filtered DataFrame copy
+    if slices is None:
+        slices = build_session_slices(tick_df, sessions_to_process_df)
+    tick_ts, tick_highs, tick_lows = _ticks_by_time(tick_df, ['Timestamp', 'High', 'Low'])
+    tick_highs, tick_lows = tick_highs.astype(float), tick_lows.astype(float)
 
+    # One argument tuple per session: only the tick arrays the worker needs are pickled
+    jobs = []
     for (date, session_name), session_data in sessions_to_process_df.iterrows():
         session_start = session_data['SessionStart']
         session_end = session_data['SessionEnd']
+        lo, hi = slices.get((date, session_name), (0, 0))
+        jobs.append(((date, session_name), session_start, session_end,
+                     session_data['SessionHigh'], session_data['SessionLow'],
+                     tick_ts[lo:hi], tick_highs[lo:hi], tick_lows[lo:hi],
+                     tpo_period_minutes, price_step, value_area_percent, ib_periods))
+
+    if max_workers == 1 or len(jobs) < 2:
+        results = (_tpo_session_metrics(*job) for job in jobs)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+        results = executor.map(_tpo_session_metrics, *zip(*jobs), chunksize=max(1, len(jobs) // (4 * (os.cpu_count() or 1))))
 
-        # Filter ticks for the session
-        session_ticks = tick_df[(tick_df['Timestamp'] >= session_start) & (tick_df['Timestamp'] <= session_end)].copy()
-
-        if session_ticks.empty:
-            tpo_results[(date, session_name)] = {'TPO_POC': np.nan, 'VAH': np.nan, 'VAL': np.nan, 'IB_High': np.nan, 'IB_Low': np.nan, 'PoorHigh': False, 'PoorHighPrice': np.nan, 'PoorLow': False, 'PoorLowPrice': np.nan, 'SinglePrints': False}
+    try:
+        for job, result in zip(jobs, results):
+            tpo_results[job[0]] = result
             processed_count += 1
-            continue
-            
-        session_ticks.set_index('Timestamp', inplace=True)
-
-        # Assign TPO letters based on resampling
-        # Create time bins
-        time_bins = pd.date_range(start=session_start.floor(tpo_period_str), end=session_end.ceil(tpo_period_str), freq=tpo_period_str)
-        if len(time_bins) < 2: # Need at least one full period 
-             tpo_results[(date, session_name)] = {'TPO_POC': np.nan, 'VAH': np.nan, 'VAL': np.nan, 'IB_High': np.nan, 'IB_Low': np.nan, 'PoorHigh': False, 'PoorHighPrice': np.nan, 'PoorLow': False, 'PoorLowPrice': np.nan, 'SinglePrints': False}
-             processed_count += 1
-             continue
-             
-        # Ensure we don't exceed available letters
-        num_periods = len(time_bins) -1
-        if num_periods > len(tpo_letters):
-             print(f"Warning: Session {date} {session_name} has more TPO periods ({num_periods}) than available letters ({len(tpo_letters)}). Skipping.")
-             tpo_results[(date, session_name)] = {'TPO_POC': np.nan, 'VAH': np.nan, 'VAL': np.nan, 'IB_High': np.nan, 'IB_Low': np.nan, 'PoorHigh': False, 'PoorHighPrice': np.nan, 'PoorLow': False, 'PoorLowPrice': np.nan, 'SinglePrints': False}
-             processed_count += 1
-             continue
-             
-        period_labels = {time_bins[i]: tpo_letters[i] for i in range(num_periods)}
-        # Assign TPO letter based on which bin the timestamp falls into
-        session_ticks['TPO_Letter'] = pd.cut(session_ticks.index, bins=time_bins, labels=list(period_labels.values()), right=False, include_lowest=True)
-        session_ticks.dropna(subset=['TPO_Letter'], inplace=True) # Drop ticks outside defined periods
-
-        if session_ticks.empty:
-             tpo_results[(date, session_name)] = {'TPO_POC': np.nan, 'VAH': np.nan, 'VAL': np.nan, 'IB_High': np.nan, 'IB_Low': np.nan, 'PoorHigh': False, 'PoorHighPrice': np.nan, 'PoorLow': False, 'PoorLowPrice': np.nan, 'SinglePrints': False}
-             processed_count += 1
-             continue
-
-        # Build profile
-        min_price = session_ticks['Low'].min()
-        max_price = session_ticks['High'].max()
-        # Create discrete price levels
-        price_levels = np.arange(np.floor(min_price / price_step) * price_step, 
-                               np.ceil(max_price / price_step) * price_step + price_step, 
-                               price_step)
-        price_levels = np.round(price_levels, decimals=8) # Avoid precision issues
-
-        tpo_counts = pd.Series(0, index=price_levels)
-        letters_at_price = {level: set() for level in price_levels} # Store letters per level
-
-        for letter, period_ticks in session_ticks.groupby('TPO_Letter', observed=False):
-            period_low = period_ticks['Low'].min()
-            period_high = period_ticks['High'].max()
-            low_idx = np.floor(period_low / price_step) * price_step
-            high_idx = np.ceil(period_high / price_step) * price_step
-            touched_levels = price_levels[(price_levels >= np.round(low_idx, 8)) & (price_levels < np.round(high_idx, 8))] # Use < high_idx
-            
-            if len(touched_levels) > 0:
-                 tpo_counts.loc[touched_levels] += 1
-                 for level in touched_levels:
-                     letters_at_price[level].add(letter)
-
-        # --- Calculate Metrics --- 
-        tpo_poc_level = np.nan
-        vah_level = np.nan
-        val_level = np.nan
-        ib_high_level = np.nan
-        ib_low_level = np.nan
-        is_poor_high = False
-        poor_high_price = np.nan
-        is_poor_low = False
-        poor_low_price = np.nan
-        has_single_prints = False
-        session_high_price = session_data['SessionHigh'] # Get actual session high/low
-        session_low_price = session_data['SessionLow']
-
-        valid_tpo_counts = tpo_counts[tpo_counts > 0]
-        if not valid_tpo_counts.empty:
-            # Calculate TPO POC
-            tpo_poc_level = valid_tpo_counts.idxmax() 
-
-            # Calculate Value Area
-            total_tpos = valid_tpo_counts.sum()
-            target_va_tpos = int(total_tpos * value_area_percent)
-            
-            # Start from POC and expand outwards
-            poc_index_loc = valid_tpo_counts.index.get_loc(tpo_poc_level)
-            va_indices = {poc_index_loc}
-            current_va_tpos = valid_tpo_counts.iloc[poc_index_loc]
-            
-            upper_idx, lower_idx = poc_index_loc + 1, poc_index_loc - 1
-            while current_va_tpos < target_va_tpos and (lower_idx >= 0 or upper_idx < len(valid_tpo_counts)):
-                add_upper = upper_idx < len(valid_tpo_counts)
-                add_lower = lower_idx >= 0
-
-                tpos_upper = valid_tpo_counts.iloc[upper_idx] if add_upper else -1
-                tpos_lower = valid_tpo_counts.iloc[lower_idx] if add_lower else -1
-                
-                # Add level with more TPOs first, or upper if equal
-                if tpos_upper >= tpos_lower and add_upper:
-                     va_indices.add(upper_idx)
-                     current_va_tpos += tpos_upper
-                     upper_idx += 1
-                elif tpos_lower > tpos_upper and add_lower:
-                     va_indices.add(lower_idx)
-                     current_va_tpos += tpos_lower
-                     lower_idx -= 1
-                elif add_lower: # Only lower is left
-                     va_indices.add(lower_idx)
-                     current_va_tpos += tpos_lower
-                     lower_idx -= 1
-                elif add_upper: # Only upper is left
-                     va_indices.add(upper_idx)
-                     current_va_tpos += tpos_upper
-                     upper_idx += 1
-                else:
-                     break # Should not happen
-            
-            if va_indices:
-                 va_level_indices = sorted(list(va_indices))
-                 val_level = valid_tpo_counts.index[va_level_indices[0]]
-                 vah_level = valid_tpo_counts.index[va_level_indices[-1]]
-
-            # Calculate Initial Balance
-            ib_letters = tpo_letters[:ib_periods]
-            ib_ticks = session_ticks[session_ticks['TPO_Letter'].isin(ib_letters)]
-            if not ib_ticks.empty:
-                ib_high_level = ib_ticks['High'].max()
-                ib_low_level = ib_ticks['Low'].min()
-
-            # Poor High / Poor Low
-            session_high_level = np.round(np.floor(session_high_price / price_step) * price_step, 8)
-            session_low_level = np.round(np.floor(session_low_price / price_step) * price_step, 8)
-            
-            # Check if the level exists in our profile index
-            if session_high_level in letters_at_price:
-                 if len(letters_at_price[session_high_level]) >= config.POOR_EXTREME_TPO_THRESHOLD:
-                      is_poor_high = True
-                      poor_high_price = session_high_price
-            if session_low_level in letters_at_price:
-                  if len(letters_at_price[session_low_level]) >= config.POOR_EXTREME_TPO_THRESHOLD:
-                      is_poor_low = True
-                      poor_low_price = session_low_price
-                      
-            # ── START SP DETECT  (v2 – threshold OR span, tolerant of tiny gaps) ──
-            """
-            Flags the session as having single prints if
-
-              • at least THRESH consecutive single‑TPO price levels **OR**
-              • the total span of all single‑print levels ≥ MIN_SPAN_USD.
-
-            A "consecutive" run allows a one‑tick gap (to forgive missing rungs).
-            Threshold knobs live in config.py when present; otherwise defaults
-            below are used.
-            """
-
-            THRESH      = getattr(config, "SINGLE_PRINT_THRESHOLD", 80)     # ≥ 8 USDT at 0.1‑step
-            MIN_SHARE   = getattr(config, "SINGLE_PRINT_MIN_SHARE", 0.30)   # ≥ 30 % of session range
-
-            single_print_levels = valid_tpo_counts[valid_tpo_counts == 1].index.to_numpy()
-            has_single_prints = False
-            sp_high_price = sp_low_price = np.nan
-
-            if single_print_levels.size:
-                 # (a) longest almost‑consecutive run (allow 1‑tick gaps)
-                 diffs  = np.diff(single_print_levels)
-                 consec = max_consec = 1
-                 for d in diffs:
-                     if d <= price_step * 1.51:   # 0 or 1 tick gap
-                         consec += 1
-                     else:
-                         max_consec = max(max_consec, consec)
-                         consec = 1
-                 max_consec = max(max_consec, consec)
-
-                 # (b) strip coverage (% of full session range)
-                 span_usd  = single_print_levels[-1] - single_print_levels[0]
-                 sess_rng  = session_high_price - session_low_price
-                 coverage  = span_usd / sess_rng if sess_rng else 0
-
-                 # (c) keep only mid‑profile singles (avoid edge fluff)
-                 mid_band_mask = (
-                     (single_print_levels > val_level + 5 * price_step) &
-                     (single_print_levels < vah_level - 5 * price_step)
-                 )
-
-                 if mid_band_mask.any() and \
-                    (max_consec >= THRESH) and \
-                    (coverage  >= MIN_SHARE):
-                      has_single_prints = True
-                      sp_high_price = float(single_print_levels[mid_band_mask].max())
-                      sp_low_price  = float(single_print_levels[mid_band_mask].min())
-            # ── END SP DETECT ───────────────────────────────────────────
-
-            # Determine high/low price of single‑print region if detected
-            sp_high_price = np.nan
-            sp_low_price  = np.nan
-            if has_single_prints:
-                sp_high_price = float(single_print_levels.max()) if single_print_levels.size else np.nan
-                sp_low_price  = float(single_print_levels.min()) if single_print_levels.size else np.nan
-
-        tpo_results[(date, session_name)] = {
-            'TPO_POC': tpo_poc_level,
-            'VAH': vah_level,
-            'VAL': val_level,
-            'IB_High': ib_high_level,
-            'IB_Low': ib_low_level,
-            'PoorHigh': is_poor_high,
-            'PoorHighPrice': poor_high_price,
-            'PoorLow': is_poor_low,
-            'PoorLowPrice': poor_low_price,
-            'SinglePrints': has_single_prints,
-            'SP_High': sp_high_price,
-            'SP_Low': sp_low_price
-        }
-        
-        debug_first_session = False # Disable debug prints after first session
-        processed_count += 1
-        if processed_count % 10 == 0 or processed_count == total_sessions_to_process:
-            print(f"Processed {processed_count}/{total_sessions_to_process} sessions for TPO...")
+            if processed_count % 10 == 0 or processed_count == total_sessions_to_process:
+                print(f"Processed {processed_count}/{total_sessions_to_process} sessions for TPO...")
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
     print("Finished processing TPO metrics.")
 
@@ -650,47 +1005,90 @@ def calculate_tpo_metrics(tick_df, session_df, tpo_period_minutes, price_step, v
     print("TPO columns updated/added.")
     return session_df
 
-def save_to_database(tick_df, daily_df, session_df, db_filename):
+def save_tick_frame(tick_df, path):
+    """Writes the tick frame as zstd Parquet (columnar alternative to the SQLite tick_data table)."""
+    print(f"Saving tick data to {path} ({len(tick_df)} rows)...")
+    tick_df_to_save = tick_df.reset_index() if pd.api.types.is_datetime64_any_dtype(tick_df.index) else tick_df
+    tick_df_to_save.to_parquet(path, engine='pyarrow', compression='zstd', row_group_size=200_000, index=False)
+    print("Tick data saved.")
+
+def load_tick_frame(path, columns=None):
+    """Reads a frame written by save_tick_frame; Timestamp, Date and SessionMask keep their native types."""
+    return pq.ParquetFile(path).read(columns=columns).to_pandas()
+
+def write_table(conn, table, df, chunk_rows=100_000):
+    """
+    Replaces `table` with the rows of `df` via chunked executemany, using the same
+    table layout DataFrame.to_sql creates (datetimes as TEXT, date objects as DATE).
+    Runs inside the caller's transaction; the caller commits.
+    """
+    columns, sql_types, arrays = list(df.columns), [], []
+    for col in columns:
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            sql_types.append('TEXT')
+            arrays.append(values.astype(str).to_numpy())
+        elif pd.api.types.is_bool_dtype(values) or pd.api.types.is_integer_dtype(values):
+            sql_types.append('INTEGER')
+            arrays.append(values.to_numpy())
+        elif pd.api.types.is_float_dtype(values):
+            sql_types.append('REAL')
+            arrays.append(values.to_numpy())
+        elif pd.api.types.infer_dtype(values, skipna=True) == 'date':
+            sql_types.append('DATE')
+            arrays.append(values.astype(str).to_numpy()) # 'YYYY-MM-DD'
+        else:
+            sql_types.append('TEXT')
+            arrays.append(values.to_numpy())
+
+    conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+    conn.execute(f'CREATE TABLE "{table}" (\n' + ',\n  '.join(f'"{c}" {t}' for c, t in zip(columns, sql_types)) + '\n)')
+    insert_sql = f'INSERT INTO "{table}" VALUES ({", ".join("?" * len(columns))})'
+    # .tolist() per chunk gives sqlite3 plain Python values without a full copy
+    for start in range(0, len(df), chunk_rows):
+        conn.executemany(insert_sql, zip(*(a[start:start + chunk_rows].tolist() for a in arrays)))
+
+def save_to_database(tick_df, daily_df, session_df, db_filename, drop_ticks=False):
     """
     Saves all three DataFrames to SQLite, handling new TPO & ASR columns.
+    With tick_df None and drop_ticks=True, an existing tick_data table is dropped
+    (the ticks were stored elsewhere, or not at all, and would otherwise go stale).
     """
     print(f"\nSaving data to database: {db_filename}...")
     try:
         with sqlite3.connect(db_filename) as conn:
+            # Bulk-rebuild settings: every table here can be regenerated from the input file,
+            # so synchronous=OFF trades crash durability for not fsync'ing each commit.
+            # page_size only takes effect on a new (or vacuumed) database file.
+            conn.executescript("""
+                PRAGMA page_size=32768;
+                PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=OFF;
+                PRAGMA temp_store=MEMORY;
+                PRAGMA cache_size=-262144;
+            """)
+            # All table replacements in one transaction: committed once when the with-block exits,
+            # rolled back together if any write fails
+            conn.execute('BEGIN')
+
             # --- Save tick data --- 
             if tick_df is not None:
                 print(f"Saving tick_data table ({len(tick_df)} rows)...")
-                tick_df_to_save = tick_df.copy()
-                if pd.api.types.is_datetime64_any_dtype(tick_df_to_save.index):
-                    tick_df_to_save.reset_index(inplace=True)
-                
-                if 'Timestamp' in tick_df_to_save.columns and pd.api.types.is_datetime64_any_dtype(tick_df_to_save['Timestamp']):
-                     tick_df_to_save['Timestamp'] = tick_df_to_save['Timestamp'].astype(str)
-                
-                if 'Date' in tick_df_to_save.columns and not pd.api.types.is_string_dtype(tick_df_to_save['Date']) and not pd.api.types.is_object_dtype(tick_df_to_save['Date']):
-                    tick_df_to_save['Date'] = tick_df_to_save['Date'].astype(str)
-
-                if 'Sessions' in tick_df_to_save.columns:
-                    if tick_df_to_save['Sessions'].apply(lambda x: isinstance(x, list)).any():
-                         print("Converting Sessions list to JSON string...")
-                         tick_df_to_save['Sessions'] = tick_df_to_save['Sessions'].apply(json.dumps)
-                    # else: # Removed unnecessary print
-                    #      print("Sessions column already seems to be stored as string.")
-
-                tick_df_to_save.to_sql('tick_data', conn, if_exists='replace', index=False)
+                tick_df_to_save = tick_df.reset_index() if pd.api.types.is_datetime64_any_dtype(tick_df.index) else tick_df
+                write_table(conn, 'tick_data', tick_df_to_save)
                 print("tick_data table saved.")
+            elif drop_ticks:
+                conn.execute("DROP TABLE IF EXISTS tick_data")
+                print("Tick data not stored in the database; dropped any existing tick_data table.")
             else:
                 print("Tick data DataFrame is None, skipping save.")
                 
             # --- Save daily summary data --- 
             if daily_df is not None:
                 print(f"Saving daily_summary table ({len(daily_df)} rows)...")
-                daily_df_to_save = daily_df.copy()
-                daily_df_to_save.reset_index(inplace=True)
-                if 'Date' in daily_df_to_save.columns and not pd.api.types.is_string_dtype(daily_df_to_save['Date']) and not pd.api.types.is_object_dtype(daily_df_to_save['Date']):
-                    daily_df_to_save['Date'] = daily_df_to_save['Date'].astype(str)
-                
-                daily_df_to_save.to_sql('daily_summary', conn, if_exists='replace', index=False)
+                # reset_index already returns a new frame; write_table stringifies dates/datetimes per column
+                daily_df_to_save = daily_df.reset_index()
+                write_table(conn, 'daily_summary', daily_df_to_save)
                 print("daily_summary table saved.")
             else:
                 print("Daily summary DataFrame is None, skipping save.")
@@ -698,22 +1096,15 @@ def save_to_database(tick_df, daily_df, session_df, db_filename):
             # --- Save session summary data --- 
             if session_df is not None:
                 print(f"Saving session_summary table ({len(session_df)} rows)...")
-                session_df_to_save = session_df.copy()
-                session_df_to_save.reset_index(inplace=True)
-                if 'Date' in session_df_to_save.columns and not pd.api.types.is_string_dtype(session_df_to_save['Date']) and not pd.api.types.is_object_dtype(session_df_to_save['Date']):
-                     session_df_to_save['Date'] = session_df_to_save['Date'].astype(str)
-                if 'SessionStart' in session_df_to_save.columns:
-                     session_df_to_save['SessionStart'] = session_df_to_save['SessionStart'].astype(str)
-                if 'SessionEnd' in session_df_to_save.columns:
-                     session_df_to_save['SessionEnd'] = session_df_to_save['SessionEnd'].astype(str)
+                session_df_to_save = session_df.reset_index() # SessionStart/SessionEnd -> TEXT in write_table
                      
                 # Convert boolean columns to integer (0/1) for SQLite compatibility
-                bool_cols = ['PoorHigh', 'PoorLow', 'SinglePrints']
-                for col in bool_cols:
-                     if col in session_df_to_save.columns:
-                          session_df_to_save[col] = session_df_to_save[col].astype(int)
+                bool_cols = [col for col in ('PoorHigh', 'PoorLow', 'SinglePrints') if col in session_df_to_save.columns]
+                if bool_cols:
+                     session_df_to_save[bool_cols] = session_df_to_save[bool_cols].astype('uint8')
                      
-                session_df_to_save.to_sql('session_summary', conn, if_exists='replace', index=False)
+                write_table(conn, 'session_summary', session_df_to_save)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_sess_date ON session_summary(Date)")
                 print("session_summary table saved.")
             else:
                 print("Session summary DataFrame is None, skipping save.")
@@ -738,17 +1129,35 @@ if __name__ == "__main__":
     TPO_DATE_LIMIT = None # Limit TPO calc to first 10 days for debugging Single Prints - DISABLED FOR FULL RUN
 
     DB_FILE = "crypto_data.db"
+    TICK_PARQUET = "tick_data.parquet"
     INPUT_FILE = "BTCUSDT_PERP_BINANCE_normalized.txt"
     
     # --- Argument parsing ---
     parser = argparse.ArgumentParser(description="Process BTCUSDT tick data and rebuild database if requested", formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument("--rebuild", action="store_true", help="Ignore existing crypto_data.db and rebuild tables from input file")
     parser.add_argument("--file", default=INPUT_FILE, help="Path to the normalised tick file to process")
+    parser.add_argument("--tick-store", choices=("sqlite", "parquet"), default="sqlite", help="Keep tick data in the tick_data table or in a Parquet file next to the DB")
+    parser.add_argument("--stream", action="store_true", help="Build daily/session summaries (with VPOC) chunk by chunk in bounded memory; TPO metrics are skipped and any existing tick_data table is dropped")
     args = parser.parse_args()
 
     # Apply CLI overrides
     INPUT_FILE = args.file
 
+    # --- Bounded-memory mode: summaries straight from the file, no tick DataFrame ---
+    if args.stream:
+        daily_df, session_df = stream_aggregates(INPUT_FILE)
+        if daily_df is None:
+            print("\nExiting due to failure in streaming aggregation.")
+            sys.exit(1)
+        daily_df = calculate_atr(daily_df, period=ATR_PERIOD)
+        if session_df is not None:
+            session_df['SessionASR'] = (session_df['SessionHigh'] - session_df['SessionLow']).round(1)
+        print("\nTPO metrics need the tick data and are skipped in --stream mode.")
+        # No tick frame in this mode: drop tick_data from an earlier run rather than leave it
+        # next to summaries it no longer matches
+        save_to_database(None, daily_df, session_df, DB_FILE, drop_ticks=True)
+        sys.exit(0)
+
     # --- Option to load from DB (unless --rebuild supplied) --- 
     LOAD_FROM_DB = os.path.exists(DB_FILE) and (not args.rebuild)
     if LOAD_FROM_DB:
@@ -765,20 +1174,35 @@ if __name__ == "__main__":
         try:
             with sqlite3.connect(DB_FILE) as conn:
                 # Load tick_data
-                if pd.io.sql.has_table('tick_data', conn):
+                if args.tick_store == 'parquet' and os.path.exists(TICK_PARQUET):
+                     print(f"Loading tick data from {TICK_PARQUET}...")
+                     data_df = load_tick_frame(TICK_PARQUET)
+                     print(f"Loaded {len(data_df)} rows from {TICK_PARQUET}.")
+                elif pd.io.sql.has_table('tick_data', conn):
                      print("Loading tick_data table...")
                      # Load Date as string initially
-                     data_df = pd.read_sql('SELECT * FROM tick_data', conn, parse_dates=['Timestamp'])
+                     if cx is not None:
+                          data_df = cx.read_sql(f"sqlite://{os.path.abspath(DB_FILE)}", 'SELECT * FROM tick_data', return_type='pandas')
+                          data_df['Timestamp'] = pd.to_datetime(data_df['Timestamp'], format='ISO8601')
+                     else:
+                          data_df = pd.read_sql('SELECT * FROM tick_data', conn, parse_dates=['Timestamp'])
                      # **** Convert Date column to date objects AFTER loading ****
                      if 'Date' in data_df.columns:
                           print("Converting loaded Date column to date objects...")
-                          data_df['Date'] = pd.to_datetime(data_df['Date']).dt.date
+                          data_df['Date'] = pd.to_datetime(data_df['Date'], format='%Y-%m-%d', cache=True).dt.date
                      
-                     # Convert Sessions back from JSON string to list
-                     if 'Sessions' in data_df.columns:
+                     if 'SessionMask' in data_df.columns:
+                          data_df['SessionMask'] = data_df['SessionMask'].astype(np.uint16)
+                     elif 'Sessions' in data_df.columns:
+                          # Older databases store a JSON list of names per tick: pack it into SessionMask
+                          # Only a handful of distinct lists exist, so each distinct string is decoded once
                           try:
-                              data_df['Sessions'] = data_df['Sessions'].apply(json.loads)
-                              print("Converted Sessions column from JSON string.")
+                              bit = {name: 1 << j for j, name in enumerate(session_names())}
+                              codes, unique_json = pd.factorize(data_df['Sessions'])
+                              unique_masks = np.array([sum(bit.get(name, 0) for name in json.loads(s)) for s in unique_json] + [0], dtype=np.uint16)
+                              data_df['SessionMask'] = unique_masks[codes] # code -1 (NULL) -> no session
+                              data_df.drop(columns='Sessions', inplace=True)
+                              print("Converted Sessions column from JSON string to SessionMask.")
                           except (json.JSONDecodeError, TypeError) as e:
                               print(f"Warning: Could not parse Sessions column as JSON: {e}")
                      print(f"Loaded {len(data_df)} rows from tick_data.")
@@ -797,10 +1221,14 @@ if __name__ == "__main__":
                 # Load session_summary
                 if pd.io.sql.has_table('session_summary', conn):
                      print("Loading session_summary table...")
-                     session_df = pd.read_sql('SELECT * FROM session_summary', conn, parse_dates=['Date', 'SessionStart', 'SessionEnd'])
-                     session_df['Date'] = pd.to_datetime(session_df['Date']).dt.date 
-                     if 'Date' in session_df.columns and 'Sessions' in session_df.columns:
-                          session_df = session_df.set_index(['Date', 'Sessions'])
+                     stored_cols = [row[1] for row in conn.execute('PRAGMA table_info(session_summary)')]
+                     if 'Date' in stored_cols and 'Sessions' in stored_cols:
+                          # (Date, Sessions) index built by the reader; only the distinct Date level values are converted
+                          session_df = pd.read_sql('SELECT * FROM session_summary', conn, index_col=['Date', 'Sessions'], parse_dates=['SessionStart', 'SessionEnd'])
+                          session_df.index = session_df.index.set_levels(pd.to_datetime(session_df.index.levels[0], format='%Y-%m-%d').date, level='Date')
+                     else:
+                          session_df = pd.read_sql('SELECT * FROM session_summary', conn, parse_dates=['Date', 'SessionStart', 'SessionEnd'])
+                          session_df['Date'] = pd.to_datetime(session_df['Date']).dt.date 
                      print(f"Loaded {len(session_df)} rows from session_summary.")
                      # *** ADDED: Print columns after loading ***
                      print(f"Columns loaded from session_summary: {session_df.columns.tolist()}") 
@@ -821,16 +1249,19 @@ if __name__ == "__main__":
         
         if data_df is not None:
             data_df = calculate_delta(data_df)
-            # Add Sessions Column
-            print("\nAdding Sessions column...")
+            # Add SessionMask Column
+            print("\nAdding SessionMask column...")
             if 'Timestamp' in data_df.columns:
-                data_df['Sessions'] = data_df['Timestamp'].apply(get_active_sessions)
-                print(f"Sessions column added. Data shape: {data_df.shape}")
+                data_df['SessionMask'] = assign_session_mask(data_df)
+                print(f"SessionMask column added. Data shape: {data_df.shape}")
             else:
-                print("Error: Timestamp column not found, cannot add Sessions.")
+                print("Error: Timestamp column not found, cannot add SessionMask.")
                 data_df = None 
 
     # --- Calculate Summaries & Metrics (only if tick data is available) --- 
+    # Track which summaries were actually (re)computed so loaded-but-unchanged tables are not re-saved
+    daily_mutated = False
+    session_mutated = False
     if data_df is not None:
         # Calculate Daily Summary (if not loaded)
         if daily_df is None: 
@@ -843,22 +1274,28 @@ if __name__ == "__main__":
             
             if daily_df_input is not None and isinstance(daily_df_input.index, pd.DatetimeIndex):
                 daily_df = calculate_daily_summary(daily_df_input)
+                daily_mutated = True
             else: daily_df = None
         
         # Calculate Session Summary (if not loaded)
         if session_df is None:
             print("\nCalculating Session Summary...")
             session_df = calculate_session_summary(data_df)
+            session_mutated = True
         
         # Calculate ATR (if daily data available and needed)
         if daily_df is not None:
              if 'ATR' not in daily_df.columns:
                  print("\nCalculating ATR...")
                  daily_df = calculate_atr(daily_df, period=ATR_PERIOD)
+                 daily_mutated = True
              # else: print("ATR column already exists.") # Optional
         else:
              print("\nDaily summary data not available, cannot calculate ATR.")
 
+        # Session -> tick slice positions, computed once and shared by VPOC and TPO
+        session_slices = build_session_slices(data_df, session_df) if session_df is not None else None
+
         # Calculate VPOC (if session data available and needed)
         if session_df is not None:
             run_vpoc_calc = False
@@ -872,7 +1309,8 @@ if __name__ == "__main__":
                  print("\nSessionVPOC column exists and contains no NaNs. Skipping calculation.")
 
             if run_vpoc_calc:
-                 session_df = calculate_session_vpoc(data_df, session_df, date_limit=None)
+                 session_df = calculate_session_vpoc(data_df, session_df, date_limit=None, slices=session_slices)
+                 session_mutated = True
         else:
              print("\nSession summary data not available, cannot calculate VPOC.")
 
@@ -897,7 +1335,8 @@ if __name__ == "__main__":
                  session_df = calculate_tpo_metrics(data_df, session_df, 
                                                    TPO_PERIOD_MINUTES, PRICE_STEP, 
                                                    VALUE_AREA_PERCENT, INITIAL_BALANCE_PERIODS, 
-                                                   date_limit=TPO_DATE_LIMIT)
+                                                   date_limit=TPO_DATE_LIMIT, slices=session_slices)
+                 session_mutated = True
             else: # Restore else block
                  print("\nSkipping TPO calculation based on existing data.") 
         else:
@@ -909,6 +1348,7 @@ if __name__ == "__main__":
             if 'SessionASR' not in session_df.columns:
                  print("\nCalculating Session ASR...")
                  session_df['SessionASR'] = (session_df['SessionHigh'] - session_df['SessionLow']).round(1)
+                 session_mutated = True
                  print("SessionASR column added.")
             # else: print("SessionASR column already exists.") # Optional
         else:
@@ -942,24 +1382,26 @@ if __name__ == "__main__":
     if not LOAD_FROM_DB and data_df is not None: # Always save if processed from file
         save_needed = True
         print("\nSaving all data to database (processed from file)...")
-    elif LOAD_FROM_DB and session_df is not None and 'SessionVPOC' in session_df.columns: 
-        # Potentially check if VPOC was *just* calculated vs loaded, but for simplicity, save if loaded and VPOC exists
-        # This assumes if loaded, we might have recalculated VPOC if it was missing.
-        # A more robust check would involve flags, but this is simpler for now.
-        save_needed = True # Re-save session_summary if loaded from DB & VPOC exists
-        print("\nUpdating session_summary in database (potentially with new VPOC)...")
-        # Set other dfs to None to only save session_summary
-        data_df = None 
-        daily_df = None
-    elif LOAD_FROM_DB and daily_df is not None and 'ATR' in daily_df.columns: 
-         # Handle case where only ATR was recalculated on loaded data
-         save_needed = True
-         print("\nUpdating daily_summary in database (potentially with new ATR)...")
-         data_df = None
-         session_df = None
+    elif LOAD_FROM_DB and (session_mutated or daily_mutated):
+        # Loaded from DB: only re-save the summary tables that were (re)computed this run
+        save_needed = True
+        if session_mutated:
+            print("\nUpdating session_summary in database (new VPOC/TPO/ASR columns)...")
+        if daily_mutated:
+            print("\nUpdating daily_summary in database (new summary/ATR)...")
+        data_df = None
+        daily_df = daily_df if daily_mutated else None
+        session_df = session_df if session_mutated else None
+    elif LOAD_FROM_DB:
+        print("\nLoaded summaries unchanged; skipping database save.")
 
     if save_needed:
-        save_to_database(data_df, daily_df, session_df, DB_FILE)
+        if args.tick_store == 'parquet' and data_df is not None:
+            save_tick_frame(data_df, TICK_PARQUET)
+            # Ticks now live in the Parquet file; a leftover tick_data table would be stale
+            save_to_database(None, daily_df, session_df, DB_FILE, drop_ticks=True)
+        else:
+            save_to_database(data_df, daily_df, session_df, DB_FILE)
     elif not LOAD_FROM_DB:
          print("\nSkipping database save as processing failed.")
             
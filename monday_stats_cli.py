@@ -1,5 +1,6 @@
 # monday_analysis.py  (v2 – aggregate across sessions)
 
+import numpy as np
 import pandas as pd
 import config   # expects EXCHANGE_TZ or EXCHANGE_UTC_OFFSET_HRS
 
@@ -8,6 +9,10 @@ import config   # expects EXCHANGE_TZ or EXCHANGE_UTC_OFFSET_HRS
 # ----------------------------------------------------------------------
 def _to_exchange_time(ts: pd.Series) -> pd.Series:
     """Return tz‑naive timestamps expressed in the chosen exchange zone."""
+    if not getattr(config, "EXCHANGE_TZ", None) and pd.api.types.is_datetime64_dtype(ts):
+        # Fixed offset on tz-naive (UTC) input: shift the datetime64 values, no tz round-trip
+        offset = np.timedelta64(round(getattr(config, "EXCHANGE_UTC_OFFSET_HRS", 0) * 3600), "s")
+        return pd.Series(ts.to_numpy(dtype="datetime64[ns]") + offset, index=ts.index, name=ts.name)
     ts = pd.to_datetime(ts, utc=True)
     if getattr(config, "EXCHANGE_TZ", None):
         return ts.dt.tz_convert(config.EXCHANGE_TZ).dt.tz_localize(None)
@@ -16,22 +21,26 @@ def _to_exchange_time(ts: pd.Series) -> pd.Series:
 
 def _week_id(ts: pd.Series) -> pd.Series:
     """Monday‑00:00 anchor of each week in exchange time."""
-    monday = ts - pd.to_timedelta(ts.dt.weekday, unit="D")
-    return monday.dt.floor("D")
+    days = ts.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    weekday = (days.view("int64") + 3) % 7   # 1970‑01‑01 was a Thursday; Monday = 0
+    monday = days - weekday.astype("timedelta64[D]")
+    return pd.Series(monday.astype("datetime64[ns]"), index=ts.index, name=ts.name)
 
 # ----------------------------------------------------------------------
 #  Core calculations
 # ----------------------------------------------------------------------
 def build_monday_and_week_table(summary_df: pd.DataFrame,
                                 months_back: int = 6,
-                                drop_current_week: bool = True) -> pd.DataFrame:
+                                drop_current_week: bool = True,
+                                ex_ts: pd.Series = None) -> pd.DataFrame:
     """
     Returns a DataFrame with Monday‑range and full‑week range per week_id.
     Monday highs/lows are *aggregated across all sessions* whose local
     calendar date is Monday.
+    ex_ts – SessionStart already in exchange time (converted here if None)
     """
     df = summary_df.copy()
-    df["ex_ts"] = _to_exchange_time(df["SessionStart"])
+    df["ex_ts"] = _to_exchange_time(df["SessionStart"]) if ex_ts is None else ex_ts
     since = df["ex_ts"].max() - pd.DateOffset(months=months_back)
     df = df[df["ex_ts"] >= since]
 
@@ -70,7 +79,8 @@ def get_monday_stats(summary_df: pd.DataFrame,
         weekly_tbl – per‑week DataFrame (see build_monday_and_week_table)
         pct_dict   – dictionary of percentage statistics
     """
-    wk = build_monday_and_week_table(summary_df, months_back, drop_current_week=True)
+    ex_ts = _to_exchange_time(summary_df["SessionStart"])   # converted once, shared with the weekly table
+    wk = build_monday_and_week_table(summary_df, months_back, drop_current_week=True, ex_ts=ex_ts)
 
     pct = {
         "pct_monday_is_weekly_high_low": 100*(wk["Mon_is_WkHigh"] & wk["Mon_is_WkLow"]).mean(),
@@ -80,7 +90,7 @@ def get_monday_stats(summary_df: pd.DataFrame,
 
     # -------- Which session later breaks the Monday levels ------------
     sess = summary_df.copy()
-    sess["ex_ts"]   = _to_exchange_time(sess["SessionStart"])
+    sess["ex_ts"]   = ex_ts
     sess["week_id"] = _week_id(sess["ex_ts"])
 
     # Keep only completed week_ids present in wk
@@ -91,8 +101,12 @@ def get_monday_stats(summary_df: pd.DataFrame,
     mon_high_map = wk.set_index('week_id')['MondayHigh']
     mon_low_map  = wk.set_index('week_id')['MondayLow']
 
+    # Split by session once instead of a string-equality scan per lookup
+    by_session = dict(tuple(sess.groupby("Sessions", sort=False)))
+    empty = sess.iloc[:0]
+
     def _session_break_pct(sess_name: str):
-        sub = sess[sess["Sessions"] == sess_name]
+        sub = by_session.get(sess_name, empty)
         hit_hi = sub["SessionHigh"] >= sub["week_id"].map(mon_high_map)
         hit_lo = sub["SessionLow"]  <= sub["week_id"].map(mon_low_map)
         base_map = {"London": "london", "NewYork": "ny", "Asia": "asia"}
@@ -117,24 +131,16 @@ def get_monday_stats(summary_df: pd.DataFrame,
     week_lists['MonHigh'] = wk.loc[wk['Mon_is_WkHigh'], 'week_str'].tolist()
     week_lists['MonLow'] = wk.loc[wk['Mon_is_WkLow'], 'week_str'].tolist()
 
-    # Session break week lists
-    sess['ex_ts']   = _to_exchange_time(sess['SessionStart'])
-    sess['week_id'] = _week_id(sess['ex_ts'])
-
+    # Session break week lists (sess already carries ex_ts / week_id from above)
     def _calc_break_weeks(session_name:str, key_prefix:str):
-        sub = sess[sess['Sessions']==session_name]
-        weeks = mon_high_map.index
-        hi_weeks = []
-        lo_weeks = []
-        for wk_id in weeks:
-            wk_sub = sub[sub['week_id'] == wk_id]
-            if wk_sub.empty:
-                continue
-            if wk_sub['SessionHigh'].max() >= mon_high_map[wk_id]:
-                hi_weeks.append(wk_id)
-            if wk_sub['SessionLow'].min() <= mon_low_map[wk_id]:
-                lo_weeks.append(wk_id)
-        both_weeks = sorted(set(hi_weeks) & set(lo_weeks))
+        sub = by_session.get(session_name, empty)
+        # Per-week session extremes in one groupby; weeks without this session get NaN -> no hit
+        agg = sub.groupby('week_id').agg(hi=('SessionHigh', 'max'), lo=('SessionLow', 'min')).reindex(mon_high_map.index)
+        hi_mask = agg['hi'].to_numpy() >= mon_high_map.to_numpy()
+        lo_mask = agg['lo'].to_numpy() <= mon_low_map.to_numpy()
+        hi_weeks = mon_high_map.index[hi_mask]
+        lo_weeks = mon_low_map.index[lo_mask]
+        both_weeks = mon_high_map.index[hi_mask & lo_mask]
         fmt = lambda arr: [p.strftime('%Y-%m-%d') for p in arr]
         week_lists[f'{key_prefix}_High'] = fmt(hi_weeks)
         week_lists[f'{key_prefix}_Low']  = fmt(lo_weeks)
@@ -161,8 +167,12 @@ SESSION_TABLE = "session_summary"
 TICK_TABLE = "tick_data"
 
 
-def _load_table(conn, table, parse_dates=None):
-    return pd.read_sql(f"SELECT * FROM {table}", conn, parse_dates=parse_dates)
+SESSION_COLUMNS = ["Date", "Sessions", "SessionStart", "SessionEnd", "SessionHigh", "SessionLow"]
+
+
+def _load_table(conn, table, columns=None, parse_dates=None):
+    cols = "*" if columns is None else ", ".join(columns)
+    return pd.read_sql(f"SELECT {cols} FROM {table}", conn, parse_dates=parse_dates)
 
 
 def cli_main():
@@ -176,7 +186,7 @@ def cli_main():
 
     with sqlite3.connect(args.db) as conn:
         print(f"Loading '{SESSION_TABLE}' from {args.db} …")
-        summary_df = _load_table(conn, SESSION_TABLE, parse_dates=["SessionStart", "SessionEnd"])
+        summary_df = _load_table(conn, SESSION_TABLE, columns=SESSION_COLUMNS, parse_dates=["SessionStart", "SessionEnd"])
 
     wk_tbl, pct, wk_lists = get_monday_stats(summary_df, None, months_back=args.months)
 
@@ -240,18 +250,29 @@ def cli_main():
 
 def _weeks_overlap_break(conn, wk_df, monday_high_map):
     """Return list of weeks where MondayHigh broken during LDN/NY overlap (13:30-16:00 UTC, Tue-Fri)."""
+    if not monday_high_map:
+        return []
+    week_starts = {wk_id: pd.Period(wk_id, freq='W-MON').start_time for wk_id in monday_high_map}
+
+    # One scan instead of one query per week: overlap-window ticks are bucketed by the
+    # start of their W-MON period (a Tuesday); only days 1-5 of the period (Wed-Sun,
+    # i.e. [start+1d, start+6d) as the per-week ranges were) are kept.
+    query = f"""
+        SELECT date(Timestamp, 'weekday 2', '-7 days') AS period_start, MAX(High) as max_high
+        FROM {TICK_TABLE}
+        WHERE Timestamp >= ? AND Timestamp < ?
+          AND strftime('%w', Timestamp) IN ('0', '3', '4', '5', '6')
+          AND time(Timestamp) >= '13:30:00' AND time(Timestamp) < '16:00:00'
+        GROUP BY period_start;
+    """
+    range_start = (min(week_starts.values()) + pd.Timedelta(days=1)).strftime('%Y-%m-%d 00:00:00')
+    range_end = (max(week_starts.values()) + pd.Timedelta(days=6)).strftime('%Y-%m-%d 00:00:00')
+    max_high_by_start = dict(conn.execute(query, (range_start, range_end)).fetchall())
+
     weeks_triggered = []
     for wk_id, mon_high in monday_high_map.items():
-        week_start = pd.Period(wk_id, freq='W-MON').start_time
-        tue_date = (week_start + pd.Timedelta(days=1)).strftime('%Y-%m-%d')  # Tuesday
-        sat_date = (week_start + pd.Timedelta(days=6)).strftime('%Y-%m-%d')  # Saturday 00:00 exclusive
-        query = f"""
-            SELECT MAX(High) as max_high
-            FROM {TICK_TABLE}
-            WHERE Timestamp >= '{tue_date} 00:00:00' AND Timestamp < '{sat_date} 00:00:00'
-              AND time(Timestamp) >= '13:30:00' AND time(Timestamp) < '16:00:00';
-        """
-        max_high = conn.execute(query).fetchone()[0]
+        week_start = week_starts[wk_id]
+        max_high = max_high_by_start.get(week_start.strftime('%Y-%m-%d'))
         if max_high is not None and max_high >= mon_high:
             weeks_triggered.append(week_start.strftime('%Y-%m-%d'))
     return weeks_triggered
@@ -1,15 +1,27 @@
 import sys
 import csv
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
 
-def normalize_timestamp(input_filename, output_filename):
+def _skip_malformed(row):
+    """invalid_row_handler: report and drop rows whose field count differs from the first line."""
+    print(f"Warning: Skipping malformed line {row.number}: {row.text}")
+    return 'skip'
+
+def normalize_timestamp(input_filename, output_filename, block_size=256 << 20):
     """
     Reads a CSV file, combines the first two columns (date and time) 
     into a single timestamp, changes date format from YYYY/MM/DD to YYYY-MM-DD,
     and writes the result to a new CSV file.
 
+    The file is streamed through Arrow's CSV reader/writer in `block_size` chunks,
+    with every field kept as text (trimmed, never re-formatted).
+
     Args:
         input_filename (str): Path to the input CSV file.
         output_filename (str): Path to the output CSV file.
+        block_size (int): Bytes of input parsed per batch.
     """
     lines_processed = 0
     print(f"Starting timestamp normalization...")
@@ -17,29 +29,30 @@ def normalize_timestamp(input_filename, output_filename):
     print(f"Output file: {output_filename}")
 
     try:
-        with open(input_filename, 'r', encoding='utf-8', newline='') as infile, \
-             open(output_filename, 'w', encoding='utf-8', newline='') as outfile:
-            
-            reader = csv.reader(infile)
-            writer = csv.writer(outfile)
-
-            for i, row in enumerate(reader):
-                if len(row) >= 2:
-                    date_part = row[0].strip().replace('/', '-') # Replace slashes with dashes
-                    time_part = row[1].strip()
-                    timestamp = f"{date_part} {time_part}"
-                    
-                    # Create the new row with the combined timestamp and the rest of the data
-                    new_row = [timestamp] + [col.strip() for col in row[2:]]
-                    writer.writerow(new_row)
-                    lines_processed += 1
-                else:
-                    # Handle potentially empty or malformed lines if necessary
-                    print(f"Warning: Skipping malformed line {i+1}: {row}")
-                    continue # Skip writing this line
-
-                if (i + 1) % 1000000 == 0: # Print progress every million lines
-                     print(f"Processed {i + 1} lines...")
+        # Field count of the first line fixes the layout; all fields are read as strings
+        with open(input_filename, 'r', encoding='utf-8-sig', newline='') as infile:
+            n_fields = len(next(csv.reader(infile), []))
+        if n_fields < 2:
+            raise ValueError(f"expected at least date and time columns, found {n_fields}")
+        names = [f"f{j}" for j in range(n_fields)]
+
+        reader = pa_csv.open_csv(
+            input_filename,
+            read_options=pa_csv.ReadOptions(column_names=names, block_size=block_size),
+            parse_options=pa_csv.ParseOptions(invalid_row_handler=_skip_malformed),
+            convert_options=pa_csv.ConvertOptions(column_types={name: pa.string() for name in names}),
+        )
+        out_schema = pa.schema([pa.field(name, pa.string(), nullable=False) for name in ['Timestamp'] + names[2:]])
+        write_options = pa_csv.WriteOptions(include_header=False, quoting_style='none')
+
+        with pa_csv.CSVWriter(output_filename, out_schema, write_options=write_options) as writer:
+            for batch in reader:
+                fields = [pc.utf8_trim_whitespace(col) for col in batch.columns]
+                date_part = pc.replace_substring(fields[0], '/', '-') # Replace slashes with dashes
+                timestamp = pc.binary_join_element_wise(date_part, fields[1], ' ')
+                writer.write_batch(pa.RecordBatch.from_arrays([timestamp] + fields[2:], schema=out_schema))
+                lines_processed += batch.num_rows
+                print(f"Processed {lines_processed} lines...")
 
         print(f"Finished processing.")
         print(f"Total lines written to {output_filename}: {lines_processed}")
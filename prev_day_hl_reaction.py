@@ -22,17 +22,47 @@ import argparse, os, sqlite3, datetime as dt
 import pandas as pd
 import numpy as np
 import config
+try:
+    import connectorx as cx  # Optional: columnar (Arrow) SQLite reads when installed
+except ImportError:
+    cx = None
+try:
+    from numba import njit, prange  # Optional: compiles the per-session touch reducer when installed
+except ImportError:
+    njit, prange = None, range
+try:
+    import polars as pl  # Optional: runs calc_reaction_stats as one lazy query when installed
+except ImportError:
+    pl = None
 
 # ---------------------------------------------------------------
 #  Helpers copied from monday_stats_cli (tz handling)
 # ---------------------------------------------------------------
 
 def _to_exchange_time(ts: pd.Series | pd.DatetimeIndex) -> pd.Series:
-    ts = pd.to_datetime(ts, utc=True)
+    index = ts.index if isinstance(ts, pd.Series) else None
+    arr = ts.values if hasattr(ts, "values") else np.asarray(ts)
+    # datetime64 input (naive = UTC, tz-aware .values are UTC) skips to_datetime
+    if arr.dtype.kind != "M":
+        arr = pd.to_datetime(arr, utc=True).values
+    arr = arr.astype("datetime64[ns]", copy=False)
     if getattr(config, "EXCHANGE_TZ", None):
-        return ts.dt.tz_convert(config.EXCHANGE_TZ).dt.tz_localize(None)
+        local = pd.DatetimeIndex(arr).tz_localize("UTC").tz_convert(config.EXCHANGE_TZ).tz_localize(None)
+    else:
+        # fixed offset: one int64 add, no tz-aware intermediates
+        off = np.int64(getattr(config, "EXCHANGE_UTC_OFFSET_HRS", 0) * 3_600_000_000_000)
+        local = pd.DatetimeIndex((arr.view("i8") + off).view("datetime64[ns]"))
+    return pd.Series(local, index=index)
+
+
+def _to_exchange_time_scalar(ts_utc: pd.Timestamp) -> pd.Timestamp:
+    """Scalar counterpart of _to_exchange_time (no one-element Series)."""
+    ts_utc = pd.Timestamp(ts_utc)
+    ts_utc = ts_utc.tz_localize("UTC") if ts_utc.tzinfo is None else ts_utc.tz_convert("UTC")
+    if getattr(config, "EXCHANGE_TZ", None):
+        return ts_utc.tz_convert(config.EXCHANGE_TZ).tz_localize(None)
     offset = getattr(config, "EXCHANGE_UTC_OFFSET_HRS", 0)
-    return (ts + pd.Timedelta(hours=offset)).dt.tz_localize(None)
+    return (ts_utc + pd.Timedelta(hours=offset)).tz_localize(None)
 
 # ---------------------------------------------------------------
 #  Core logic
@@ -43,67 +73,255 @@ SESSION_TABLE = "session_summary"
 DAILY_TABLE = "daily_summary"
 
 
-def load_tables(db_path: str):
-    """Return daily_df (Date index) and session_df (records)."""
+def _read_sql(conn, db_path: str, sql: str, params, parse_dates):
+    """pd.read_sql, or connectorx's Arrow-buffer reader when it is installed."""
+    if cx is None:
+        return pd.read_sql(sql, conn, params=params, parse_dates=parse_dates)
+    # connectorx takes no bind parameters; the only one here is the generated "-N months" modifier
+    for value in params or ():
+        sql = sql.replace("?", f"'{value}'", 1)
+    df = cx.read_sql(f"sqlite://{os.path.abspath(db_path)}", sql, return_type="pandas")
+    for col in parse_dates:
+        df[col] = pd.to_datetime(df[col], format="ISO8601")
+    return df
+
+
+DAILY_COLS = ["Date", "DailyHigh", "DailyLow"]
+SESSION_COLS = ["SessionStart", "SessionHigh", "SessionLow", "Sessions"]
+
+
+def load_tables(db_path: str, months_back: int | None = None):
+    """Return daily_df (Date index) and session_df (records).
+
+    Only the columns calc_reaction_stats uses are read. With *months_back*
+    the rows are limited in SQL to months_back + 1 months before the
+    latest SessionStart (a superset of the window calc_reaction_stats keeps).
+    """
     with sqlite3.connect(db_path) as conn:
-        daily = pd.read_sql(f"SELECT * FROM {DAILY_TABLE}", conn, parse_dates=["Date"]).set_index("Date")
-        session = pd.read_sql(
-            f"SELECT * FROM {SESSION_TABLE}",
-            conn,
-            parse_dates=["SessionStart", "SessionEnd", "Date"],
-        )
-    # ensure expected cols exist
-    req_daily = {"DailyHigh", "DailyLow"}
-    if not req_daily.issubset(daily.columns):
-        raise ValueError(f"{DAILY_TABLE} missing columns {req_daily - set(daily.columns)}")
-    req_sess = {"SessionHigh", "SessionLow", "SessionStart", "Sessions"}
-    if not req_sess.issubset(session.columns):
-        raise ValueError(f"{SESSION_TABLE} missing columns {req_sess - set(session.columns)}")
+        # read-only bulk scan: memory-map the file, large page cache, in-memory temp sorts
+        conn.executescript("""
+            PRAGMA query_only=1;
+            PRAGMA mmap_size=268435456;
+            PRAGMA cache_size=-200000;
+            PRAGMA temp_store=MEMORY;
+        """)
+        # ensure expected cols exist
+        for table, required in ((DAILY_TABLE, DAILY_COLS), (SESSION_TABLE, SESSION_COLS)):
+            present = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if not set(required).issubset(present):
+                raise ValueError(f"{table} missing columns {set(required) - present}")
+
+        daily_sql = f"SELECT {', '.join(DAILY_COLS)} FROM {DAILY_TABLE}"
+        session_sql = f"SELECT {', '.join(SESSION_COLS)} FROM {SESSION_TABLE}"
+        params = None
+        if months_back is not None:
+            daily_sql += f" WHERE Date >= (SELECT date(MAX(SessionStart), ?) FROM {SESSION_TABLE})"
+            session_sql += f" WHERE SessionStart >= (SELECT datetime(MAX(SessionStart), ?) FROM {SESSION_TABLE})"
+            params = (f"-{months_back + 1} months",)
+
+        daily = _read_sql(conn, db_path, daily_sql, params, ["Date"]).set_index("Date")
+        # naive midnight datetime64 index, so reindex by exchange calendar day hashes like-for-like
+        daily.index = pd.DatetimeIndex(daily.index).tz_localize(None).normalize()
+        session = _read_sql(conn, db_path, session_sql, params, ["SessionStart"])
+    # categorical (lexically sorted categories): groupby works on integer codes
+    session["Sessions"] = session["Sessions"].astype("category")
     return daily, session
 
 
 def calc_reaction_stats(daily_df: pd.DataFrame, session_df: pd.DataFrame, months_back: int = 6,
                          tolerance: float | None = None):
     """Return stats DF per session and raw annotated session_df."""
-    sess = session_df.copy()
+    now = pd.Timestamp.utcnow()
+    # cut to the look-back window in UTC first, so only those rows are tz-converted
+    early = _window_prefilter(session_df, months_back, now)
+    if early is None:
+        # shallow projection: only the columns used below, no data copied
+        sess = session_df[SESSION_COLS].copy(deep=False)
+    else:
+        sess = session_df.loc[early, SESSION_COLS]
     sess["ex_ts"] = _to_exchange_time(sess["SessionStart"])
 
     # drop current (in‑progress) calendar day in exchange tz
-    today_ex = _to_exchange_time(pd.Series([pd.Timestamp.utcnow()]))[0].date()
-    sess = sess[sess["ex_ts"].dt.date < today_ex]
+    # calendar days as datetime64[D] (no datetime.date objects)
+    today_ex = _to_exchange_time_scalar(now).to_datetime64().astype("datetime64[D]")
+    tol = tolerance if tolerance is not None else 0.0
+    if pl is not None:
+        return _reaction_stats_polars(daily_df, sess, today_ex, months_back, tol)
+
+    sess = sess[sess["ex_ts"].to_numpy().astype("datetime64[D]") < today_ex]
 
     since = sess["ex_ts"].max() - pd.DateOffset(months=months_back)
     sess = sess[sess["ex_ts"] >= since]
 
     # map previous day high/low
-    prev_dates = (sess["ex_ts"].dt.date - pd.Timedelta(days=1)).astype("datetime64[ns]")
-    prev_daily = daily_df.loc[daily_df.index.isin(prev_dates)]
-    # build dicts for fast map
-    high_map = prev_daily["DailyHigh"].to_dict()
-    low_map = prev_daily["DailyLow"].to_dict()
+    prev_dates = sess["ex_ts"].to_numpy().astype("datetime64[D]") - np.timedelta64(1, "D")
+    # one hash lookup per distinct day (missing days -> NaN), spread back to rows via searchsorted
+    unique_prev = np.unique(prev_dates)
+    lookup = daily_df[["DailyHigh", "DailyLow"]].reindex(pd.DatetimeIndex(unique_prev.astype("datetime64[ns]")))
+    pos = np.searchsorted(unique_prev, prev_dates)
+    ph = lookup["DailyHigh"].to_numpy()[pos]
+    pl_ = lookup["DailyLow"].to_numpy()[pos]
 
-    sess["prev_high"] = prev_dates.map(lambda d: high_map.get(d, np.nan))
-    sess["prev_low"] = prev_dates.map(lambda d: low_map.get(d, np.nan))
+    # plain ndarray comparisons (no Series index alignment)
+    sh = sess["SessionHigh"].to_numpy()
+    sl = sess["SessionLow"].to_numpy()
+    th = sh >= ph - tol
+    tl = sl <= pl_ + tol
+    sess = sess.assign(
+        prev_high=ph, prev_low=pl_,
+        touch_high=th, touch_low=tl, touch_both=th & tl,
+        # Measure maximum excursion beyond the level (overshoot)
+        exc_high=np.where(th, sh - ph, np.nan),
+        exc_low=np.where(tl, pl_ - sl, np.nan),
+    )
 
-    tol = tolerance if tolerance is not None else 0.0
-    sess["touch_high"] = sess["SessionHigh"] >= sess["prev_high"] - tol
-    sess["touch_low"] = sess["SessionLow"] <= sess["prev_low"] + tol
+    if njit is not None:
+        return _reaction_stats_numba(sess, tol), sess
+
+    # integer bincounts per session code (no bool -> float promotion in mean)
+    cat = pd.Categorical(sess["Sessions"])
+    codes = cat.codes.astype(np.intp)
+    k = len(cat.categories)
+    valid = codes >= 0  # NaN session name, dropped like groupby does
+    hit_high, hit_low = valid & th, valid & tl
+    counts = np.column_stack([
+        np.bincount(codes[valid], minlength=k),
+        np.bincount(codes[hit_high], minlength=k),
+        np.bincount(codes[hit_low], minlength=k),
+        np.bincount(codes[hit_high & hit_low], minlength=k),
+    ])
+    sums = np.column_stack([
+        np.bincount(codes[hit_high], weights=(sh - ph)[hit_high], minlength=k),
+        np.bincount(codes[hit_low], weights=(pl_ - sl)[hit_low], minlength=k),
+    ])
+    return _stats_frame(cat.categories, counts, sums), sess
 
-    # Measure maximum excursion beyond the level (overshoot)
-    sess["exc_high"] = np.where(sess["touch_high"], sess["SessionHigh"] - sess["prev_high"], np.nan)
-    sess["exc_low"]  = np.where(sess["touch_low"],  sess["prev_low"]  - sess["SessionLow"],  np.nan)
 
-    grp = sess.groupby("Sessions")
-    stats = pd.DataFrame({
-        "SampleSize": grp.size(),
-        "PctPrevHigh": 100 * grp["touch_high"].mean(),
-        "PctPrevLow":  100 * grp["touch_low"].mean(),
-        "PctBoth":     100 * grp.apply(lambda g: (g["touch_high"] & g["touch_low"]).mean()),
-        "AvgExcHigh":  grp["exc_high"].mean(),   # average overshoot when prev high touched
-        "AvgExcLow":   grp["exc_low"].mean(),    # average overshoot when prev low touched
-    }).reset_index().sort_values("Sessions")
+def _window_prefilter(session_df: pd.DataFrame, months_back: int, now: pd.Timestamp):
+    """Row mask on the raw (naive UTC) SessionStart that keeps a superset of the
+    rows calc_reaction_stats selects, or None when it cannot be bounded cheaply.
 
-    return stats, sess
+    Rows at least two days old are in a finished exchange day whatever the
+    offset, so their latest start bounds the window's anchor from below; the
+    extra week absorbs the exchange offset and month-end clamping.
+    """
+    raw = session_df["SessionStart"].to_numpy()
+    if raw.dtype.kind != "M":
+        return None
+    finished = raw[raw <= (now.tz_localize(None) - pd.Timedelta(days=2)).to_datetime64()]
+    if not len(finished):
+        return None
+    lower = pd.Timestamp(finished.max()) - pd.DateOffset(months=months_back) - pd.Timedelta(days=7)
+    return raw >= lower.to_datetime64()
+
+
+REDUCE_CHUNKS = 64
+
+
+def _reduce_touches(high, low, ph, pl_, codes, tol, n_groups):
+    """One sweep over the session rows: per session code, the row count, the
+    prev-high / prev-low / both touch counts and the two overshoot sums.
+
+    Rows are split into REDUCE_CHUNKS blocks that each fill their own partial
+    table, so the parallel loop never writes to a shared counter.
+    """
+    n = len(codes)
+    step = (n + REDUCE_CHUNKS - 1) // REDUCE_CHUNKS
+    counts = np.zeros((REDUCE_CHUNKS, n_groups, 4), dtype=np.int64)
+    sums = np.zeros((REDUCE_CHUNKS, n_groups, 2), dtype=np.float64)
+    for c in prange(REDUCE_CHUNKS):
+        for i in range(c * step, min(n, (c + 1) * step)):
+            g = codes[i]
+            if g < 0:  # NaN session name, dropped like groupby does
+                continue
+            hit_high = high[i] >= ph[i] - tol
+            hit_low = low[i] <= pl_[i] + tol
+            counts[c, g, 0] += 1
+            if hit_high:
+                counts[c, g, 1] += 1
+                sums[c, g, 0] += high[i] - ph[i]
+            if hit_low:
+                counts[c, g, 2] += 1
+                sums[c, g, 1] += pl_[i] - low[i]
+            if hit_high and hit_low:
+                counts[c, g, 3] += 1
+    return counts.sum(axis=0), sums.sum(axis=0)
+
+if njit is not None:
+    _reduce_touches = njit(parallel=True, cache=True)(_reduce_touches)
+
+
+def _reaction_stats_numba(sess: pd.DataFrame, tol: float) -> pd.DataFrame:
+    """Per-session stats from _reduce_touches (same table as the bincount path)."""
+    cat = pd.Categorical(sess["Sessions"])
+    # fixed argument types (contiguous f8, i2 codes, f8 tol, int n) so numba
+    # compiles and caches one specialisation, whatever the category count
+    cols = [np.ascontiguousarray(sess[c].to_numpy(dtype="float64"))
+            for c in ("SessionHigh", "SessionLow", "prev_high", "prev_low")]
+    counts, sums = _reduce_touches(
+        *cols, cat.codes.astype(np.int16, copy=False), float(tol), len(cat.categories),
+    )
+    return _stats_frame(cat.categories, counts, sums)
+
+
+def _stats_frame(categories, counts, sums) -> pd.DataFrame:
+    """Stats table from per-category counts (rows, high, low, both touches)
+    and overshoot sums (high, low); categories with no rows are dropped."""
+    seen = counts[:, 0] > 0
+    counts, sums = counts[seen], sums[seen]
+    size = counts[:, 0].astype("float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return pd.DataFrame({
+            "Sessions": categories[seen],
+            "SampleSize": counts[:, 0],
+            "PctPrevHigh": 100 * counts[:, 1] / size,
+            "PctPrevLow": 100 * counts[:, 2] / size,
+            "PctBoth": 100 * counts[:, 3] / size,
+            "AvgExcHigh": sums[:, 0] / counts[:, 1],   # average overshoot when prev high touched
+            "AvgExcLow": sums[:, 1] / counts[:, 2],    # average overshoot when prev low touched
+        })
+
+
+def _reaction_stats_polars(daily_df: pd.DataFrame, sess: pd.DataFrame, today_ex, months_back: int, tol: float):
+    """calc_reaction_stats from the exchange-time step on, as one Polars lazy query (same outputs)."""
+    prev_daily = pl.from_dict({
+        "prev_date": pd.DatetimeIndex(daily_df.index).to_numpy(dtype="datetime64[ns]").astype("datetime64[D]"),
+        "prev_high": daily_df["DailyHigh"].to_numpy(dtype="float64"),
+        "prev_low": daily_df["DailyLow"].to_numpy(dtype="float64"),
+    }).lazy().with_columns(pl.col("prev_date").cast(pl.Date), pl.col(pl.Float64).fill_nan(None))  # NaN -> null so comparisons/means skip it like pandas
+
+    touch_high = (pl.col("SessionHigh") >= pl.col("prev_high") - tol).fill_null(False)
+    touch_low = (pl.col("SessionLow") <= pl.col("prev_low") + tol).fill_null(False)
+    annotated = (
+        pl.from_pandas(sess).lazy()
+        .with_columns(pl.col("SessionHigh", "SessionLow").fill_nan(None))
+        .filter(pl.col("ex_ts").dt.date() < pl.lit(today_ex.astype(object)))
+        .filter(pl.col("ex_ts") >= pl.col("ex_ts").max().dt.offset_by(f"-{months_back}mo"))
+        .with_columns((pl.col("ex_ts").dt.date() - pl.duration(days=1)).alias("prev_date"))
+        .join(prev_daily, on="prev_date", how="left", maintain_order="left")
+        .drop("prev_date")
+        .with_columns(touch_high.alias("touch_high"), touch_low.alias("touch_low"))
+        .with_columns(
+            (pl.col("touch_high") & pl.col("touch_low")).alias("touch_both"),
+            # Measure maximum excursion beyond the level (overshoot)
+            pl.when(pl.col("touch_high")).then(pl.col("SessionHigh") - pl.col("prev_high")).alias("exc_high"),
+            pl.when(pl.col("touch_low")).then(pl.col("prev_low") - pl.col("SessionLow")).alias("exc_low"),
+        )
+    )
+    stats = (
+        annotated.group_by("Sessions")
+        .agg(
+            pl.len().cast(pl.Int64).alias("SampleSize"),
+            (100 * pl.col("touch_high").mean()).alias("PctPrevHigh"),
+            (100 * pl.col("touch_low").mean()).alias("PctPrevLow"),
+            (100 * pl.col("touch_both").mean()).alias("PctBoth"),
+            pl.col("exc_high").mean().alias("AvgExcHigh"),   # average overshoot when prev high touched
+            pl.col("exc_low").mean().alias("AvgExcLow"),     # average overshoot when prev low touched
+        )
+        .sort(pl.col("Sessions").cast(pl.String))  # lexical, also for Categorical Sessions
+    )
+    stats_df, sess_df = pl.collect_all([stats, annotated])
+    return stats_df.to_pandas(), sess_df.to_pandas()
 
 # ---------------------------------------------------------------
 #  CLI
@@ -119,15 +337,14 @@ def cli_main():
     if not os.path.exists(args.db):
         p.error(f"Database not found: {args.db}")
 
-    daily, session = load_tables(args.db)
+    daily, session = load_tables(args.db, args.months)
     stats, _ = calc_reaction_stats(daily, session, args.months, args.tol)
 
     print(f"\nReaction to previous day's High / Low (last {args.months} months)\n")
-    print(stats.to_string(index=False, formatters={
-        "PctPrevHigh": lambda x: f"{x:5.1f}%",
-        "PctPrevLow": lambda x: f"{x:5.1f}%",
-        "PctBoth": lambda x: f"{x:5.1f}%",
-    }))
+    # percent columns formatted per column array, not per-cell lambdas
+    pct = ["PctPrevHigh", "PctPrevLow", "PctBoth"]
+    display = stats.assign(**{c: np.char.mod("%5.1f%%", stats[c].to_numpy()) for c in pct})
+    print(display.to_string(index=False))
 
 
 if __name__ == "__main__":